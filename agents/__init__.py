@@ -1,9 +1,12 @@
-from agents.web_scrapper import WebScraperAgent
-from dataclass import ScrapeResult
-from agents.contentProcessor import ContentProcessorAgent
-from dataclass import ProcessResult
-
+"""Agents are imported on first attribute access, so `import agents` stays cheap."""
+from importlib import import_module
 
+_EXPORTS = {
+    "WebScraperAgent": "agents.web_scrapper",
+    "ScrapeResult": "dataclass",
+    "ContentProcessorAgent": "agents.contentProcessor",
+    "ProcessResult": "dataclass",
+}
 
 __all__ = [
     "WebScraperAgent",
@@ -11,3 +14,11 @@ __all__ = [
     "ContentProcessorAgent",
     "ProcessResult",
 ]
+
+
+def __getattr__(name):
+    if name in _EXPORTS:
+        value = getattr(import_module(_EXPORTS[name]), name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module 'agents' has no attribute {name!r}")
@@ -1,53 +1,329 @@
-from dataclasses import dataclass
-from typing import List
-from utils.text_utils import clean_text, chunk_text, extract_snippets, simple_rank_chunks
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
-# Try TF-IDF, else fallback to Jaccard
-_TFIDF_OK = True
-try:
-    from sklearn.feature_extraction.text import TfidfVectorizer
-    from sklearn.metrics.pairwise import cosine_similarity
-except Exception:
-    _TFIDF_OK = False
-
-@dataclass
-class ProcessResult:
-    cleaned_text: str
-    chunks: List[str]
-    highlights: List[str]
-    top_chunk_indices: List[int]
-    method: str  # "tfidf" | "jaccard"
+from dataclasses import replace
+from functools import lru_cache
+from typing import List, Optional, Sequence, Tuple
+from dataclass import IndexedDocument, ProcessResult
+from utils import metrics
+from utils.text_utils import ChunkView, clean_text, chunk_spans, content_chunk_spans, simple_rank_chunks, span_array
+from utils.token_utils import token_chunk_spans
+
+# Try TF-IDF, else fallback to BM25 (NumPy only), then Jaccard. The numpy-backed indexes
+# and scikit-learn are imported on first use, so importing this module stays cheap.
+@lru_cache(maxsize=1)
+def _document_index_cls():
+    """utils.doc_index.DocumentIndex, or None when scikit-learn is not installed."""
+    try:
+        from utils.doc_index import DocumentIndex
+        return DocumentIndex
+    except Exception:
+        return None
+
+RANKERS = ("tfidf", "bm25", "jaccard", "dense", "hybrid")
+_PAGE_SEP = "\n\n"  # between pages of a crawled site in IndexedDocument.cleaned_text
+# "content": chunk ends are content-defined (rolling hash), so an edit only changes the chunks around it.
+CHUNKERS = ("chars", "tokens", "content")
 
 class ContentProcessorAgent:
-    def __init__(self, max_chars: int = 1200, overlap: int = 150, top_k: int = 3):
+    def __init__(self, max_chars: int = 1200, overlap: int = 150, top_k: int = 3, ranker: str = "tfidf",
+                 chunking: str = "chars", max_tokens: int = 256, overlap_tokens: int = 32,
+                 stream_above: int = 600_000, dedup_threshold: Optional[float] = 0.9):
+        if ranker not in RANKERS:
+            raise ValueError(f"Unknown ranker {ranker!r}; expected one of {RANKERS}")
+        if chunking not in CHUNKERS:
+            raise ValueError(f"Unknown chunking {chunking!r}; expected one of {CHUNKERS}")
         self.max_chars = max_chars
         self.overlap = overlap
         self.top_k = top_k
+        self.ranker = ranker
+        self.chunking = chunking
+        self.max_tokens = max_tokens
+        self.overlap_tokens = overlap_tokens
+        # Longer cleaned texts are never held as chunk strings or fitted into an index;
+        # each question batch streams over the chunks with a bounded top-k instead.
+        self.stream_above = stream_above
+        # Chunks (and crawled pages) at least this similar to an earlier one are dropped
+        # before indexing (MinHash + LSH, utils.near_dup); None turns it off.
+        self.dedup_threshold = dedup_threshold
 
-    def process(self, text: str, question: str) -> ProcessResult:
-        cleaned = clean_text(text)
-        chunks = chunk_text(cleaned, max_chars=self.max_chars, overlap=self.overlap)
+    def chunk_params(self) -> dict:
+        """Everything that shapes the chunks and index; used to key stored documents."""
+        if self.chunking == "tokens":
+            return {"chunking": "tokens", "max_tokens": self.max_tokens, "overlap_tokens": self.overlap_tokens,
+                    "ranker": self.ranker, "stream_above": self.stream_above, "dedup": self.dedup_threshold}
+        params = {"max_chars": self.max_chars, "overlap": self.overlap, "ranker": self.ranker,
+                  "stream_above": self.stream_above, "dedup": self.dedup_threshold}
+        return {"chunking": "content", **params} if self.chunking == "content" else params
 
-        if not chunks:
-            return ProcessResult(cleaned, [], [], [], method="jaccard")
+    def _fit_index(self, chunks: List[str]):
+        """Fit the configured ranker, degrading tfidf -> bm25 -> None (jaccard).
 
-        method = "tfidf"
-        if _TFIDF_OK:
+        "dense" fits hashed n-gram vectors (utils.dense_index); "hybrid" fuses them with
+        the lexical index (TF-IDF, or BM25 without scikit-learn).
+        """
+        if not chunks or self.ranker == "jaccard":
+            return None
+        if self.ranker in ("dense", "hybrid"):
             try:
-                corpus = chunks + [question]
-                vec = TfidfVectorizer(stop_words="english")
-                X = vec.fit_transform(corpus)
-                q_vec, doc_vecs = X[-1], X[:-1]
-                scores = cosine_similarity(doc_vecs, q_vec).ravel()
-                order = scores.argsort()[::-1].tolist()
+                from utils.dense_index import DenseIndex, HybridIndex
+                dense = DenseIndex.fit(chunks)
             except Exception:
+                return self._fit_lexical(chunks)
+            lexical = self._fit_lexical(chunks) if self.ranker == "hybrid" else None
+            return HybridIndex(lexical, dense) if lexical is not None else dense
+        return self._fit_lexical(chunks)
+
+    def _fit_lexical(self, chunks: List[str]):
+        if self.ranker != "bm25" and _document_index_cls() is not None:
+            try:
+                return _document_index_cls().fit(chunks)
+            except Exception:
+                pass
+        try:
+            from utils.bm25 import BM25Index
+            return BM25Index.fit(chunks)
+        except Exception:
+            return None
+
+    def _chunk_spans(self, cleaned: str) -> List[Tuple[int, int]]:
+        if self.chunking == "tokens":
+            return token_chunk_spans(cleaned, max_tokens=self.max_tokens, overlap_tokens=self.overlap_tokens,
+                                     max_total_chars=None, max_chunks=None)
+        if self.chunking == "content":
+            return content_chunk_spans(cleaned, max_chars=self.max_chars, overlap=self.overlap)
+        return chunk_spans(cleaned, max_chars=self.max_chars, overlap=self.overlap,
+                           max_total_chars=None, max_chunks=None)
+
+    def prepare(self, text: str, url: str = "", title: Optional[str] = None) -> IndexedDocument:
+        """Question-independent work: clean, chunk and fit the ranking index once per page.
+
+        The whole text is chunked. The document keeps the cleaned text and an int32
+        array of chunk offsets, never the chunk strings. Past `stream_above` characters
+        no index or sentence index is built either (a streamed document).
+        """
+        tr = metrics.current()
+        with tr.stage("clean"):
+            cleaned = clean_text(text)
+        with tr.stage("chunk"):
+            streamed = len(cleaned) > self.stream_above
+            spans, signatures = span_array(self._chunk_spans(cleaned)), None
+            if not streamed:
+                spans, signatures = self._unique_spans(cleaned, spans)
+            doc = IndexedDocument(url=url, title=title, cleaned_text=cleaned, spans=spans, streamed=streamed,
+                                  signatures=signatures)
+        return self._index(doc)
+
+    def update(self, previous: IndexedDocument, text: str, url: str = "", title: Optional[str] = None) -> IndexedDocument:
+        """`prepare` for a new version of a page, reusing the work done for `previous`.
+
+        Identical cleaned text returns `previous` as is. Otherwise the new text is
+        chunked, and chunks found verbatim in `previous` keep their MinHash signatures
+        and term vectors: only added chunks are hashed and tokenized, and document
+        statistics (df, idf, lengths) are recomputed from the stored vectors. Chunks
+        and rankings are those of `prepare(text)`. With "content" chunking an edit only
+        changes the chunks around it; fixed windows shift every chunk after an
+        insertion. Streamed documents and crawled sites are prepared from scratch, and
+        so is the index of the dense rankers.
+        """
+        tr = metrics.current()
+        if previous.streamed or previous.sources:
+            return self.prepare(text, url=url, title=title)
+        with tr.stage("clean"):
+            cleaned = clean_text(text)
+        if cleaned == previous.cleaned_text:
+            tr.add("reindex_unchanged")
+            return replace(previous, url=url, title=title)
+        if len(cleaned) > self.stream_above:
+            return self.prepare(cleaned, url=url, title=title)
+
+        with tr.stage("chunk"):
+            spans = span_array(self._chunk_spans(cleaned))
+            old_rows = {chunk: i for i, chunk in enumerate(previous.chunks)}
+            reuse = [old_rows.get(chunk, -1) for chunk in ChunkView(cleaned, spans)]
+            known = None
+            if previous.signatures is not None:
+                known = {i: previous.signatures[r] for i, r in enumerate(reuse) if r >= 0}
+            keep, signatures = self._unique(ChunkView(cleaned, spans), known)
+            spans, reuse = spans[keep], [reuse[i] for i in keep]
+        reused = sum(r >= 0 for r in reuse)
+        tr.add("chunks_reused", reused)
+        tr.add("chunks_added", len(reuse) - reused)
+        tr.add("chunks_removed", len(previous.spans) - len({r for r in reuse if r >= 0}))
+
+        doc = IndexedDocument(url=url, title=title, cleaned_text=cleaned, spans=spans, signatures=signatures)
+        tr.add("chunks", len(spans))
+        with tr.stage("vectorize"):
+            doc.index = self._update_index(previous.index, reuse, doc.chunks)
+        with tr.stage("snippets"):
+            if previous.sentences is not None:
+                doc.sentences = previous.sentences.updated(previous.cleaned_text, cleaned)
+            else:
+                from utils.sentence_index import SentenceIndex
+                doc.sentences = SentenceIndex.build(cleaned)
+        return doc
+
+    def _update_index(self, previous, reuse: List[int], chunks: Sequence[str]):
+        """`previous.updated(...)` if it is the lexical index `_fit_index` would build, else a fresh fit."""
+        from utils.bm25 import BM25Index
+        if chunks and self.ranker in ("tfidf", "bm25"):
+            cls = BM25Index if self.ranker == "bm25" or _document_index_cls() is None else _document_index_cls()
+            if type(previous) is cls:
+                try:
+                    return previous.updated(reuse, chunks)
+                except Exception:
+                    pass
+        return self._fit_index(chunks)
+
+    def prepare_site(self, pages: Sequence, url: str = "", title: Optional[str] = None) -> IndexedDocument:
+        """Several pages (anything with .url, .title and .text) as one document with one index.
+
+        Each page is cleaned and chunked on its own, so no chunk spans two pages; the
+        texts are then joined and `sources` records where each page starts. Pages that
+        nearly duplicate an earlier page are left out, then so are repeated chunks
+        (navigation, banners, footers) across the whole site.
+        """
+        tr = metrics.current()
+        with tr.stage("clean"):
+            texts = [clean_text(page.text) for page in pages]
+        parts, spans, sources, offset = [], [], [], 0
+        with tr.stage("chunk"):
+            dropped = set()
+            if self.dedup_threshold:
+                from utils.near_dup import near_duplicates
+                dropped = set(near_duplicates(texts, self.dedup_threshold))
+                tr.add("pages_deduped", len(dropped))
+            for i, (page, text) in enumerate(zip(pages, texts)):
+                if not text or i in dropped:
+                    continue
+                sources.append((offset, page.url, page.title))
+                spans.extend((s + offset, e + offset) for s, e in self._chunk_spans(text))
+                parts.append(text)
+                offset += len(text) + len(_PAGE_SEP)
+            cleaned = _PAGE_SEP.join(parts)
+            spans, signatures = span_array(spans), None
+            streamed = len(cleaned) > self.stream_above
+            if not streamed:
+                spans, signatures = self._unique_spans(cleaned, spans)
+            doc = IndexedDocument(url=url, title=title, cleaned_text=cleaned, spans=spans, streamed=streamed,
+                                  sources=sources, signatures=signatures)
+        return self._index(doc)
+
+    def unique(self, chunks: Sequence[str]) -> List[int]:
+        """Indices of `chunks` minus near-duplicates of earlier ones (first occurrence kept)."""
+        if not self.dedup_threshold or len(chunks) < 2:
+            return list(range(len(chunks)))
+        from utils.near_dup import unique_indices
+        keep = unique_indices(chunks, self.dedup_threshold)
+        metrics.current().add("chunks_deduped", len(chunks) - len(keep))
+        return keep
+
+    def _unique(self, chunks: Sequence[str], known=None):
+        """(`unique(chunks)`, the kept chunks' MinHash signatures or None), hashing only chunks not in `known`."""
+        if not self.dedup_threshold or len(chunks) < 2:
+            return list(range(len(chunks))), None
+        from utils.near_dup import unique_signed
+        keep, signatures = unique_signed(chunks, self.dedup_threshold, known)
+        metrics.current().add("chunks_deduped", len(chunks) - len(keep))
+        return keep, signatures
+
+    def _unique_spans(self, text: str, spans):
+        keep, signatures = self._unique(ChunkView(text, spans))
+        return spans[keep], signatures
+
+    def distinct(self, chunks: Sequence[str], order: List[int], k: int) -> List[int]:
+        """The first `k` of `order` with near-duplicates of better-ranked chunks skipped."""
+        if not self.dedup_threshold:
+            return order[:k]
+        from utils.near_dup import LSHIndex, MinHasher
+        hasher, seen, out = MinHasher(), LSHIndex(self.dedup_threshold), []
+        for i in order:
+            sig = hasher.signature(chunks[i])
+            if seen.query(sig):
+                continue
+            seen.add(i, sig)
+            out.append(i)
+            if len(out) == k:
+                break
+        return out
+
+    def _index(self, doc: IndexedDocument) -> IndexedDocument:
+        from utils.sentence_index import SentenceIndex
+        tr = metrics.current()
+        tr.add("chunks", len(doc.spans))
+        if doc.streamed:
+            return doc
+        with tr.stage("vectorize"):
+            doc.index = self._fit_index(doc.chunks)
+        with tr.stage("snippets"):
+            doc.sentences = SentenceIndex.build(doc.cleaned_text)
+        return doc
+
+    def rank(self, doc: IndexedDocument, question: str) -> ProcessResult:
+        """Per-question work against a prepared document."""
+        return self.rank_many(doc, [question])[0]
+
+    def rank_many(self, doc: IndexedDocument, questions: List[str]) -> List[ProcessResult]:
+        """Rank every question against the fitted index in one batched pass."""
+        from utils.bm25 import top_k_indices
+        from utils.sentence_index import SentenceIndex
+        chunks = doc.chunks
+        if not chunks:
+            return [ProcessResult(doc.cleaned_text, [], [], [], method="jaccard") for _ in questions]
+        if doc.streamed:
+            return self._rank_streamed(doc, questions)
+
+        tr = metrics.current()
+        with tr.stage("rank"):
+            if doc.index is not None:
+                method = doc.index.method
+                try:
+                    scores = doc.index.score_many(questions)
+                    orders = [top_k_indices(scores[:, j], self.top_k) for j in range(len(questions))]
+                except Exception:
+                    method = "jaccard"
+                    orders = [simple_rank_chunks(chunks, q) for q in questions]
+            else:
                 method = "jaccard"
-                order = simple_rank_chunks(chunks, question)
-        else:
-            method = "jaccard"
-            order = simple_rank_chunks(chunks, question)
-
-        top_ids = order[: self.top_k]
-        highlights = extract_snippets(cleaned, question, k=self.top_k)
-        return ProcessResult(cleaned, chunks, highlights, top_ids, method)
+                orders = [simple_rank_chunks(chunks, q) for q in questions]
+
+        results = []
+        with tr.stage("snippets"):
+            if doc.sentences is None:
+                doc.sentences = SentenceIndex.build(doc.cleaned_text)
+            for question, order in zip(questions, orders):
+                top_ids = order[: self.top_k]
+                spans = doc.sentences.highlight(question, k=self.top_k)
+                highlights = [doc.cleaned_text[s:e][:240] for s, e in spans]
+                results.append(ProcessResult(doc.cleaned_text, chunks, highlights, top_ids, method, highlight_spans=spans))
+        return results
+
+    def _rank_streamed(self, doc: IndexedDocument, questions: List[str]) -> List[ProcessResult]:
+        """Rank a streamed document: one pass per batch, O(top_k) chunk strings in memory."""
+        from utils.stream_rank import highlight_in_spans, stream_top_k
+        method = "jaccard" if self.ranker == "jaccard" else "bm25"
+        tr = metrics.current()
+        with tr.stage("rank"):
+            # Streamed chunks were never de-duplicated, so over-fetch and drop repeats here.
+            extra = 2 if self.dedup_threshold else 1
+            orders = stream_top_k(doc.chunks, questions, self.top_k * extra, method=method)
+            orders = [self.distinct(doc.chunks, order, self.top_k) for order in orders]
+        results = []
+        with tr.stage("snippets"):
+            for question, top_ids in zip(questions, orders):
+                spans = highlight_in_spans(doc.cleaned_text, doc.spans[top_ids].tolist(), question, k=self.top_k)
+                highlights = [doc.cleaned_text[s:e][:240] for s, e in spans]
+                results.append(ProcessResult(doc.cleaned_text, doc.chunks, highlights, top_ids, method,
+                                             highlight_spans=spans))
+        return results
+
+    def rank_chunks(self, chunks: List[str], question: str) -> Tuple[List[int], str]:
+        """Rank an ad-hoc chunk list (e.g. merged from several pages) with one shared index."""
+        from utils.bm25 import top_k_indices
+        index = self._fit_index(chunks)
+        if index is not None:
+            try:
+                return top_k_indices(index.score(question), self.top_k), index.method
+            except Exception:
+                pass
+        return simple_rank_chunks(chunks, question)[: self.top_k], "jaccard"
+
+    def process(self, text: str, question: str) -> ProcessResult:
+        return self.rank(self.prepare(text), question)
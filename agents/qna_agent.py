@@ -1,26 +1,168 @@
 import os
-from dataclasses import dataclass
-from typing import List, Optional
-from dataclass import QnAResult
+import threading
+import time
+from dataclasses import dataclass, replace
+from email.utils import parsedate_to_datetime
+from functools import lru_cache
+from typing import Any, Callable, Dict, Generator, Iterator, List, Optional, Tuple
+from dataclass import BatchStats, QnAResult
+from utils import metrics
+from utils.llm_cache import ResponseCache, response_key
+from utils.rate_limit import LLMRateLimiter, default_limiter
+from utils.single_flight import Abandoned, SingleFlight
+from utils.token_utils import count_tokens
 
 class LLMUnavailableError(RuntimeError):
-    pass
+    def __init__(self, message: str, reason: str = "llm_error"):
+        super().__init__(message)
+        self.reason = reason  # short label for metrics: sdk_missing | no_api_key | llm_error
+
+def _record_usage(tr, resp) -> int:
+    """Count one LLM call and its token usage on the trace; returns total tokens (0 if unknown)."""
+    tr.add("llm_calls")
+    return _record_tokens(tr, getattr(resp, "usage", None))
+
+def _record_tokens(tr, usage) -> int:
+    tr.add("prompt_tokens", getattr(usage, "prompt_tokens", 0) or 0)
+    tr.add("completion_tokens", getattr(usage, "completion_tokens", 0) or 0)
+    return getattr(usage, "total_tokens", 0) or 0
+
+# Identical prompts in flight at the same time (several sessions asking the same thing)
+# share one request, keyed like the response cache.
+_IN_FLIGHT = SingleFlight("inflight_llm")
+
+def _shared(res: QnAResult) -> QnAResult:
+    """A result another caller's request produced: no call was sent for this one."""
+    return replace(res, cached=True)
+
+def _note_fallback(exc: BaseException) -> None:
+    tr = metrics.current()
+    tr.set("fallback_reason", getattr(exc, "reason", None) or "llm_error")
+    tr.set("fallback_detail", str(exc)[:200])
+
+def _lead(text: str, sentences: int = 2, max_chars: int = 400) -> str:
+    """First sentences of `text`, as a stand-in summary when the LLM is unavailable."""
+    import re
+    return " ".join(re.split(r"(?<=[.!?])\s+", text.strip())[:sentences])[:max_chars]
+
+class BatchFormatError(ValueError):
+    """The model's reply to a batched prompt was not the JSON we asked for."""
+
+@lru_cache(maxsize=1)
+def _batch_schema():
+    """Pydantic model for batched replies, built on first use to keep pydantic off the import path."""
+    from pydantic import BaseModel
+
+    class _BatchAnswer(BaseModel):
+        id: int
+        answer: str
+
+    class _BatchAnswers(BaseModel):
+        answers: List[_BatchAnswer]
+
+    return _BatchAnswers
+
+# One OpenAI client (and so one HTTP connection pool) per (key, base_url) for the whole
+# process. Its own retries are disabled; `_create` retries with tenacity instead.
+_CLIENTS: Dict[Tuple[str, Optional[str]], Any] = {}
+_CLIENTS_LOCK = threading.Lock()
+_TRANSIENT_STATUS = {408, 409, 429}
+
+def _is_transient(exc: BaseException) -> bool:
+    status = getattr(exc, "status_code", None)
+    if status is not None:
+        return status in _TRANSIENT_STATUS or status >= 500
+    return type(exc).__name__ in ("APIConnectionError", "APITimeoutError")
+
+def _retry_after(exc: Optional[BaseException]) -> Optional[float]:
+    headers = getattr(getattr(exc, "response", None), "headers", None) or {}
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        value = headers.get("retry-after")
+        if not value:
+            return None
+        try:
+            return float(value)
+        except ValueError:
+            return parsedate_to_datetime(value).timestamp() - time.time()
+    except (TypeError, ValueError):
+        return None
+
+class _wait_retry_after:
+    """Honour the server's Retry-After when present, else jittered exponential backoff (a tenacity wait)."""
+    def __init__(self, fallback: Callable[[Any], float], cap: float = 60.0):
+        self.fallback = fallback
+        self.cap = cap
+
+    def __call__(self, retry_state) -> float:
+        exc = retry_state.outcome.exception() if retry_state.outcome else None
+        delay = _retry_after(exc)
+        if delay is None:
+            return self.fallback(retry_state)
+        return min(max(delay, 0.0), self.cap)
+
+class AnswerStream:
+    """Iterate for answer text deltas; once exhausted, `result` holds the assembled result.
+
+    Wraps a generator that yields deltas and *returns* a QnAResult; `then` can turn that
+    into a richer result (e.g. an OrchestratorResult).
+    """
+    def __init__(self, gen: Generator[str, None, QnAResult], then: Optional[Callable[[QnAResult], Any]] = None):
+        self._gen = gen
+        self._then = then
+        self.result: Any = None
+
+    def __iter__(self) -> Iterator[str]:
+        qres = yield from self._gen
+        self.result = self._then(qres) if self._then else qres
 
 class QnAAgent:
-    def __init__(self, model: Optional[str] = None):
+    system_prompt = "Answer concisely and cite relevant quotes."
+    temperature = 0.2
+
+    expected_completion_tokens = 400  # reserved per call until the real usage is known
+    max_attempts = 4
+    coalesce_timeout = 120.0  # seconds to wait on an identical in-flight request before falling back
+
+    def __init__(self, model: Optional[str] = None, cache: Optional[ResponseCache] = None,
+                 limiter: Optional[LLMRateLimiter] = None):
         self.model = model or os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+        self.cache = cache
+        self.limiter = limiter or default_limiter()
 
     def _openai_client(self):
         try:
             from openai import OpenAI
         except Exception as e:
-            raise LLMUnavailableError("OpenAI SDK not installed") from e
+            raise LLMUnavailableError("OpenAI SDK not installed", reason="sdk_missing") from e
         key = os.getenv("OPENAI_API_KEY")
         # If no key, we treat it as unavailable so the caller can fall back.
         if not key:
-            raise LLMUnavailableError("OPENAI_API_KEY not configured")
-        # OpenAI() will pull key from env by default, but we pass explicitly for clarity.
-        return OpenAI(api_key=key)
+            raise LLMUnavailableError("OPENAI_API_KEY not configured", reason="no_api_key")
+        base_url = os.getenv("OPENAI_BASE_URL") or None
+        with _CLIENTS_LOCK:
+            client = _CLIENTS.get((key, base_url))
+            if client is None:
+                client = _CLIENTS[(key, base_url)] = OpenAI(api_key=key, base_url=base_url, max_retries=0)
+            return client
+
+    def _estimate_tokens(self, prompt: str, system: Optional[str] = None) -> int:
+        return count_tokens(system or self.system_prompt) + count_tokens(prompt) + self.expected_completion_tokens
+
+    def _create(self, client, prompt: str, system: Optional[str] = None, **kwargs):
+        """chat.completions.create with jittered exponential backoff on 429/5xx/connection errors."""
+        from tenacity import Retrying, retry_if_exception, stop_after_attempt, wait_random_exponential
+        for attempt in Retrying(
+            stop=stop_after_attempt(self.max_attempts),
+            wait=_wait_retry_after(wait_random_exponential(multiplier=0.5, max=20)),
+            retry=retry_if_exception(_is_transient),
+            reraise=True,
+        ):
+            with attempt:
+                return client.chat.completions.create(
+                    model=self.model, messages=self._messages(prompt, system), temperature=self.temperature, **kwargs,
+                )
 
     def _build_prompt(self, question: str, context_chunks: List[str]) -> str:
         context = "\n\n".join([f"[Context {i+1}] {c}" for i, c in enumerate(context_chunks)])
@@ -32,26 +174,318 @@ class QnAAgent:
             f"Context:\n{context}\n\nQuestion: {question}\nAnswer:"
         )
 
+    def _join(self, key: str, call: Callable[[], Any]) -> Any:
+        """`call()`, or the outcome of an identical request already in flight (marked cached)."""
+        try:
+            res, joined = _IN_FLIGHT.do(key, call, timeout=self.coalesce_timeout)
+        except TimeoutError as e:
+            raise LLMUnavailableError(str(e), reason="coalesce_timeout") from e
+        if not joined:
+            return res
+        return [_shared(r) for r in res] if isinstance(res, list) else _shared(res)
+
     def ask_llm(self, question: str, context_chunks: List[str]) -> QnAResult:
-        """Single attempt. If anything goes wrong, raise LLMUnavailableError so caller can fall back."""
-        client = self._openai_client()
+        """Retries transient errors; if it still fails, raise LLMUnavailableError so caller can fall back.
+
+        Identical (model, system, prompt, temperature) requests are served from `self.cache`,
+        or share the request if one is already in flight.
+        """
         prompt = self._build_prompt(question, context_chunks)
+        key = response_key(self.model, self.system_prompt, prompt, self.temperature)
+        tr = metrics.current()
+        if self.cache is not None:
+            cached = self.cache.get(key)
+            tr.cache("llm", cached is not None)
+            if cached is not None:
+                return QnAResult(answer=cached, reasoning=None, provider=f"openai:{self.model}", cached=True)
+        return self._join(key, lambda: self._ask_llm_uncached(prompt, key, cache=self.cache))
+
+    def _ask_llm_uncached(self, prompt: str, key: str, system: Optional[str] = None,
+                          cache: Optional[ResponseCache] = None) -> QnAResult:
+        tr = metrics.current()
+        client = self._openai_client()
         try:
-            resp = client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": "Answer concisely and cite relevant quotes."},
-                    {"role": "user", "content": prompt},
-                ],
-                temperature=0.2,
-            )
+            with tr.stage("llm"), self.limiter.slot(self._estimate_tokens(prompt, system)) as reservation:
+                resp = self._create(client, prompt, system=system)
+                reservation.settle(_record_usage(tr, resp))
         except Exception as e:
             # Treat any runtime failure as LLM unavailable to trigger fallback
             raise LLMUnavailableError(f"OpenAI call failed: {e}") from e
 
         content = resp.choices[0].message.content.strip()
+        if cache is not None:
+            cache.set(key, content)
         return QnAResult(answer=content, reasoning=None, provider=f"openai:{self.model}")
 
+    def _messages(self, prompt: str, system: Optional[str] = None) -> List[dict]:
+        return [
+            {"role": "system", "content": system or self.system_prompt},
+            {"role": "user", "content": prompt},
+        ]
+
+    # ---- batched answering: one call, shared context, JSON answers ----
+    batch_system_prompt = "Answer each numbered question concisely from the shared context. Reply with JSON only."
+
+    def _build_batch_prompt(self, questions: List[str], context_chunks: List[str]) -> str:
+        context = "\n\n".join([f"[Context {i+1}] {c}" for i, c in enumerate(context_chunks)])
+        numbered = "\n".join(f"{i+1}. {q}" for i, q in enumerate(questions))
+        return (
+            "You are a helpful assistant. Use the context to answer every question below.\n"
+            "- If an answer is not in the context, say you are unsure.\n"
+            "- Quote short snippets when useful.\n"
+            '- Reply with a JSON object {"answers": [{"id": <question number>, "answer": "<text>"}]} '
+            "containing exactly one entry per question.\n\n"
+            f"Context:\n{context}\n\nQuestions:\n{numbered}\n"
+        )
+
+    @staticmethod
+    def shared_context(contexts: List[List[str]]) -> List[str]:
+        """Union of per-question contexts, first occurrence order, each chunk once."""
+        return list(dict.fromkeys(c for ctx in contexts for c in ctx))
+
+    def batch_prompt_tokens(self, questions: List[str], contexts: List[List[str]]) -> int:
+        prompt = self._build_batch_prompt(questions, self.shared_context(contexts))
+        return count_tokens(self.batch_system_prompt) + count_tokens(prompt)
+
+    def separate_prompt_tokens(self, questions: List[str], contexts: List[List[str]]) -> int:
+        system = count_tokens(self.system_prompt)
+        return sum(system + count_tokens(self._build_prompt(q, c)) for q, c in zip(questions, contexts))
+
+    @staticmethod
+    def _parse_batch(content: str, n: int) -> List[str]:
+        from pydantic import ValidationError
+        try:
+            parsed = _batch_schema().model_validate_json(content)
+        except ValidationError as e:
+            raise BatchFormatError(str(e)) from e
+        by_id = {a.id: a.answer.strip() for a in parsed.answers}
+        if set(by_id) != set(range(1, n + 1)):
+            raise BatchFormatError(f"expected answers 1..{n}, got ids {sorted(by_id)}")
+        return [by_id[i] for i in range(1, n + 1)]
+
+    def ask_llm_batch(self, questions: List[str], context_chunks: List[str],
+                      stats: Optional[BatchStats] = None) -> List[QnAResult]:
+        """Answer all `questions` in one request over a shared context.
+
+        Raises BatchFormatError when the reply does not validate, LLMUnavailableError when
+        the call itself fails. Only validated replies are cached.
+        """
+        prompt = self._build_batch_prompt(questions, context_chunks)
+        key = response_key(self.model, self.batch_system_prompt, prompt, self.temperature)
+        provider = f"openai:{self.model}"
+        tr = metrics.current()
+        cached = self.cache.get(key) if self.cache is not None else None
+        if self.cache is not None:
+            tr.cache("llm", cached is not None)
+        if cached is not None:
+            try:
+                return [QnAResult(answer=a, reasoning=None, provider=provider, cached=True)
+                        for a in self._parse_batch(cached, len(questions))]
+            except BatchFormatError:
+                pass
+        return self._join(key, lambda: self._ask_llm_batch_uncached(questions, prompt, key, stats))
+
+    def _ask_llm_batch_uncached(self, questions: List[str], prompt: str, key: str,
+                                stats: Optional[BatchStats]) -> List[QnAResult]:
+        provider = f"openai:{self.model}"
+        tr = metrics.current()
+        client = self._openai_client()
+        estimate = (count_tokens(self.batch_system_prompt) + count_tokens(prompt)
+                    + self.expected_completion_tokens * len(questions))
+        started = time.perf_counter()
+        try:
+            with tr.stage("llm"), self.limiter.slot(estimate) as reservation:
+                resp = self._create(client, prompt, system=self.batch_system_prompt,
+                                    response_format={"type": "json_object"})
+                took = time.perf_counter() - started
+                reservation.settle(_record_usage(tr, resp))
+        except Exception as e:
+            raise LLMUnavailableError(f"OpenAI call failed: {e}") from e
+        if stats is not None:
+            stats.llm_calls += 1
+            stats.slowest_call_s = max(stats.slowest_call_s, round(took, 3))
+            stats.prompt_tokens += estimate - self.expected_completion_tokens * len(questions)
+
+        content = (resp.choices[0].message.content or "").strip()
+        answers = self._parse_batch(content, len(questions))
+        if self.cache is not None:
+            self.cache.set(key, content)
+        return [QnAResult(answer=a, reasoning=None, provider=provider) for a in answers]
+
+    def answer_batch(self, questions: List[str], contexts: List[List[str]],
+                     stats: Optional[BatchStats] = None) -> List[QnAResult]:
+        """One result per question, in order, from as few LLM calls as possible.
+
+        Questions share the union of their contexts. A reply that fails validation is split
+        in half and each half retried; a single question goes through `answer` as usual.
+        If the LLM is unavailable every question gets its heuristic fallback.
+        """
+        if len(questions) == 1:
+            started = time.perf_counter()
+            res = self.answer(questions[0], contexts[0])
+            if stats is not None and not res.cached and res.provider != "fallback":
+                stats.llm_calls += 1
+                stats.slowest_call_s = max(stats.slowest_call_s, round(time.perf_counter() - started, 3))
+                stats.prompt_tokens += self.separate_prompt_tokens(questions, contexts)
+            return [res]
+        try:
+            return self.ask_llm_batch(questions, self.shared_context(contexts), stats)
+        except LLMUnavailableError as e:
+            _note_fallback(e)
+            return [self.ask_fallback(q, c) for q, c in zip(questions, contexts)]
+        except BatchFormatError:
+            mid = len(questions) // 2
+            return (self.answer_batch(questions[:mid], contexts[:mid], stats)
+                    + self.answer_batch(questions[mid:], contexts[mid:], stats))
+
+    def _stream(self, question: str, context_chunks: List[str]) -> Generator[str, None, QnAResult]:
+        prompt = self._build_prompt(question, context_chunks)
+        key = response_key(self.model, self.system_prompt, prompt, self.temperature)
+        tr = metrics.current()
+        cached = self.cache.get(key) if self.cache is not None else None
+        if self.cache is not None:
+            tr.cache("llm", cached is not None)
+        if cached is not None:
+            yield cached
+            return QnAResult(answer=cached, reasoning=None, provider=f"openai:{self.model}", cached=True)
+
+        while True:
+            call, leading = _IN_FLIGHT.begin(key)
+            if leading:
+                break
+            try:  # someone is already asking this: show their answer when it is complete
+                res = _IN_FLIGHT.wait(call, self.coalesce_timeout)
+            except Abandoned:
+                continue
+            except Exception as e:
+                _note_fallback(e)
+                fb = self.ask_fallback(question, context_chunks)
+                yield fb.answer
+                return fb
+            yield res.answer
+            return _shared(res)
+        try:
+            qres = yield from self._stream_llm(question, context_chunks, prompt, key, call)
+        except BaseException:  # includes GeneratorExit when the reader stops early
+            if not call.done():
+                _IN_FLIGHT.abandon(key, call)
+            raise
+        if not call.done():  # fell back or was cut off: waiters fall back on their own
+            _IN_FLIGHT.finish(key, call, error=LLMUnavailableError("streamed LLM call did not complete"))
+        return qres
+
+    def _stream_llm(self, question: str, context_chunks: List[str], prompt: str, key: str,
+                    call) -> Generator[str, None, QnAResult]:
+        tr = metrics.current()
+        try:
+            client = self._openai_client()
+        except Exception as e:
+            _note_fallback(e)
+            fb = self.ask_fallback(question, context_chunks)
+            yield fb.answer
+            return fb
+
+        # The concurrency slot is held for as long as the stream is being consumed.
+        with tr.stage("llm"), self.limiter.slot(self._estimate_tokens(prompt)) as reservation:
+            tr.add("llm_calls")
+            try:
+                # The last event then carries the token usage (and no choices).
+                events = self._create(client, prompt, stream=True, stream_options={"include_usage": True})
+            except Exception as e:
+                # Nothing shown yet, so the heuristic answer can take over cleanly.
+                _note_fallback(e)
+                fb = self.ask_fallback(question, context_chunks)
+                yield fb.answer
+                return fb
+
+            parts: List[str] = []
+            finished = False
+            try:
+                for event in events:
+                    if getattr(event, "usage", None) is not None:
+                        reservation.settle(_record_tokens(tr, event.usage))
+                    if not event.choices:
+                        continue
+                    finished = finished or event.choices[0].finish_reason is not None
+                    delta = event.choices[0].delta.content
+                    if delta:
+                        parts.append(delta)
+                        yield delta
+                if not finished:  # the body ended without a finish_reason: the connection was cut
+                    raise LLMUnavailableError("LLM stream ended before the answer was complete")
+            except Exception as e:
+                if not parts:
+                    _note_fallback(e)
+                    fb = self.ask_fallback(question, context_chunks)
+                    yield fb.answer
+                    return fb
+                yield "\n\n(stream interrupted)"
+                return QnAResult(answer="".join(parts).strip(), reasoning="Stream interrupted; answer may be incomplete.",
+                                 provider=f"openai:{self.model}")
+
+        content = "".join(parts).strip()
+        if self.cache is not None and content:
+            self.cache.set(key, content)
+        qres = QnAResult(answer=content, reasoning=None, provider=f"openai:{self.model}")
+        _IN_FLIGHT.finish(key, call, qres)
+        return qres
+
+    def answer_stream(self, question: str, context_chunks: List[str]) -> AnswerStream:
+        """Like `answer`, but yields text deltas as the LLM produces them (same fallback rules)."""
+        return AnswerStream(self._stream(question, context_chunks))
+
+    # ---- map-reduce summaries: one call per section, then one to combine them ----
+    summary_system_prompt = "Summarize web page text faithfully and concisely, using only the text given."
+    summary_styles = {"bullet-5": "exactly 5 concise bullet points", "short-paragraph": "one short paragraph"}
+
+    def _build_section_prompt(self, text: str) -> str:
+        return (
+            "Summarize this part of a web page in 2-4 sentences.\n"
+            "- Keep concrete names, numbers, dates and decisions.\n"
+            "- Skip navigation, cookie notices and other boilerplate.\n\n"
+            f"Text:\n{text}\n\nSummary:"
+        )
+
+    def _build_reduce_prompt(self, partials: List[str], style: str, title: Optional[str]) -> str:
+        parts = "\n\n".join(f"[Part {i+1}] {p}" for i, p in enumerate(partials))
+        page = f' titled "{title}"' if title else ""
+        return (
+            f"Below are summaries of consecutive parts of one web page{page}.\n"
+            f"Combine them into a summary of the whole page as {self.summary_styles[style]}.\n"
+            "- Cover the page as a whole, not one part at a time.\n"
+            "- Use only what the part summaries say.\n\n"
+            f"Part summaries:\n{parts}\n\nSummary:"
+        )
+
+    def _summary_call(self, prompt: str, cache: Optional[ResponseCache]) -> QnAResult:
+        """One summary request, keyed by its prompt (so by the text summarised): cache, in-flight call, or LLM."""
+        key = response_key(self.model, self.summary_system_prompt, prompt, self.temperature)
+        if cache is not None:
+            cached = cache.get(key)
+            metrics.current().cache("summary", cached is not None)
+            if cached is not None:
+                return QnAResult(answer=cached, reasoning=None, provider=f"openai:{self.model}", cached=True)
+        return self._join(key, lambda: self._ask_llm_uncached(prompt, key, self.summary_system_prompt, cache))
+
+    def summarize_section(self, text: str, cache: Optional[ResponseCache] = None) -> QnAResult:
+        """Partial summary of one section (or of several joined partials); the lead sentences on failure."""
+        try:
+            return self._summary_call(self._build_section_prompt(text), cache)
+        except Exception as e:
+            _note_fallback(e)
+            return QnAResult(answer=_lead(text), reasoning="Leading sentences of the section.", provider="fallback")
+
+    def reduce_summaries(self, partials: List[str], style: str = "bullet-5", title: Optional[str] = None,
+                         cache: Optional[ResponseCache] = None) -> QnAResult:
+        """Final summary in `style` from partial summaries; the partials as a list if the LLM is unavailable."""
+        try:
+            return self._summary_call(self._build_reduce_prompt(partials, style, title), cache)
+        except Exception as e:
+            _note_fallback(e)
+            bullets = "\n".join(f"- {p}" for p in partials)
+            return QnAResult(answer=f"(Heuristic extract — set OPENAI_API_KEY for LLM summaries)\n\n{bullets}",
+                             reasoning="Partial summaries, uncombined.", provider="fallback")
+
     def ask_fallback(self, question: str, context_chunks: List[str]) -> QnAResult:
         import re
         q_words = set(re.findall(r"\w+", question.lower()))
@@ -72,8 +506,9 @@ class QnAAgent:
         )
 
     def answer(self, question: str, context_chunks: List[str]) -> QnAResult:
-        """Try LLM once; on *any* failure, gracefully fall back to heuristic."""
+        """Try the LLM (transient errors are retried); on any other failure fall back to heuristic."""
         try:
             return self.ask_llm(question, context_chunks)
-        except Exception:
+        except Exception as e:
+            _note_fallback(e)
             return self.ask_fallback(question, context_chunks)
@@ -0,0 +1,157 @@
+import os
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Callable, Dict, Optional, Tuple
+from urllib.parse import urldefrag, urlsplit, urlunsplit
+
+from agents.web_scrapper import UnsupportedContentError, WebScraperAgent, parse_html
+from dataclass import CrawledPage, CrawlEvent, CrawlResult, ScrapeResult
+from utils import metrics
+from utils.rate_limit import HostPoliteness
+
+# Links that are clearly not pages are dropped before any request; anything else that
+# turns out not to be HTML is rejected by the scraper from its Content-Type.
+_SKIP_EXTENSIONS = frozenset(
+    ".pdf .zip .gz .tgz .tar .bz2 .7z .png .jpg .jpeg .gif .svg .webp .ico .bmp .css .js .json .xml .rss "
+    ".mp3 .mp4 .m4a .avi .mov .webm .woff .woff2 .ttf .eot .exe .dmg .apk .iso .doc .docx .xls .xlsx .ppt .pptx"
+    .split())
+_DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+def normalize_url(url: str) -> Optional[str]:
+    """Canonical form used to de-duplicate links, or None for non-http(s) URLs.
+
+    Drops the fragment and a default port, lower-cases scheme and host and turns an
+    empty path into "/"; the query string is kept.
+    """
+    url, _ = urldefrag(url.strip())
+    try:
+        parts = urlsplit(url)
+        port = parts.port
+    except ValueError:
+        return None
+    scheme = parts.scheme.lower()
+    if scheme not in _DEFAULT_PORTS or not parts.hostname:
+        return None
+    netloc = parts.hostname.lower()
+    if port and port != _DEFAULT_PORTS[scheme]:
+        netloc = f"{netloc}:{port}"
+    return urlunsplit((scheme, netloc, parts.path or "/", parts.query, ""))
+
+
+def site_of(url: str) -> str:
+    """Host (and non-default port) without a leading "www."; the unit "same site" compares."""
+    netloc = urlsplit(url).netloc.lower()
+    return netloc[4:] if netloc.startswith("www.") else netloc
+
+
+def _looks_like_page(url: str) -> bool:
+    return os.path.splitext(urlsplit(url).path)[1].lower() not in _SKIP_EXTENSIONS
+
+
+class SiteCrawler:
+    """Breadth-first crawl of one site from a seed URL, within depth and page budgets.
+
+    Only links on the seed's site are followed (see `site_of`). Pages are fetched by a
+    thread pool through the shared scraper, so its per-host connection cap applies; on
+    top of that, request starts to a host are spaced by `host_delay` or the site's
+    robots.txt Crawl-delay, whichever is longer. URLs robots.txt disallows are never
+    requested and do not count against `max_pages`, which caps requests made.
+    """
+
+    def __init__(self, scraper: Optional[WebScraperAgent] = None, *, max_depth: int = 2, max_pages: int = 20,
+                 workers: int = 4, host_delay: float = 0.25, respect_robots: bool = True,
+                 robots_agent: str = "webqa"):
+        self.scraper = scraper or WebScraperAgent(keep_html=False)
+        self.max_depth = max_depth
+        self.max_pages = max_pages
+        self.workers = workers
+        self.politeness = HostPoliteness(host_delay)
+        self.respect_robots = respect_robots
+        self.robots_agent = robots_agent
+        self._robots: Dict[str, object] = {}
+        self._robots_lock = threading.Lock()
+
+    def _robots_for(self, url: str):
+        key = urlsplit(url).netloc.lower()
+        with self._robots_lock:
+            parser = self._robots.get(key)
+            if parser is None:
+                parser = self._robots[key] = self.scraper.robots(url, self.robots_agent)
+            return parser
+
+    def allowed(self, url: str) -> bool:
+        return not self.respect_robots or self._robots_for(url).can_fetch(self.robots_agent, url)
+
+    def _crawl_delay(self, url: str) -> Optional[float]:
+        if not self.respect_robots:
+            return None
+        delay = self._robots_for(url).crawl_delay(self.robots_agent)
+        return max(float(delay), self.politeness.min_interval) if delay else None
+
+    def _visit(self, url: str, tr) -> ScrapeResult:
+        with metrics.use(tr):  # pool threads do not inherit the caller's trace
+            self.politeness.wait(url, self._crawl_delay(url))
+            html, cache_status = self.scraper.download(url)
+            return parse_html(html, url, cache_status, keep_html=False, links=True)
+
+    def crawl(self, seed: str, on_progress: Optional[Callable[[CrawlEvent], None]] = None) -> CrawlResult:
+        """Crawl from `seed`; `on_progress` is called on this thread once per finished URL.
+
+        Pages come back in the order they finished, the seed first. A page that fails
+        or is not HTML is reported and skipped; it never stops the crawl.
+        """
+        start_url = normalize_url(seed)
+        if start_url is None:
+            raise ValueError(f"Not an http(s) URL: {seed!r}")
+        site = site_of(start_url)
+        tr = metrics.current()
+        started = time.perf_counter()
+        frontier = deque([(start_url, 0)])
+        seen = {start_url}
+        pages = []
+        counts: Counter = Counter()
+        requested = 0
+
+        def report(url: str, depth: int, status: str, detail: Optional[str] = None) -> None:
+            counts[status] += 1
+            if on_progress is not None:
+                on_progress(CrawlEvent(url=url, depth=depth, status=status, detail=detail, fetched=len(pages),
+                                       queued=len(frontier), budget=self.max_pages))
+
+        with ThreadPoolExecutor(max_workers=max(1, self.workers), thread_name_prefix="crawl") as pool:
+            running: Dict[Future, Tuple[str, int]] = {}
+            while frontier or running:
+                while frontier and len(running) < self.workers and requested < self.max_pages:
+                    url, depth = frontier.popleft()
+                    if not self.allowed(url):
+                        report(url, depth, "blocked", "robots.txt")
+                        continue
+                    running[pool.submit(self._visit, url, tr)] = (url, depth)
+                    requested += 1
+                if not running:
+                    break  # budget spent; whatever is left in the frontier is not crawled
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    url, depth = running.pop(fut)
+                    try:
+                        sres = fut.result()
+                    except UnsupportedContentError as e:
+                        report(url, depth, "skipped", str(e))
+                        continue
+                    except Exception as e:
+                        report(url, depth, "error", f"{type(e).__name__}: {e}")
+                        continue
+                    pages.append(CrawledPage(url=url, title=sres.title, text=sres.text, depth=depth))
+                    if depth < self.max_depth:
+                        for link in sres.links:
+                            link = normalize_url(link)
+                            if link and link not in seen and site_of(link) == site and _looks_like_page(link):
+                                seen.add(link)
+                                frontier.append((link, depth + 1))
+                    report(url, depth, "fetched")
+        tr.add("pages_crawled", len(pages))
+        return CrawlResult(seed=start_url, pages=pages, counts=dict(counts),
+                           elapsed_s=round(time.perf_counter() - started, 3))
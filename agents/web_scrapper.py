@@ -1,24 +1,246 @@
+from collections import OrderedDict
+from functools import lru_cache
 from dataclass import ScrapeResult
-from typing import Optional
+from utils import metrics
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urljoin, urlsplit
+import re
+import threading
 import requests #ignore
-from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+
+
+# Prefer lxml's C parser for speed; fall back to the pure-Python html.parser via bs4.
+# Both are imported on first parse, not at import time.
+@lru_cache(maxsize=1)
+def _lxml():
+    """(lxml.etree, lxml.html), or None when lxml is not installed."""
+    try:
+        from lxml import etree, html
+        return etree, html
+    except Exception:
+        return None
+
+
+# Process-wide pooled sessions (one per pool config), per-host slots and revalidation
+# validators, so every WebScraperAgent instance reuses warm keep-alive connections.
+_LOCK = threading.Lock()
+_SESSIONS: Dict[Tuple[int, int], requests.Session] = {}
+_HOST_SLOTS: Dict[Tuple[str, int], threading.BoundedSemaphore] = {}
+_VALIDATORS: "OrderedDict[str, dict]" = OrderedDict()
+_MAX_VALIDATORS = 256
+# A 304 is answered from the kept body, so the bound that matters is their total size
+# (characters): least recently used bodies go first, and a body over the budget is not kept.
+_MAX_VALIDATOR_CHARS = 32 * 1024 * 1024
+_validator_chars = 0
+
+
+def _shared_session(pool_connections: int, pool_maxsize: int) -> requests.Session:
+    key = (pool_connections, pool_maxsize)
+    with _LOCK:
+        session = _SESSIONS.get(key)
+        if session is None:
+            session = requests.Session()
+            # pool_block caps open connections per host at pool_maxsize.
+            adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize, pool_block=True)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _SESSIONS[key] = session
+        return session
+
+
+def _host_slot(url: str, limit: int) -> threading.BoundedSemaphore:
+    key = (urlsplit(url).netloc.lower(), limit)
+    with _LOCK:
+        slot = _HOST_SLOTS.get(key)
+        if slot is None:
+            slot = _HOST_SLOTS[key] = threading.BoundedSemaphore(limit)
+        return slot
+
+
+def _get_validator(url: str) -> Optional[dict]:
+    with _LOCK:
+        entry = _VALIDATORS.get(url)
+        if entry is not None:
+            _VALIDATORS.move_to_end(url)
+        return entry
+
+
+def _remember_validator(url: str, resp: requests.Response, html: str) -> None:
+    global _validator_chars
+    etag = resp.headers.get("ETag")
+    last_modified = resp.headers.get("Last-Modified")
+    with _LOCK:
+        old = _VALIDATORS.pop(url, None)
+        if old is not None:
+            _validator_chars -= len(old["html"])
+        if not (etag or last_modified) or len(html) > _MAX_VALIDATOR_CHARS:
+            return
+        _VALIDATORS[url] = {
+            "etag": etag,
+            "last_modified": last_modified,
+            "html": html,
+        }
+        _validator_chars += len(html)
+        while len(_VALIDATORS) > _MAX_VALIDATORS or _validator_chars > _MAX_VALIDATOR_CHARS:
+            _, evicted = _VALIDATORS.popitem(last=False)
+            _validator_chars -= len(evicted["html"])
+
+
+class UnsupportedContentError(ValueError):
+    pass
+
+
+_HTML_TYPES = ("text/html", "application/xhtml+xml", "text/plain")
+_META_CHARSET = re.compile(rb"""<meta[^>]+charset=["']?([\w.:-]+)""", re.I)
+
+
+def _decode(body: bytes, resp: requests.Response) -> str:
+    # Only trust an explicit charset; requests' text/* default of ISO-8859-1 mangles most pages.
+    encoding = None
+    if "charset=" in resp.headers.get("Content-Type", "").lower():
+        encoding = resp.encoding
+    if not encoding:
+        m = _META_CHARSET.search(body[:4096])
+        encoding = m.group(1).decode("ascii") if m else "utf-8"
+    try:
+        return body.decode(encoding, errors="replace")
+    except LookupError:
+        return body.decode("utf-8", errors="replace")
 
 
 class WebScraperAgent:
-    def __init__(self, timeout:int = 20, user_agent:Optional[str]= None) -> None:
+    def __init__(self, timeout:int = 20, user_agent:Optional[str]= None, pool_connections: int = 16,
+                 pool_maxsize: int = 8, max_per_host: int = 4, max_bytes: int = 5 * 1024 * 1024,
+                 keep_html: bool = True) -> None:
         self.timeout = timeout
         self.user_agent = user_agent or (
         "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.3"
         )
-    def fetch(self, url: str)-> ScrapeResult:
+        self.max_per_host = max_per_host
+        self.max_bytes = max_bytes
+        self.keep_html = keep_html
+        self.session = _shared_session(pool_connections, pool_maxsize)
+
+    def download(self, url: str) -> Tuple[str, str]:
+        """Return (html, cache_status), revalidating with stored ETag/Last-Modified when we have them.
+
+        The body is streamed and cut off at `max_bytes`; non-HTML responses are rejected
+        from their headers before any of the body is read.
+        """
         headers = {"User-Agent": self.user_agent}
-        resp= response = requests.get(url, headers=headers, timeout=self.timeout)
-        resp.raise_for_status()
-        html = resp.text
-        soup = BeautifulSoup(html, 'html.parser')
-        for tag in soup(['script', 'style', 'noscript']):
-            tag.decompose()
-        title = soup.title.string if soup.title else None
-        text = soup.get_text(separator='\n', strip=True)
-        text = "".join(text.split())
-        return ScrapeResult(url=url, html=html, text=text, title=title)
\ No newline at end of file
+        cached = _get_validator(url)
+        if cached:
+            if cached["etag"]:
+                headers["If-None-Match"] = cached["etag"]
+            if cached["last_modified"]:
+                headers["If-Modified-Since"] = cached["last_modified"]
+        with _host_slot(url, self.max_per_host):
+            with self.session.get(url, headers=headers, timeout=self.timeout, stream=True) as resp:
+                if resp.status_code == 304 and cached:
+                    metrics.current().cache("http", True)
+                    return cached["html"], "revalidated"
+                resp.raise_for_status()
+                ctype = resp.headers.get("Content-Type", "").split(";")[0].strip().lower()
+                if ctype and ctype not in _HTML_TYPES:
+                    raise UnsupportedContentError(f"Unsupported content type: {ctype}")
+                buf = bytearray()
+                for block in resp.iter_content(chunk_size=64 * 1024):
+                    buf += block
+                    if len(buf) >= self.max_bytes:
+                        del buf[self.max_bytes:]
+                        break
+                html = _decode(bytes(buf), resp)
+        tr = metrics.current()
+        tr.add("bytes_downloaded", len(buf))
+        if cached:
+            tr.cache("http", False)
+        _remember_validator(url, resp, html)
+        return html, ("network" if cached else "miss")
+
+    def robots(self, url: str, agent: str = "*"):
+        """Parsed robots.txt for `url`'s site (urllib.robotparser.RobotFileParser).
+
+        Follows RFC 9309: a missing file (4xx) allows everything; an unreachable
+        one (5xx or network error) disallows everything for now.
+        """
+        from urllib.robotparser import RobotFileParser
+        parts = urlsplit(url)
+        parser = RobotFileParser(f"{parts.scheme}://{parts.netloc}/robots.txt")
+        try:
+            with _host_slot(url, self.max_per_host):
+                resp = self.session.get(parser.url, headers={"User-Agent": self.user_agent}, timeout=self.timeout)
+        except requests.RequestException:
+            parser.disallow_all = True
+            return parser
+        if resp.status_code >= 500:
+            parser.disallow_all = True
+        elif resp.status_code >= 400:
+            parser.allow_all = True
+        else:
+            parser.parse(resp.text[: self.max_bytes].splitlines())
+        parser.modified()
+        return parser
+
+    def fetch(self, url: str)-> ScrapeResult:
+        html, cache_status = self.download(url)
+        return parse_html(html, url, cache_status, keep_html=self.keep_html)
+
+
+def parse_html(html: str, url: str, cache_status: str = "miss", keep_html: bool = True,
+               links: bool = False) -> ScrapeResult:
+    """CPU-bound half of `fetch`; module-level so it can run in a process pool.
+
+    Uses lxml's C parser when installed (no soup tree is built), else BeautifulSoup.
+    With `links`, the absolute targets of the page's <a href>s are collected too
+    (rel="nofollow" ones excluded), resolved against <base href> when present.
+    """
+    if _lxml() is not None:
+        title, text, hrefs = _extract_lxml(html, links)
+    else:
+        title, text, hrefs = _extract_soup(html, links)
+    text = " ".join(text.split())
+    if hrefs:
+        base = urljoin(url, hrefs[0]) if hrefs[0] is not None else url
+        hrefs = [urljoin(base, h.strip()) for h in hrefs[1:]]
+    return ScrapeResult(url=url, html=html if keep_html else None, text=text, title=title, cache_status=cache_status,
+                        links=hrefs)
+
+
+def _followable(rel: Optional[str]) -> bool:
+    return "nofollow" not in (rel or "").lower().split()
+
+
+def _extract_lxml(html: str, links: bool = False) -> Tuple[Optional[str], str, List[Optional[str]]]:
+    """(title, text, [base href or None, *hrefs]); the href list is empty unless `links`."""
+    etree, lxml_html = _lxml()
+    # Feed bytes so pages carrying an XML encoding declaration are accepted.
+    parser = lxml_html.HTMLParser(encoding="utf-8", remove_comments=True)
+    try:
+        root = lxml_html.document_fromstring(html.encode("utf-8", errors="replace"), parser=parser)
+    except (etree.ParserError, ValueError):
+        return None, "", []
+    hrefs: List[Optional[str]] = []
+    if links:
+        base = root.find(".//base[@href]")
+        hrefs = [base.get("href") if base is not None else None]
+        hrefs += [a.get("href") for a in root.iter("a") if a.get("href") and _followable(a.get("rel"))]
+    etree.strip_elements(root, "script", "style", "noscript", with_tail=False)
+    title = root.findtext(".//title")
+    return title, " ".join(root.itertext()), hrefs
+
+
+def _extract_soup(html: str, links: bool = False) -> Tuple[Optional[str], str, List[Optional[str]]]:
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(html, 'html.parser')
+    hrefs: List[Optional[str]] = []
+    if links:
+        base = soup.find("base", href=True)
+        hrefs = [str(base["href"]) if base is not None else None]
+        hrefs += [str(a["href"]) for a in soup.find_all("a", href=True)
+                  if _followable(" ".join(a.get("rel") or []))]
+    for tag in soup(['script', 'style', 'noscript']):
+        tag.decompose()
+    title = soup.title.string if soup.title else None
+    title = str(title) if title is not None else None  # plain str: NavigableString drags the tree along when pickled
+    return title, soup.get_text(separator='\n', strip=True), hrefs
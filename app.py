@@ -1,309 +1,517 @@
-import os
-import json
-import time
-import traceback
-from dataclasses import asdict  
-import streamlit as st
-from dotenv import load_dotenv
-from orchestrator import OrchestratorAgent
-
-# ---------- Boot ----------
-load_dotenv()
-st.set_page_config(page_title="Agentic AI Web Q&A Assistent", page_icon="🕸️", layout="wide")
-
-# ---------- CSS ----------
-st.markdown("""
-<style>
-:root {
-  --grad: linear-gradient(135deg, #0ea5e9 0%, #8b5cf6 40%, #ec4899 100%);
-  --panel: rgba(255,255,255,0.03);
-  --border: rgba(255,255,255,0.08);
-  --muted: #9aa4af;
-}
-html, body, [data-testid="stAppViewContainer"] {
-  background: radial-gradient(1100px 760px at 8% -10%, rgba(14,165,233,0.12), transparent 60%),
-              radial-gradient(1200px 900px at 100% 0%, rgba(236,72,153,0.10), transparent 60%);
-}
-.hero {
-  padding: 20px 22px; 
-  border-radius: 16px; 
-  background: var(--grad); 
-  color: #fff !important;
-  text-align: center;   /* ✅ Center align hero content */
-  box-shadow: 0 10px 30px rgba(0,0,0,0.25);
-}
-.hero h1, .hero p { 
-  color: #fff !important; 
-  margin: 0 !important; 
-}
-.card { 
-  background: var(--panel); 
-  border: 1px solid var(--border); 
-  border-radius: 14px; 
-  padding: 16px; 
-}
-.badge {
-  display:inline-flex; 
-  gap:8px; 
-  align-items:center; 
-  padding:6px 10px; 
-  border-radius:10px;
-  border:1px solid var(--border); 
-  background:rgba(255,255,255,0.04); 
-  font-size:0.92rem;
-}
-.snip {
-  border-left: 3px solid #0ea5e9; 
-  background: rgba(255,255,255,0.03);
-  padding: 10px 12px; 
-  border-radius: 8px; 
-  margin-bottom: 8px;
-}
-.small { 
-  color: var(--muted); 
-  font-size: 0.92rem; 
-}
-textarea[placeholder*="Enter one question per line"] { 
-  font-family: ui-monospace, SFMono-Regular, Menlo, Monaco, Consolas, monospace; 
-}
-</style>
-""", unsafe_allow_html=True)
-
-# ---------- Header ----------
-st.markdown("""
-<div class="hero">
-  <h1>🕸️ Agentic AI Web Q&A Assistent</h1>
-  <p>Scrape → Clean → Highlight → Answer (LLM with fallback) • Multi-question • Summary • Caching</p>
-</div>
-""", unsafe_allow_html=True)
-st.write("")
-
-
-
-
-# ---------- Sidebar ----------
-api_key_status = "✅ Found" if os.getenv("OPENAI_API_KEY") else "⚠️ Missing (using fallback)"
-st.sidebar.header("⚙️ Settings")
-st.sidebar.write(f"LLM: {api_key_status}  |  Model: `{os.getenv('OPENAI_MODEL', 'gpt-4o-mini')}`")
-top_k = st.sidebar.slider("Top-K chunks", 1, 8, 3)
-max_chars = st.sidebar.slider("Chunk size (chars)", 600, 2400, 1200, step=100)
-overlap = st.sidebar.slider("Chunk overlap (chars)", 50, 300, 150, step=25)
-show_debug = st.sidebar.toggle("Show Debug tab", value=False)
-st.sidebar.markdown("---")
-if st.sidebar.button("🧹 Clear History", use_container_width=True):
-    st.session_state.pop("history", None)
-    st.toast("History cleared.", icon="🧽")
-
-# ---------- Cache layer (return dicts for pickling) ----------
-@st.cache_data(show_spinner=False, ttl=60*15)
-def cached_orchestrator_run(url: str, question: str, _top_k: int, _max_chars: int, _overlap: int):
-    from dataclasses import asdict
-    orch = OrchestratorAgent(top_k=_top_k, max_chars=_max_chars, overlap=_overlap)
-    res = orch.run(url, question)          # dataclass
-    plain = asdict(res)                    # dict
-    # ✅ force JSON-serializable only
-    return json.loads(json.dumps(plain))
-
-
-@st.cache_data(show_spinner=False, ttl=60*15)
-def cached_summarize(url: str, _top_k: int, _max_chars: int, _overlap: int):
-    orch = OrchestratorAgent(top_k=_top_k, max_chars=_max_chars, overlap=_overlap)
-    summary = orch.summarize(url)          # dict (but make it extra-safe)
-    return json.loads(json.dumps(summary))  # ✅ JSON round-trip
-
-
-@st.cache_data(show_spinner=False, ttl=60*15)
-def cached_answer_many(url: str, questions: tuple, _top_k: int, _max_chars: int, _overlap: int):
-    from dataclasses import asdict
-    orch = OrchestratorAgent(top_k=_top_k, max_chars=_max_chars, overlap=_overlap)
-    results = orch.answer_many(url, list(questions))   # list[dataclass]
-    plain_list = [asdict(r) for r in results]          # list[dict]
-    return json.loads(json.dumps(plain_list))          # ✅ JSON round-trip
-
-
-# ---------- Session ----------
-if "history" not in st.session_state:
-    st.session_state.history = []
-
-# ---------- Inputs ----------
-st.markdown("#### 🔍 Ask about a web page")
-c1, c2 = st.columns([1.6, 1.4], gap="large")
-with c1:
-    url = st.text_input("Web page URL", placeholder="https://example.com/article")
-with c2:
-    mode = st.radio("Mode", ["Single question", "Multiple questions", "Summarize page"], horizontal=True)
-
-if mode == "Single question":
-    question = st.text_area("Your question", placeholder="Ask something specific about the page...", height=120)
-elif mode == "Multiple questions":
-    questions_raw = st.text_area("Questions (one per line)", placeholder="Enter one question per line", height=140)
-else:
-    summary_style = st.selectbox("Summary style", ["bullet-5", "short-paragraph"], index=0)
-
-go = st.button("▶️ Run", type="primary")
-
-# ---------- Tabs ----------
-tabs = ["📋 Overview", "✅ Answers", "🔎 Highlights", "🧩 Context"]
-if show_debug:
-    tabs.append("🧪 Debug")
-t_over, t_ans, t_high, t_ctx, *rest = st.tabs(tabs)
-
-def log_history(entry):
-    st.session_state.history.insert(0, entry)
-
-def export_buttons(payload_dict, col1, col2):
-    with col1:
-        st.download_button("⬇️ Download (.txt)", data=payload_dict.get("text_export", ""),
-                           file_name="result.txt", mime="text/plain", use_container_width=True)
-    with col2:
-        st.download_button("⬇️ Download (.json)", data=json.dumps(payload_dict, ensure_ascii=False, indent=2),
-                           file_name="result.json", mime="application/json", use_container_width=True)
-
-# ---------- Run ----------
-if go:
-    if not url:
-        st.error("Please provide a URL.")
-    else:
-        try:
-            timestamp = time.strftime("%Y-%m-%d %H:%M:%S")
-
-            if mode == "Summarize page":
-                summary = cached_summarize(url, top_k, max_chars, overlap)
-                with t_over:
-                    if summary.get("title"):
-                        st.subheader(summary["title"])
-                    st.markdown(f"<div class='badge'>🔗 URL <span class='small'>({summary['url'][:48]}…)</span></div>", unsafe_allow_html=True)
-                    st.markdown(f"<div class='badge'>🤖 Provider <code>{summary['provider']}</code></div>", unsafe_allow_html=True)
-                    st.markdown(f"<div class='badge'>🕒 {timestamp}</div>", unsafe_allow_html=True)
-                    st.markdown("### 🧾 Summary")
-                    st.write(summary["summary"])
-                    ce1, ce2 = st.columns(2)
-                    export_buttons(
-                        {
-                            "url": summary["url"], "title": summary["title"],
-                            "summary": summary["summary"], "provider": summary["provider"],
-                            "top_chunk_indices": summary["top_chunk_indices"],
-                            "highlights": summary["highlights"], "total_chunks": summary["total_chunks"],
-                            "text_export": summary["summary"]
-                        },
-                        ce1, ce2
-                    )
-                with t_high:
-                    st.markdown("##### Top snippets")
-                    for i, h in enumerate(summary.get("highlights", []), 1):
-                        st.markdown(f"<div class='snip'><b>{i}.</b> {h}</div>", unsafe_allow_html=True)
-                with t_ctx:
-                    st.write(f"Top chunk indices: {summary['top_chunk_indices']} / total {summary['total_chunks']}")
-
-                log_history({
-                    "time": timestamp, "mode": "summary", "url": summary["url"], "title": summary["title"],
-                    "provider": summary["provider"]
-                })
-
-            elif mode == "Multiple questions":
-                qs = [q.strip() for q in (questions_raw or "").splitlines() if q.strip()]
-                if not qs:
-                    st.error("Please enter at least one question.")
-                else:
-                    results = cached_answer_many(url, tuple(qs), top_k, max_chars, overlap)  # list[dict]
-                    first = results[0]
-                    with t_over:
-                        if first.get("title"):
-                            st.subheader(first["title"])
-                        st.markdown(f"<div class='badge'>🔗 URL <span class='small'>({first['url'][:48]}…)</span></div>", unsafe_allow_html=True)
-                        st.markdown(f"<div class='badge'>🤖 Provider <code>{first['provider']}</code></div>", unsafe_allow_html=True)
-                        st.markdown(f"<div class='badge'>🧩 Context {first['top_chunk_indices']} / {first['total_chunks']}</div>", unsafe_allow_html=True)
-                        st.markdown(f"<div class='badge'>🕒 {timestamp}</div>", unsafe_allow_html=True)
-
-                    with t_ans:
-                        st.markdown("### Answers")
-                        for i, r in enumerate(results, 1):
-                            with st.expander(f"{i}. {qs[i-1]}", expanded=(i==1)):
-                                st.write(r["answer"])
-
-                        ce1, ce2 = st.columns(2)
-                        export_buttons(
-                            {
-                                "mode": "multi",
-                                "url": first["url"],
-                                "title": first["title"],
-                                "provider": first["provider"],
-                                "questions": qs,
-                                "answers": [r["answer"] for r in results],
-                                "top_chunk_indices": first["top_chunk_indices"],
-                                "total_chunks": first["total_chunks"],
-                                "text_export": "\n\n".join([f"Q{i+1}: {q}\nA{i+1}: {results[i]['answer']}" for i, q in enumerate(qs)])
-                            },
-                            ce1, ce2
-                        )
-
-                    with t_high:
-                        for i, h in enumerate(first.get("highlights", []), 1):
-                            st.markdown(f"<div class='snip'><b>{i}.</b> {h}</div>", unsafe_allow_html=True)
-                    with t_ctx:
-                        st.write(f"Top chunk indices: {first['top_chunk_indices']} / total {first['total_chunks']}")
-
-                    log_history({
-                        "time": timestamp, "mode": "multi", "url": first["url"], "title": first["title"], "provider": first["provider"],
-                        "num_questions": len(qs)
-                    })
-
-            else:  # Single question
-                res = cached_orchestrator_run(url, question, top_k, max_chars, overlap)  # dict
-
-                with t_over:
-                    if res.get("title"):
-                        st.subheader(res["title"])
-                    st.markdown(f"<div class='badge'>🔗 URL <span class='small'>({res['url'][:48]}…)</span></div>", unsafe_allow_html=True)
-                    st.markdown(f"<div class='badge'>🤖 Provider <code>{res['provider']}</code></div>", unsafe_allow_html=True)
-                    st.markdown(f"<div class='badge'>🧩 Context {res['top_chunk_indices']} / {res['total_chunks']}</div>", unsafe_allow_html=True)
-                    st.markdown(f"<div class='badge'>🕒 {timestamp}</div>", unsafe_allow_html=True)
-
-                with t_ans:
-                    st.markdown("### ✅ Answer")
-                    st.write(res["answer"])
-                    ce1, ce2 = st.columns(2)
-                    export_buttons(
-                        {
-                            "mode": "single",
-                            "url": res["url"], "title": res["title"], "provider": res["provider"],
-                            "top_chunk_indices": res["top_chunk_indices"], "total_chunks": res["total_chunks"],
-                            "highlights": res["highlights"],
-                            "answer": res["answer"],
-                            "text_export": res["answer"]
-                        },
-                        ce1, ce2
-                    )
-
-                with t_high:
-                    st.markdown("##### Top snippets")
-                    if res.get("highlights"):
-                        for i, h in enumerate(res["highlights"], 1):
-                            st.markdown(f"<div class='snip'><b>{i}.</b> {h}</div>", unsafe_allow_html=True)
-                    else:
-                        st.caption("No highlight snippets produced.")
-
-                with t_ctx:
-                    st.write(f"Top chunk indices: {res['top_chunk_indices']} / total {res['total_chunks']}")
-
-                log_history({
-                    "time": timestamp, "mode": "single", "url": res["url"], "title": res["title"], "provider": res["provider"]
-                })
-
-            st.success("Completed.")
-
-        except Exception as e:
-            st.error(f"Pipeline failed: {e}")
-            st.code(traceback.format_exc(), language="python")
-
-# ---------- History ----------
-st.markdown("---")
-st.markdown("### 🕘 Recent Runs")
-if st.session_state.history:
-    for i, h in enumerate(st.session_state.history[:6], 1):
-        with st.expander(f"{i}. {h['mode']} — {h.get('title') or '(untitled)'}", expanded=False):
-            st.caption(h["time"])
-            st.write(f"**URL:** {h['url']}")
-            st.write(f"**Provider:** {h['provider']}")
-else:
-    st.caption("No history yet. Run a query to see it here.")
+import os
+import json
+import time
+import traceback
+from dataclasses import asdict  
+import streamlit as st
+from dotenv import load_dotenv
+from orchestrator import OrchestratorAgent, start_warm_up
+from utils.doc_store import DocumentStore
+from utils import metrics
+from utils.llm_cache import SQLiteResponseCache
+
+# ---------- Boot ----------
+load_dotenv()
+st.set_page_config(page_title="Agentic AI Web Q&A Assistent", page_icon="🕸️", layout="wide")
+
+# ---------- CSS ----------
+st.markdown("""
+<style>
+:root {
+  --grad: linear-gradient(135deg, #0ea5e9 0%, #8b5cf6 40%, #ec4899 100%);
+  --panel: rgba(255,255,255,0.03);
+  --border: rgba(255,255,255,0.08);
+  --muted: #9aa4af;
+}
+html, body, [data-testid="stAppViewContainer"] {
+  background: radial-gradient(1100px 760px at 8% -10%, rgba(14,165,233,0.12), transparent 60%),
+              radial-gradient(1200px 900px at 100% 0%, rgba(236,72,153,0.10), transparent 60%);
+}
+.hero {
+  padding: 20px 22px; 
+  border-radius: 16px; 
+  background: var(--grad); 
+  color: #fff !important;
+  text-align: center;   /* ✅ Center align hero content */
+  box-shadow: 0 10px 30px rgba(0,0,0,0.25);
+}
+.hero h1, .hero p { 
+  color: #fff !important; 
+  margin: 0 !important; 
+}
+.card { 
+  background: var(--panel); 
+  border: 1px solid var(--border); 
+  border-radius: 14px; 
+  padding: 16px; 
+}
+.badge {
+  display:inline-flex; 
+  gap:8px; 
+  align-items:center; 
+  padding:6px 10px; 
+  border-radius:10px;
+  border:1px solid var(--border); 
+  background:rgba(255,255,255,0.04); 
+  font-size:0.92rem;
+}
+.snip {
+  border-left: 3px solid #0ea5e9; 
+  background: rgba(255,255,255,0.03);
+  padding: 10px 12px; 
+  border-radius: 8px; 
+  margin-bottom: 8px;
+}
+.small { 
+  color: var(--muted); 
+  font-size: 0.92rem; 
+}
+textarea[placeholder*="Enter one question per line"] { 
+  font-family: ui-monospace, SFMono-Regular, Menlo, Monaco, Consolas, monospace; 
+}
+</style>
+""", unsafe_allow_html=True)
+
+# ---------- Header ----------
+st.markdown("""
+<div class="hero">
+  <h1>🕸️ Agentic AI Web Q&A Assistent</h1>
+  <p>Scrape → Clean → Highlight → Answer (LLM with fallback) • Multi-question • Summary • Caching</p>
+</div>
+""", unsafe_allow_html=True)
+st.write("")
+
+
+
+
+# ---------- Sidebar ----------
+api_key_status = "✅ Found" if os.getenv("OPENAI_API_KEY") else "⚠️ Missing (using fallback)"
+st.sidebar.header("⚙️ Settings")
+st.sidebar.write(f"LLM: {api_key_status}  |  Model: `{os.getenv('OPENAI_MODEL', 'gpt-4o-mini')}`")
+top_k = st.sidebar.slider("Top-K chunks", 1, 8, 3)
+chunking = st.sidebar.radio("Chunking", ["chars", "tokens", "content"], horizontal=True,
+                            help="'tokens' packs whole sentences up to a token budget (tiktoken). 'content' "
+                                 "cuts where the text's rolling hash says so, so re-indexing an edited page "
+                                 "reuses its unchanged chunks.")
+if chunking == "tokens":
+    max_tokens = st.sidebar.slider("Chunk size (tokens)", 64, 1024, 256, step=32)
+    overlap_tokens = st.sidebar.slider("Chunk overlap (tokens)", 0, 128, 32, step=8)
+    max_chars, overlap = 1200, 150
+else:
+    max_chars = st.sidebar.slider("Chunk size (chars)", 600, 2400, 1200, step=100)
+    overlap = st.sidebar.slider("Chunk overlap (chars)", 50, 300, 150, step=25)
+    max_tokens, overlap_tokens = 256, 32
+ranker = st.sidebar.selectbox("Ranking", ["tfidf", "bm25", "jaccard", "dense", "hybrid"], index=0)
+crawl_site = st.sidebar.toggle("Crawl site", value=False,
+                               help="Follow same-site links from the URL and answer from every page found.")
+if crawl_site:
+    crawl_depth = st.sidebar.slider("Crawl depth (links)", 1, 4, 2)
+    crawl_pages = st.sidebar.slider("Crawl budget (pages)", 5, 100, 20, step=5)
+else:
+    crawl_depth, crawl_pages = 0, 20
+stream_answers = st.sidebar.toggle("Stream answers", value=True)
+show_debug = st.sidebar.toggle("Show Debug tab", value=False)
+st.sidebar.markdown("---")
+if st.sidebar.button("🧹 Clear History", use_container_width=True):
+    st.session_state.pop("history", None)
+    st.toast("History cleared.", icon="🧽")
+
+# ---------- Cache layer (return dicts for pickling) ----------
+# Scraped + indexed pages live in a process-wide, on-disk store keyed by (URL, chunking
+# params), so follow-up questions only pay for ranking and answering.
+@st.cache_resource(show_spinner=False)
+def get_document_store():
+    return DocumentStore()
+
+
+# LLM answers are cached on disk by (model, system prompt, prompt, temperature).
+@st.cache_resource(show_spinner=False)
+def get_llm_cache():
+    return SQLiteResponseCache()
+
+
+# Optional Prometheus scrape endpoint (WEBQA_METRICS_PORT), started once per process.
+@st.cache_resource(show_spinner=False)
+def start_metrics_endpoint():
+    port = os.getenv("WEBQA_METRICS_PORT")
+    return metrics.serve_prometheus(int(port)) if port else None
+
+
+start_metrics_endpoint()
+
+
+# Heavy libraries load lazily; import them on a background thread while the first page
+# renders so the first question doesn't pay for it (WEBQA_WARMUP=0 to skip).
+@st.cache_resource(show_spinner=False)
+def warm_up_in_background():
+    if os.getenv("WEBQA_WARMUP", "1").lower() in ("0", "false", "no", "off"):
+        return None
+    return start_warm_up(store=get_document_store())
+
+
+# One warm agent per settings combination, shared by every session: its pools, crawler
+# politeness and robots.txt cache are process-wide anyway, and per-call state lives in
+# locals and the metrics trace. Identical loads and LLM prompts in flight at the same
+# time are coalesced inside the orchestrator (utils.single_flight).
+@st.cache_resource(show_spinner=False, max_entries=32)
+def build_orchestrator(top_k: int, max_chars: int, overlap: int, ranker: str = "tfidf",
+                       chunking: str = "chars", max_tokens: int = 256, overlap_tokens: int = 32,
+                       crawl_depth: int = 0, crawl_pages: int = 20):
+    return OrchestratorAgent(top_k=top_k, max_chars=max_chars, overlap=overlap, ranker=ranker,
+                             chunking=chunking, max_tokens=max_tokens, overlap_tokens=overlap_tokens,
+                             store=get_document_store(), llm_cache=get_llm_cache(),
+                             crawl_depth=crawl_depth, crawl_max_pages=crawl_pages)
+
+
+class _NotCached(Exception):
+    """Raised by a lookup-only call of a cached function that has no entry (exceptions are not cached)."""
+
+
+@st.cache_data(show_spinner=False, ttl=60*15)
+def cached_orchestrator_run(url: str, question: str, _top_k: int, _max_chars: int, _overlap: int, ranker: str = "tfidf",
+        chunking: str = "chars", max_tokens: int = 256, overlap_tokens: int = 32, crawl_depth: int = 0,
+        crawl_pages: int = 20, _precomputed=None, _lookup_only: bool = False):
+    # A streamed run checks for an entry with `_lookup_only`, then passes its assembled
+    # result in `_precomputed` to seed the entry.
+    if _precomputed is not None:
+        return _precomputed
+    if _lookup_only:
+        raise _NotCached()
+    orch = build_orchestrator(_top_k, _max_chars, _overlap, ranker, chunking, max_tokens, overlap_tokens,
+                              crawl_depth, crawl_pages)
+    # asdict already deep-copies into plain dicts/lists; the result holds no document text.
+    return asdict(orch.run(url, question))
+
+
+@st.cache_data(show_spinner=False, ttl=60*15)
+def cached_summarize(url: str, _top_k: int, _max_chars: int, _overlap: int, ranker: str = "tfidf",
+        chunking: str = "chars", max_tokens: int = 256, overlap_tokens: int = 32, crawl_depth: int = 0,
+        crawl_pages: int = 20, style: str = "bullet-5", summary_mode: str = "top_k"):
+    orch = build_orchestrator(_top_k, _max_chars, _overlap, ranker, chunking, max_tokens, overlap_tokens,
+                              crawl_depth, crawl_pages)
+    return orch.summarize(url, style, summary_mode)  # plain dict
+
+
+@st.cache_data(show_spinner=False, ttl=60*15)
+def cached_answer_many(url: str, questions: tuple, _top_k: int, _max_chars: int, _overlap: int, ranker: str = "tfidf",
+        chunking: str = "chars", max_tokens: int = 256, overlap_tokens: int = 32, crawl_depth: int = 0,
+        crawl_pages: int = 20):
+    orch = build_orchestrator(_top_k, _max_chars, _overlap, ranker, chunking, max_tokens, overlap_tokens,
+                              crawl_depth, crawl_pages)
+    return [asdict(r) for r in orch.answer_many(url, list(questions))]
+
+
+# ---------- Session ----------
+if "history" not in st.session_state:
+    st.session_state.history = []
+
+# ---------- Inputs ----------
+st.markdown("#### 🔍 Ask about a web page")
+c1, c2 = st.columns([1.6, 1.4], gap="large")
+with c1:
+    url = st.text_input("Web page URL", placeholder="https://example.com/article")
+with c2:
+    mode = st.radio("Mode", ["Single question", "Multiple questions", "Summarize page"], horizontal=True)
+
+if mode == "Single question":
+    question = st.text_area("Your question", placeholder="Ask something specific about the page...", height=120)
+elif mode == "Multiple questions":
+    questions_raw = st.text_area("Questions (one per line)", placeholder="Enter one question per line", height=140)
+else:
+    summary_style = st.selectbox("Summary style", ["bullet-5", "short-paragraph"], index=0)
+    summary_mode = st.radio("Summarize", ["top_k", "map_reduce"], horizontal=True,
+                            format_func=lambda m: "Whole page (section by section)" if m == "map_reduce"
+                            else "Top chunks only (one call)",
+                            help="Whole page makes one LLM call per section of the page (up to 48) plus one "
+                                 "or more to combine them, so a long page costs many more calls and tokens "
+                                 "than the single call of Top chunks only.")
+
+go = st.button("▶️ Run", type="primary")
+
+# ---------- Tabs ----------
+tabs = ["📋 Overview", "✅ Answers", "🔎 Highlights", "🧩 Context"]
+if show_debug:
+    tabs.append("🧪 Debug")
+t_over, t_ans, t_high, t_ctx, *rest = st.tabs(tabs)
+
+def log_history(entry):
+    st.session_state.history.insert(0, entry)
+
+def export_buttons(payload_dict, col1, col2):
+    with col1:
+        st.download_button("⬇️ Download (.txt)", data=payload_dict.get("text_export", ""),
+                           file_name="result.txt", mime="text/plain", use_container_width=True)
+    with col2:
+        st.download_button("⬇️ Download (.json)", data=json.dumps(payload_dict, ensure_ascii=False, indent=2),
+                           file_name="result.json", mime="application/json", use_container_width=True)
+
+def render_debug(m):
+    """Stage timings, counters and exports for one run (`metrics` dict from the result)."""
+    if not rest:
+        return
+    with rest[0]:
+        if not m:
+            st.caption("Instrumentation is off (WEBQA_METRICS=0).")
+            return
+        st.markdown(f"##### Timings — `{m['operation']}` in {m['total_s'] * 1000:.0f} ms")
+        stages = [s for s in metrics.STAGES if s in m["stages"]] + [s for s in m["stages"] if s not in metrics.STAGES]
+        st.dataframe([{"stage": s, "ms": round(m["stages"][s] * 1000, 1)} for s in stages],
+                     hide_index=True, use_container_width=True)
+        st.markdown("##### Counters")
+        st.json({**m["counters"], **m["attributes"]}, expanded=True)
+        if not m["stages"].get("fetch") and m["counters"].get("cache_docstore_hits"):
+            st.caption("Page served from the document store; no fetch/parse/index this run.")
+        d1, d2 = st.columns(2)
+        with d1:
+            st.download_button("⬇️ Prometheus metrics (process)", data=metrics.REGISTRY.render_prometheus(),
+                               file_name="metrics.prom", mime="text/plain", use_container_width=True)
+        with d2:
+            st.download_button("⬇️ Trace spans (OTLP JSON)", data=json.dumps(metrics.to_otel_spans(m), indent=2),
+                               file_name="trace.json", mime="application/json", use_container_width=True)
+
+def crawl_site_with_progress(seed: str):
+    """Crawl and index the site up front, streaming progress; the answer paths then load it from the store."""
+    orch = build_orchestrator(top_k, max_chars, overlap, ranker, chunking, max_tokens, overlap_tokens,
+                              crawl_depth, crawl_pages)
+    with st.status("🕷️ Crawling site…", expanded=True) as status:
+        bar = st.progress(0.0)
+        log = st.empty()
+        lines = []
+
+        def on_progress(ev):
+            bar.progress(min(1.0, ev.fetched / max(ev.budget, 1)),
+                         text=f"{ev.fetched} pages fetched · {ev.queued} queued · budget {ev.budget}")
+            icon = {"fetched": "✅", "skipped": "⏭️", "blocked": "🚫", "error": "⚠️"}.get(ev.status, "•")
+            lines.insert(0, f"{icon} depth {ev.depth} — {ev.url}" + (f" ({ev.detail})" if ev.detail else ""))
+            log.markdown("\n\n".join(lines[:8]))
+
+        doc = orch.load(seed, on_progress=on_progress)
+        status.update(label=f"🕷️ Indexed {len(doc.sources or [])} pages · {len(doc.spans)} chunks",
+                      state="complete", expanded=False)
+
+
+def render_sources(sources):
+    if sources:
+        st.markdown("##### Sources")
+        for src in dict.fromkeys(sources):
+            st.markdown(f"- {src}")
+
+# ---------- Run ----------
+if go:
+    if not url:
+        st.error("Please provide a URL.")
+    else:
+        try:
+            timestamp = time.strftime("%Y-%m-%d %H:%M:%S")
+            if crawl_depth:
+                crawl_site_with_progress(url)
+
+            if mode == "Summarize page":
+                summary = cached_summarize(url, top_k, max_chars, overlap, ranker, chunking, max_tokens,
+                                           overlap_tokens, crawl_depth, crawl_pages, summary_style, summary_mode)
+                with t_over:
+                    if summary.get("title"):
+                        st.subheader(summary["title"])
+                    st.markdown(f"<div class='badge'>🔗 URL <span class='small'>({summary['url'][:48]}…)</span></div>", unsafe_allow_html=True)
+                    st.markdown(f"<div class='badge'>🤖 Provider <code>{summary['provider']}</code></div>", unsafe_allow_html=True)
+                    st.markdown(f"<div class='badge'>🕒 {timestamp}</div>", unsafe_allow_html=True)
+                    st.markdown("### 🧾 Summary")
+                    st.write(summary["summary"])
+                    ce1, ce2 = st.columns(2)
+                    export_buttons(
+                        {
+                            "url": summary["url"], "title": summary["title"],
+                            "summary": summary["summary"], "provider": summary["provider"],
+                            "top_chunk_indices": summary["top_chunk_indices"],
+                            "highlights": summary["highlights"], "total_chunks": summary["total_chunks"],
+                            "text_export": summary["summary"]
+                        },
+                        ce1, ce2
+                    )
+                sections = summary.get("sections") or []
+                with t_high:
+                    st.markdown("##### Section summaries" if sections else "##### Top snippets")
+                    for i, h in enumerate(summary.get("highlights", []), 1):
+                        st.markdown(f"<div class='snip'><b>{i}.</b> {h}</div>", unsafe_allow_html=True)
+                with t_ctx:
+                    if sections:
+                        reused = sum(1 for sec in sections if sec["cached"])
+                        st.write(f"Sections summarized: {len(sections)} ({reused} reused from earlier runs) "
+                                 f"/ total chunks {summary['total_chunks']}")
+                    else:
+                        st.write(f"Top chunk indices: {summary['top_chunk_indices']} / total {summary['total_chunks']}")
+                    render_sources(summary.get("sources"))
+
+                render_debug(summary.get("metrics"))
+
+                log_history({
+                    "time": timestamp, "mode": "summary", "url": summary["url"], "title": summary["title"],
+                    "provider": summary["provider"]
+                })
+
+            elif mode == "Multiple questions":
+                qs = [q.strip() for q in (questions_raw or "").splitlines() if q.strip()]
+                if not qs:
+                    st.error("Please enter at least one question.")
+                else:
+                    results = cached_answer_many(url, tuple(qs), top_k, max_chars, overlap, ranker,
+                                                 chunking, max_tokens, overlap_tokens, crawl_depth,
+                                                 crawl_pages)  # list[dict]
+                    first = results[0]
+                    with t_over:
+                        if first.get("title"):
+                            st.subheader(first["title"])
+                        st.markdown(f"<div class='badge'>🔗 URL <span class='small'>({first['url'][:48]}…)</span></div>", unsafe_allow_html=True)
+                        st.markdown(f"<div class='badge'>🤖 Provider <code>{first['provider']}</code></div>", unsafe_allow_html=True)
+                        st.markdown(f"<div class='badge'>🧩 Context {first['top_chunk_indices']} / {first['total_chunks']}</div>", unsafe_allow_html=True)
+                        st.markdown(f"<div class='badge'>🕒 {timestamp}</div>", unsafe_allow_html=True)
+
+                    with t_ans:
+                        st.markdown("### Answers")
+                        for i, r in enumerate(results, 1):
+                            with st.expander(f"{i}. {qs[i-1]}", expanded=(i==1)):
+                                st.write(r["answer"])
+                                st.caption(f"Context chunks: {r['top_chunk_indices']}")
+
+                        ce1, ce2 = st.columns(2)
+                        export_buttons(
+                            {
+                                "mode": "multi",
+                                "url": first["url"],
+                                "title": first["title"],
+                                "provider": first["provider"],
+                                "questions": qs,
+                                "answers": [r["answer"] for r in results],
+                                "top_chunk_indices": first["top_chunk_indices"],
+                                "total_chunks": first["total_chunks"],
+                                "text_export": "\n\n".join([f"Q{i+1}: {q}\nA{i+1}: {results[i]['answer']}" for i, q in enumerate(qs)])
+                            },
+                            ce1, ce2
+                        )
+
+                    with t_high:
+                        for i, h in enumerate(first.get("highlights", []), 1):
+                            st.markdown(f"<div class='snip'><b>{i}.</b> {h}</div>", unsafe_allow_html=True)
+                    with t_ctx:
+                        st.write(f"Top chunk indices: {first['top_chunk_indices']} / total {first['total_chunks']}")
+                        render_sources([src for r in results for src in r.get("sources", [])])
+
+                    if rest and first.get("batch"):
+                        with rest[0]:
+                            b = first["batch"]
+                            st.markdown("##### LLM dispatch")
+                            saved = b["separate_prompt_tokens"] - b["prompt_tokens"]
+                            d1, d2, d3, d4 = st.columns(4)
+                            d1.metric("Mode", b["mode"])
+                            d2.metric("LLM calls", b["llm_calls"], delta=b["llm_calls"] - b["questions"], delta_color="inverse",
+                                      help="Compared with one call per question")
+                            d3.metric("Prompt tokens (est.)", b["prompt_tokens"], delta=-saved, delta_color="inverse",
+                                      help=f"One call per question: {b['separate_prompt_tokens']}")
+                            if b["mode"] == "batched":
+                                d4.metric("Time", f"{b['elapsed_s']:.2f}s",
+                                          delta=f"{b['elapsed_s'] - b['separate_elapsed_s']:+.2f}s", delta_color="inverse",
+                                          help=f"One call per question (est.): {b['separate_elapsed_s']:.2f}s, the slowest "
+                                               f"call ({b['slowest_call_s']:.2f}s) times the rounds of concurrent calls")
+                            else:
+                                d4.metric("Time", f"{b['elapsed_s']:.2f}s",
+                                          help=f"Slowest call: {b['slowest_call_s']:.2f}s")
+                            st.caption(f"Answered {b['questions']} questions in {b['elapsed_s']:.2f}s "
+                                       f"({b['questions'] - b['llm_calls']} round trips saved).")
+                            st.json(b, expanded=False)
+                    render_debug(first.get("metrics"))
+
+                    log_history({
+                        "time": timestamp, "mode": "multi", "url": first["url"], "title": first["title"], "provider": first["provider"],
+                        "num_questions": len(qs)
+                    })
+
+            else:  # Single question
+                streamed = False
+                if stream_answers:
+                    try:  # an answer already in the result cache is shown as is, not streamed again
+                        res = cached_orchestrator_run(url, question, top_k, max_chars, overlap, ranker,
+                                                      chunking, max_tokens, overlap_tokens, crawl_depth, crawl_pages,
+                                                      _lookup_only=True)
+                    except _NotCached:
+                        # Render tokens as they arrive, then seed the result cache with the assembled answer.
+                        orch = build_orchestrator(top_k, max_chars, overlap, ranker, chunking, max_tokens,
+                                                  overlap_tokens, crawl_depth, crawl_pages)
+                        stream = orch.run_stream(url, question)
+                        with t_ans:
+                            st.markdown("### ✅ Answer")
+                            st.write_stream(stream)
+                        res = asdict(stream.result)
+                        complete = (res["provider"] != "fallback"
+                                    and not (res.get("reasoning") or "").startswith("Stream interrupted"))
+                        if complete:  # a cut or heuristic answer is shown once, never served from the cache
+                            res = cached_orchestrator_run(url, question, top_k, max_chars, overlap, ranker,
+                                                          chunking, max_tokens, overlap_tokens, crawl_depth,
+                                                          crawl_pages, _precomputed=res)
+                        streamed = True
+                else:
+                    res = cached_orchestrator_run(url, question, top_k, max_chars, overlap, ranker,
+                                                  chunking, max_tokens, overlap_tokens, crawl_depth,
+                                                  crawl_pages)  # dict
+
+                with t_over:
+                    if res.get("title"):
+                        st.subheader(res["title"])
+                    st.markdown(f"<div class='badge'>🔗 URL <span class='small'>({res['url'][:48]}…)</span></div>", unsafe_allow_html=True)
+                    st.markdown(f"<div class='badge'>🤖 Provider <code>{res['provider']}</code></div>", unsafe_allow_html=True)
+                    st.markdown(f"<div class='badge'>🧩 Context {res['top_chunk_indices']} / {res['total_chunks']}</div>", unsafe_allow_html=True)
+                    st.markdown(f"<div class='badge'>🕒 {timestamp}</div>", unsafe_allow_html=True)
+
+                with t_ans:
+                    if not streamed:
+                        st.markdown("### ✅ Answer")
+                        st.write(res["answer"])
+                    ce1, ce2 = st.columns(2)
+                    export_buttons(
+                        {
+                            "mode": "single",
+                            "url": res["url"], "title": res["title"], "provider": res["provider"],
+                            "top_chunk_indices": res["top_chunk_indices"], "total_chunks": res["total_chunks"],
+                            "highlights": res["highlights"],
+                            "answer": res["answer"],
+                            "text_export": res["answer"]
+                        },
+                        ce1, ce2
+                    )
+
+                with t_high:
+                    st.markdown("##### Top snippets")
+                    if res.get("highlights"):
+                        for i, h in enumerate(res["highlights"], 1):
+                            st.markdown(f"<div class='snip'><b>{i}.</b> {h}</div>", unsafe_allow_html=True)
+                    else:
+                        st.caption("No highlight snippets produced.")
+
+                with t_ctx:
+                    st.write(f"Top chunk indices: {res['top_chunk_indices']} / total {res['total_chunks']}")
+                    render_sources(res.get("sources"))
+
+                render_debug(res.get("metrics"))
+
+                log_history({
+                    "time": timestamp, "mode": "single", "url": res["url"], "title": res["title"], "provider": res["provider"]
+                })
+
+            st.success("Completed.")
+
+        except Exception as e:
+            st.error(f"Pipeline failed: {e}")
+            st.code(traceback.format_exc(), language="python")
+
+# ---------- History ----------
+st.markdown("---")
+st.markdown("### 🕘 Recent Runs")
+if st.session_state.history:
+    for i, h in enumerate(st.session_state.history[:6], 1):
+        with st.expander(f"{i}. {h['mode']} — {h.get('title') or '(untitled)'}", expanded=False):
+            st.caption(h["time"])
+            st.write(f"**URL:** {h['url']}")
+            st.write(f"**Provider:** {h['provider']}")
+else:
+    st.caption("No history yet. Run a query to see it here.")
+
+warm_up_in_background()
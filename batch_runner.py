@@ -0,0 +1,308 @@
+"""Headless batch runner: answer (url, question) pairs from JSONL, write results as JSONL.
+
+Usage:
+    python batch_runner.py questions.jsonl -o answers.jsonl
+    python batch_runner.py questions.jsonl -o answers.jsonl --resume   # continue an interrupted run
+
+Each input line is {"url": ..., "question": ...} with an optional "id" (defaults to the
+line number). Questions are grouped by URL so every page is fetched and indexed once,
+then flow through three stages with their own workers and bounded queues between them:
+
+    fetch (threads, per-host limits) -> parse/index (process pool) -> rank + LLM (threads)
+
+The output file is the checkpoint: every finished item is appended and flushed, and
+`--resume` skips ids already answered (rows with an error are retried). Per-stage
+throughput is printed to stderr.
+"""
+import argparse
+import json
+import os
+import queue
+import sys
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass, field
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple
+from urllib.parse import urlsplit
+
+from agents.contentProcessor import CHUNKERS, RANKERS
+from dataclass import IndexedDocument
+from orchestrator import OrchestratorAgent
+from utils import metrics
+from utils.doc_store import DocumentStore
+from utils.llm_cache import SQLiteResponseCache
+from utils.rate_limit import HostPoliteness
+
+_DONE = object()  # end-of-stream marker passed between stages
+
+
+@dataclass
+class WorkItem:
+    """All pending questions for one URL, carried through the stages."""
+    url: str
+    items: List[dict]  # input records: {"id", "url", "question"}
+    html: Optional[str] = None
+    cache_status: str = "miss"
+    doc: Optional[IndexedDocument] = None
+    error: Optional[str] = None
+
+
+@dataclass
+class StageStats:
+    name: str
+    workers: int
+    pages: int = 0
+    questions: int = 0
+    errors: int = 0
+    busy_s: float = 0.0
+    started: Optional[float] = None
+    finished: Optional[float] = None
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def record(self, started: float, item: WorkItem, ok: bool) -> None:
+        now = time.perf_counter()
+        with self._lock:
+            self.started = started if self.started is None else min(self.started, started)
+            self.finished = now if self.finished is None else max(self.finished, now)
+            self.busy_s += now - started
+            self.pages += 1
+            self.questions += len(item.items)
+            self.errors += 0 if ok else 1
+
+    def summary(self) -> Dict[str, Any]:
+        wall = (self.finished - self.started) if self.started is not None else 0.0
+        return {
+            "stage": self.name, "workers": self.workers, "pages": self.pages, "questions": self.questions,
+            "errors": self.errors, "wall_s": round(wall, 3), "busy_s": round(self.busy_s, 3),
+            "pages_per_s": round(self.pages / wall, 2) if wall else None,
+            "questions_per_s": round(self.questions / wall, 2) if wall else None,
+        }
+
+
+def read_groups(path: str, done: Set[str]) -> "OrderedDict[str, List[dict]]":
+    """Group pending input records by URL (first-seen order), skipping ids already done."""
+    groups: "OrderedDict[str, List[dict]]" = OrderedDict()
+    with open(path, encoding="utf-8") as fh:
+        for lineno, line in enumerate(fh, 1):
+            line = line.strip()
+            if not line:
+                continue
+            rec = json.loads(line)
+            item = {"id": str(rec.get("id", lineno)), "url": rec["url"], "question": rec["question"]}
+            if item["id"] not in done:
+                groups.setdefault(item["url"], []).append(item)
+    return groups
+
+
+def interleave_hosts(groups: "OrderedDict[str, List[dict]]") -> Iterator[Tuple[str, List[dict]]]:
+    """Round-robin URL groups across hosts so fetch workers do not queue up on one site."""
+    by_host: "OrderedDict[str, List[str]]" = OrderedDict()
+    for url in groups:
+        by_host.setdefault(urlsplit(url).netloc.lower(), []).append(url)
+    lanes = [iter(urls) for urls in by_host.values()]
+    while lanes:
+        for lane in list(lanes):
+            url = next(lane, None)
+            if url is None:
+                lanes.remove(lane)
+            else:
+                yield url, groups[url]
+
+
+def load_checkpoint(path: str) -> Set[str]:
+    """Ids already answered in `path`; drops a torn last line left by a killed run.
+
+    Rows written with an error do not count, so `--resume` retries those pairs.
+    """
+    if not os.path.exists(path):
+        return set()
+    with open(path, "rb+") as fh:
+        data = fh.read()
+        if data and not data.endswith(b"\n"):
+            fh.truncate(data.rfind(b"\n") + 1)
+            data = data[: data.rfind(b"\n") + 1]
+    done = set()
+    for line in data.splitlines():
+        try:
+            row = json.loads(line)
+            if row.get("error") is None:
+                done.add(str(row["id"]))
+        except (ValueError, KeyError, AttributeError):
+            continue
+    return done
+
+
+class BatchRunner:
+    def __init__(self, orch: OrchestratorAgent, *, fetch_workers: int = 8, cpu_workers: int = 4,
+                 llm_workers: int = 4, queue_size: int = 16, host_delay: float = 0.0):
+        self.orch = orch
+        self.fetch_workers = fetch_workers
+        self.cpu_workers = cpu_workers
+        self.llm_workers = llm_workers
+        self.queue_size = queue_size
+        self.politeness = HostPoliteness(host_delay)
+        self.stats = {
+            "fetch": StageStats("fetch", fetch_workers),
+            "index": StageStats("index", cpu_workers),
+            "answer": StageStats("answer", llm_workers),
+        }
+
+    # ---- stages: each takes a WorkItem and returns it for the next queue ----
+    def _fetch(self, item: WorkItem) -> WorkItem:
+        with metrics.trace("batch_fetch", self.orch.instrument) as tr:
+            item.doc = self.orch.stored(item.url)
+            if item.doc is None:
+                self.politeness.wait(item.url)
+                with tr.stage("fetch"):
+                    item.html, item.cache_status = self.orch.scraper.download(item.url)
+        return item
+
+    def _index(self, item: WorkItem) -> WorkItem:
+        if item.doc is None:
+            with metrics.trace("batch_index", self.orch.instrument) as tr, tr.stage("index"):
+                item.doc = self.orch.submit_prepare(item.html, item.url, item.cache_status).result()
+            item.html = None
+            self.orch.remember(item.url, item.doc)
+        return item
+
+    def _answer(self, item: WorkItem) -> List[dict]:
+        with metrics.trace("batch_answer", self.orch.instrument):
+            results = self.orch.answer_questions(item.doc, [r["question"] for r in item.items])
+        out = []
+        for rec, res in zip(item.items, results):
+            row = asdict(res)
+            row.pop("highlight_spans", None)
+            row.pop("url", None)  # keep the input URL even if the page redirected
+            out.append({**rec, **row, "error": None})
+        return out
+
+    @staticmethod
+    def _errors(item: WorkItem) -> List[dict]:
+        return [{**rec, "answer": None, "provider": None, "error": item.error} for rec in item.items]
+
+    def _worker(self, stage: StageStats, fn: Callable[[WorkItem], Any], inbox: queue.Queue,
+                outbox: queue.Queue) -> None:
+        while True:
+            item = inbox.get()
+            if item is _DONE:
+                inbox.put(_DONE)  # let sibling workers see it too
+                return
+            started = time.perf_counter()
+            if item.error is None:
+                try:
+                    result = fn(item)
+                except Exception as e:
+                    item.error = f"{stage.name}: {type(e).__name__}: {e}"
+                    result = item
+                stage.record(started, item, ok=item.error is None)
+            else:
+                result = item  # failed upstream; pass through to the writer
+            outbox.put(result)
+
+    def run(self, groups: "OrderedDict[str, List[dict]]", out_path: str, progress_every: float = 10.0) -> Dict[str, Any]:
+        fetch_q: queue.Queue = queue.Queue(self.queue_size)
+        index_q: queue.Queue = queue.Queue(self.queue_size)
+        answer_q: queue.Queue = queue.Queue(self.queue_size)
+        write_q: queue.Queue = queue.Queue(self.queue_size)
+
+        def start(stage: str, fn, inbox, outbox, n) -> List[threading.Thread]:
+            threads = [threading.Thread(target=self._worker, args=(self.stats[stage], fn, inbox, outbox),
+                                        name=f"{stage}-{i}", daemon=True) for i in range(n)]
+            for t in threads:
+                t.start()
+            return threads
+
+        stages = [
+            (start("fetch", self._fetch, fetch_q, index_q, self.fetch_workers), index_q),
+            (start("index", self._index, index_q, answer_q, self.cpu_workers), answer_q),
+            (start("answer", self._answer, answer_q, write_q, self.llm_workers), write_q),
+        ]
+
+        def close_stages() -> None:
+            # Once a stage's workers have all exited, tell the next stage no more input is coming.
+            for threads, outbox in stages:
+                for t in threads:
+                    t.join()
+                outbox.put(_DONE)
+
+        def feed() -> None:
+            for url, items in interleave_hosts(groups):
+                fetch_q.put(WorkItem(url=url, items=items))  # blocks when fetchers fall behind
+            fetch_q.put(_DONE)
+
+        threading.Thread(target=feed, name="feeder", daemon=True).start()
+        threading.Thread(target=close_stages, name="closer", daemon=True).start()
+
+        total = sum(len(v) for v in groups.values())
+        written = failed = 0
+        began = last_report = time.perf_counter()
+        with open(out_path, "a", encoding="utf-8") as out:
+            while True:
+                result = write_q.get()
+                if result is _DONE:
+                    break
+                rows = self._errors(result) if isinstance(result, WorkItem) else result
+                for row in rows:
+                    out.write(json.dumps(row, ensure_ascii=False) + "\n")
+                out.flush()
+                written += len(rows)
+                failed += sum(1 for r in rows if r["error"])
+                now = time.perf_counter()
+                if now - last_report >= progress_every:
+                    last_report = now
+                    print(f"[batch] {written}/{total} done, {written / (now - began):.2f} items/s",
+                          file=sys.stderr, flush=True)
+
+        elapsed = time.perf_counter() - began
+        return {
+            "items": written, "errors": failed, "elapsed_s": round(elapsed, 3),
+            "items_per_s": round(written / elapsed, 2) if elapsed else None,
+            "stages": [s.summary() for s in self.stats.values()],
+        }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("input", help="JSONL with url, question and optional id per line")
+    ap.add_argument("-o", "--output", required=True, help="JSONL results (also the resume checkpoint)")
+    ap.add_argument("--resume", action="store_true", help="skip ids already answered in --output")
+    ap.add_argument("--fetch-workers", type=int, default=8)
+    ap.add_argument("--cpu-workers", type=int, default=min(4, os.cpu_count() or 1))
+    ap.add_argument("--llm-workers", type=int, default=4)
+    ap.add_argument("--queue-size", type=int, default=16, help="max pages waiting between two stages")
+    ap.add_argument("--per-host", type=int, default=2, help="concurrent downloads per host")
+    ap.add_argument("--host-delay", type=float, default=0.5, help="min seconds between requests to a host")
+    ap.add_argument("--top-k", type=int, default=3)
+    ap.add_argument("--ranker", choices=RANKERS, default="tfidf")
+    ap.add_argument("--chunking", choices=CHUNKERS, default="chars")
+    ap.add_argument("--model", default=None)
+    ap.add_argument("--no-store", action="store_true", help="do not read or write the document store")
+    ap.add_argument("--no-llm-cache", action="store_true", help="do not read or write the LLM response cache")
+    ap.add_argument("--metrics-out", help="write Prometheus text metrics for the run here")
+    args = ap.parse_args(argv)
+
+    if not args.resume and os.path.exists(args.output) and os.path.getsize(args.output):
+        ap.error(f"{args.output} exists; pass --resume to continue it or choose another path")
+    done = load_checkpoint(args.output) if args.resume else set()
+    groups = read_groups(args.input, done)
+    print(f"[batch] {sum(len(v) for v in groups.values())} questions over {len(groups)} pages "
+          f"({len(done)} already done)", file=sys.stderr, flush=True)
+
+    orch = OrchestratorAgent(top_k=args.top_k, model=args.model, ranker=args.ranker, chunking=args.chunking,
+                             store=None if args.no_store else DocumentStore(),
+                             llm_cache=None if args.no_llm_cache else SQLiteResponseCache(),
+                             cpu_workers=args.cpu_workers, llm_workers=args.llm_workers)
+    orch.scraper.max_per_host = args.per_host
+    runner = BatchRunner(orch, fetch_workers=args.fetch_workers, cpu_workers=args.cpu_workers,
+                         llm_workers=args.llm_workers, queue_size=args.queue_size, host_delay=args.host_delay)
+    report = runner.run(groups, args.output)
+    if args.metrics_out:
+        with open(args.metrics_out, "w") as fh:
+            fh.write(metrics.REGISTRY.render_prometheus())
+    print(json.dumps(report, indent=2), file=sys.stderr)
+    return 1 if report["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
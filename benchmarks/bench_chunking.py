@@ -0,0 +1,65 @@
+"""Throughput of the character chunker vs the token-budgeted sentence chunker.
+
+Usage:
+    python -m benchmarks.bench_chunking [--sizes-mb 0.5 2 8] [--max-tokens 256]
+
+Both chunkers run uncapped (no max_total_chars/max_chunks limit) on cleaned
+synthetic prose so MB/s reflects the whole page. The token chunker uses tiktoken
+when its encoding is available and the approximate counter otherwise (reported).
+"""
+import argparse
+import random
+import time
+
+from utils.text_utils import chunk_spans, clean_text
+from utils.token_utils import DEFAULT_ENCODING, get_encoder, token_chunk_spans
+
+_WORDS = ("the of and to in is that for it as with was on be by this are from or at an which "
+          "install configure request response server client token retry limit cache index").split()
+
+
+def make_text(n_bytes: int, seed: int = 0) -> str:
+    rng = random.Random(seed)
+    parts, size = [], 0
+    while size < n_bytes:
+        sentence = " ".join(rng.choices(_WORDS, k=rng.randint(6, 30))).capitalize() + rng.choice([".", "!", "?"])
+        parts.append(sentence)
+        size += len(sentence) + 1
+    return clean_text(" ".join(parts))
+
+
+def _time(fn, repeat: int = 3):
+    best, out = float("inf"), None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn()
+        best = min(best, time.perf_counter() - t0)
+    return out, best
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--sizes-mb", type=float, nargs="+", default=[0.5, 2, 8])
+    ap.add_argument("--max-chars", type=int, default=1200)
+    ap.add_argument("--overlap", type=int, default=150)
+    ap.add_argument("--max-tokens", type=int, default=256)
+    ap.add_argument("--overlap-tokens", type=int, default=32)
+    args = ap.parse_args()
+
+    print(f"token counter: {'tiktoken ' + DEFAULT_ENCODING if get_encoder() else 'approximate (tiktoken unavailable)'}")
+    print(f"{'chunker':<8} {'MB':>6} {'chunks':>8} {'time (s)':>9} {'MB/s':>8}")
+    for mb in args.sizes_mb:
+        text = make_text(int(mb * 1024 * 1024))
+        n = len(text)
+        runs = [
+            ("chars", lambda: chunk_spans(text, args.max_chars, args.overlap, max_total_chars=n, max_chunks=n)),
+            ("tokens", lambda: token_chunk_spans(text, args.max_tokens, args.overlap_tokens,
+                                                 max_total_chars=n, max_chunks=n)),
+        ]
+        for name, fn in runs:
+            spans, secs = _time(fn)
+            print(f"{name:<8} {mb:>6.1f} {len(spans):>8} {secs:>9.3f} {mb / secs:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""Concurrent identical requests: one fetch, one index build and one LLM call, shared.
+
+Usage:
+    python -m benchmarks.bench_coalesce [--callers 8] [--latency 0.3] [-o coalesce.json]
+
+Starts a local page server and the stub LLM (benchmarks.stub_llm), both answering
+after --latency seconds, then releases --callers threads at once against one shared
+OrchestratorAgent with no document store and no LLM cache, so in-flight coalescing
+(utils.single_flight) is the only thing that can save work. Scenarios:
+
+    run          same URL and question via run()
+    distinct     same question, a different URL per caller (nothing to share; baseline)
+    stream       same URL and question via run_stream()
+    answer_many  same URL and question list via answer_many() (one batched call)
+    error        a URL that answers 404: every caller must get the error
+
+Checks (exit status 1 if any fails): shared scenarios make one page request and one
+LLM call with identical answers; every caller of the failing URL sees the error from
+one request; a caller whose `coalesce_timeout` is shorter than the leader's work gets
+TimeoutError while the leader still finishes.
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from typing import Callable, Dict, List, Tuple
+
+from benchmarks.bench_crawl import serve_site
+from benchmarks.stub_llm import Faults, serve
+
+QUESTION = "How often are the sensors recalibrated?"
+QUESTIONS = ["How often are the sensors recalibrated?", "Who approves a recalibration?", "Where are logs kept?"]
+
+
+def make_site(n: int) -> Dict[str, Tuple[str, bytes]]:
+    """Maintenance pages that differ in every bay's interval, so their prompts differ too."""
+    def page(site: int) -> Tuple[str, bytes]:
+        body = " ".join(f"Sensors in bay {i} are recalibrated every {i + site + 3} weeks by the duty engineer. "
+                        f"Recalibration is approved by the site lead and logged in the maintenance book."
+                        for i in range(40))
+        html = f"<html><head><title>Maintenance {site}</title></head><body><p>{body}</p></body></html>"
+        return "text/html; charset=utf-8", html.encode("utf-8")
+
+    site = {f"/page-{i}.html": page(i) for i in range(n)}
+    site.update({f"/shared-{name}.html": page(n) for name in ("run", "stream", "many", "timeout")})
+    return site
+
+
+def together(n: int, fn: Callable[[int], object]) -> Tuple[List[object], float]:
+    """Run fn(0..n-1) on n threads released at the same moment; exceptions are returned, not raised."""
+    barrier = threading.Barrier(n)
+    out: List[object] = [None] * n
+
+    def worker(i: int) -> None:
+        barrier.wait()
+        try:
+            out[i] = fn(i)
+        except Exception as e:
+            out[i] = e
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(n)]
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return out, time.perf_counter() - t0
+
+
+def scenario(name: str, n: int, fn, requested: List[str], faults: Faults) -> dict:
+    requested.clear()
+    llm_before = faults.requests
+    out, secs = together(n, fn)
+    errors = [o for o in out if isinstance(o, Exception)]
+    answers = {json.dumps(o, sort_keys=True, default=str) for o in out if not isinstance(o, Exception)}
+    return {"scenario": name, "callers": n, "page_requests": len(requested), "llm_calls": faults.requests - llm_before,
+            "distinct_answers": len(answers), "errors": len(errors),
+            "error_types": sorted({type(e).__name__ for e in errors}), "time_s": round(secs, 3)}
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--callers", type=int, default=8)
+    ap.add_argument("--latency", type=float, default=0.3, help="page server and LLM delay per request (s)")
+    ap.add_argument("-o", "--output", help="write results JSON here")
+    args = ap.parse_args()
+    n = args.callers
+
+    faults = Faults()
+    llm_server, llm_base = serve(latency=args.latency, faults=faults)
+    os.environ.update(OPENAI_BASE_URL=llm_base, OPENAI_API_KEY="stub")
+    site_server, base, requested = serve_site(make_site(n), args.latency)
+    from orchestrator import OrchestratorAgent, warm_up
+    warm_up(ranker="bm25")  # imports and client set-up are not what is being timed
+    orch = OrchestratorAgent(ranker="bm25", instrument=False, cpu_workers=0)
+
+    def streamed(i: int) -> str:
+        stream = orch.run_stream(base + "/shared-stream.html", QUESTION)
+        "".join(stream)
+        return stream.result.answer
+
+    try:
+        rows = [
+            scenario("run", n, lambda i: orch.run(base + "/shared-run.html", QUESTION).answer, requested, faults),
+            scenario("distinct", n, lambda i: orch.run(f"{base}/page-{i}.html", QUESTION).answer, requested, faults),
+            scenario("stream", n, streamed, requested, faults),
+            scenario("answer_many", n, lambda i: [r.answer for r in orch.answer_many(base + "/shared-many.html",
+                                                                                     QUESTIONS)], requested, faults),
+            scenario("error", n, lambda i: orch.load(base + "/missing.html"), requested, faults),
+        ]
+        # The second caller joins the first one's fetch but will only wait a tenth of it.
+        impatient = OrchestratorAgent(ranker="bm25", instrument=False, cpu_workers=0, coalesce_timeout=args.latency / 10)
+
+        def load_or_time_out(i: int):
+            if i:
+                time.sleep(args.latency / 10)
+            return (impatient if i else orch).load(base + "/shared-timeout.html")
+
+        timeout_out, _ = together(2, load_or_time_out)
+    finally:
+        site_server.shutdown()
+        llm_server.shutdown()
+
+    print(f"{n} concurrent callers, {args.latency}s page and LLM latency\n")
+    cols = ["page_requests", "llm_calls", "distinct_answers", "errors", "time_s"]
+    print(f"{'scenario':<12} " + " ".join(f"{c:>16}" for c in cols))
+    for row in rows:
+        print(f"{row['scenario']:<12} " + " ".join(f"{row[c]:>16}" for c in cols))
+    by = {row["scenario"]: row for row in rows}
+    checks = [(name, by[name]["page_requests"] == 1 and by[name]["llm_calls"] == 1
+               and by[name]["distinct_answers"] == 1 and not by[name]["errors"],
+               f"{by[name]['page_requests']} page request(s), {by[name]['llm_calls']} LLM call(s)")
+              for name in ("run", "stream", "answer_many")]
+    checks.append(("error", by["error"]["errors"] == n and by["error"]["page_requests"] == 1,
+                   f"{by['error']['errors']}/{n} callers got {by['error']['error_types']} from "
+                   f"{by['error']['page_requests']} request(s)"))
+    leader, follower = timeout_out
+    checks.append(("timeout", not isinstance(leader, Exception) and isinstance(follower, TimeoutError),
+                   f"leader {type(leader).__name__}, follower {type(follower).__name__}"))
+    print(f"\n{'check':<12} {'ok':<5} detail")
+    for name, ok, detail in checks:
+        print(f"{name:<12} {str(ok):<5} {detail}")
+    if args.output:
+        with open(args.output, "w") as fh:
+            json.dump({"options": vars(args), "results": rows, "checks": checks}, fh, indent=2)
+    sys.exit(0 if all(ok for _, ok, _ in checks) else 1)
+
+
+if __name__ == "__main__":
+    main()
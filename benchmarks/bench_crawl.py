@@ -0,0 +1,126 @@
+"""Crawl a local fixture site: time sequential vs concurrent fetching.
+
+Usage:
+    python -m benchmarks.bench_crawl [--pages 40] [--latency 0.05] [--workers 1 4 8] [-o crawl.json]
+
+The fixture is a small docs site served from 127.0.0.1 with a per-request delay
+(--latency) standing in for network time. It contains everything the crawler must
+handle: a robots.txt that disallows /private/ and sets no Crawl-delay, a PDF link, an
+extension-less URL served as application/pdf, a rel="nofollow" link, an off-site link,
+fragment and duplicate links, a 404, and a page reachable only at depth 3. Concurrency
+is also capped per host by the scraper (max_per_host, 4 by default), so more workers than
+that do not help on one site.
+
+The crawl rules themselves (robots, same-site, depth, budget, non-HTML, nofollow,
+answering from a deep page) are tested against this site in tests/test_crawl.py.
+"""
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Tuple
+
+FACT = "The flux capacitor tolerance is seventeen microfarads."
+
+
+def build_site(n_pages: int) -> Dict[str, Tuple[str, bytes]]:
+    """{path: (content type, body)} for the fixture site."""
+    def page(title: str, body: str, links: List[str], extra: str = "") -> bytes:
+        anchors = " ".join(f'<a href="{href}">{href}</a>' for href in links) + extra
+        return (f"<html><head><title>{title}</title></head><body><h1>{title}</h1><p>{body}</p>"
+                f"<nav>{anchors}</nav></body></html>").encode("utf-8")
+
+    html = "text/html; charset=utf-8"
+    guides = [f"/docs/guide-{i}.html" for i in range(n_pages)]
+    site = {
+        "/robots.txt": ("text/plain", b"User-agent: *\nDisallow: /private/\n"),
+        "/": (html, page("Fixture docs", "Welcome to the fixture documentation site.", [
+            "/docs/", "/private/secret.html", "/files/manual.pdf", "/download", "/missing.html",
+            "http://off-site.invalid/", "/docs/#top", "/docs/index.html#intro", "mailto:docs@example.invalid"],
+            extra='<a rel="nofollow" href="/nofollow.html">no</a>')),
+        "/docs/": (html, page("Guides", "All guides are listed here.",
+                              guides[: n_pages // 2] + ["/docs/deep/level-2.html"])),
+        "/docs/index.html": (html, page("Guides index", "Same list, another URL.", guides[n_pages // 2:])),
+        "/download": ("application/pdf", b"%PDF-1.4 not really"),
+        "/files/manual.pdf": ("application/pdf", b"%PDF-1.4 not really"),
+        "/private/secret.html": (html, page("Secret", "Robots say no.", [])),
+        "/nofollow.html": (html, page("Nofollow", "Linked with rel=nofollow only.", [])),
+        "/docs/deep/level-2.html": (html, page("Level 2", "Almost there.", ["/docs/deep/level-3.html"])),
+        "/docs/deep/level-3.html": (html, page("Level 3", f"Deep reference. {FACT}", [])),
+    }
+    for i, path in enumerate(guides):
+        links = ["/", guides[(i + 1) % n_pages]]
+        body = " ".join(f"Guide {i} explains configuration step {j} of the fixture product." for j in range(20))
+        site[path] = (html, page(f"Guide {i}", body, links))
+    return site
+
+
+def serve_site(site: Dict[str, Tuple[str, bytes]], latency: float) -> Tuple[ThreadingHTTPServer, str, List[str]]:
+    """Serve `site` on a free local port; returns (server, base URL, requested paths)."""
+    requested: List[str] = []
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            with lock:
+                requested.append(self.path)
+            time.sleep(latency)
+            entry = site.get(self.path)
+            if entry is None:
+                self.send_error(404)
+                return
+            ctype, body = entry
+            self.send_response(200)
+            self.send_header("Content-Type", ctype)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}", requested
+
+
+def crawl_once(base: str, requested: List[str], **kwargs) -> dict:
+    from agents.site_crawler import SiteCrawler
+    requested.clear()
+    crawler = SiteCrawler(**kwargs)
+    result = crawler.crawl(base + "/")
+    return {"workers": crawler.workers, "depth": crawler.max_depth, "max_pages": crawler.max_pages,
+            "pages": len(result.pages), "counts": result.counts, "elapsed_s": result.elapsed_s,
+            "pages_per_s": round(len(result.pages) / result.elapsed_s, 2) if result.elapsed_s else None}
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--pages", type=int, default=40, help="guide pages on the fixture site")
+    ap.add_argument("--latency", type=float, default=0.05, help="server delay per request (s)")
+    ap.add_argument("--workers", type=int, nargs="+", default=[1, 4, 8])
+    ap.add_argument("-o", "--output", help="write results JSON here")
+    args = ap.parse_args()
+
+    server, base, requested = serve_site(build_site(args.pages), args.latency)
+    try:
+        results = []
+        print(f"{'workers':>7} {'pages':>6} {'time (s)':>9} {'pages/s':>8}")
+        for workers in args.workers:
+            row = crawl_once(base, requested, max_depth=3, max_pages=10 * args.pages, workers=workers,
+                                host_delay=0)
+            results.append(row)
+            print(f"{workers:>7} {row['pages']:>6} {row['elapsed_s']:>9.3f} {row['pages_per_s']:>8}")
+    finally:
+        server.shutdown()
+    if args.output:
+        with open(args.output, "w") as fh:
+            json.dump({"options": vars(args), "results": results}, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+"""Chunks and prompt tokens saved by near-duplicate removal on a templated fixture site.
+
+Usage:
+    python -m benchmarks.bench_dedup [--pages 60] [--thresholds 0.7 0.8 0.9] [-o dedup.json]
+
+The fixture imitates a crawled docs site. Every page wraps its own article (with one
+planted fact) in the same cookie banner, navigation and footer, each varying slightly
+per page (current-page marker, session id, build date). One page in ten also exists as
+a near-identical variant (print view, tracking parameters).
+
+Each threshold indexes the whole site with `ContentProcessorAgent.prepare_site`,
+starting from no dedup, and asks one question per article plus two about the
+boilerplate ("how do I manage or reject cookies?"). Columns:
+
+    chunks        chunks indexed
+    doc tokens    tokens across all chunks (what a whole-document pass would send)
+    ctx tokens    tokens in the top-k contexts of all questions
+    dup slots     context slots holding a chunk >= 0.8 similar to a better-ranked one
+    recall        article questions whose fact chunk made the top-k
+    prep ms       prepare_site time, including dedup
+
+Also compares banded LSH with all-pairs signature comparison for the chunk dedup at
+the last threshold.
+"""
+import argparse
+import json
+import random
+import time
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+_WASTED = 0.8  # a context chunk this similar to a better-ranked one counts as a wasted slot
+_WORDS = "the of and to a in is that it for on was with as be by this are from or an at use can".split() + [
+    f"term{i}" for i in range(4000)]
+
+
+@dataclass
+class Page:
+    url: str
+    title: str
+    text: str
+
+
+def _prose(rng: random.Random, n_words: int) -> str:
+    words = rng.choices(_WORDS, weights=[1.0 / (r + 1) for r in range(len(_WORDS))], k=n_words)
+    sentences, i = [], 0
+    while i < len(words):
+        n = rng.randint(8, 18)
+        sentences.append(" ".join(words[i:i + n]).capitalize() + ".")
+        i += n
+    return " ".join(sentences)
+
+
+def make_site(n_pages: int, seed: int = 0) -> Tuple[List[Page], List[Tuple[str, Optional[str]]]]:
+    """(pages, [(question, fact sentence or None for boilerplate questions)])."""
+    rng = random.Random(seed)
+    banner = ("We use cookies to improve your experience, analyse traffic and personalise content. "
+              "By continuing to browse you agree to our cookie policy. You can manage cookies at any time "
+              "in your account privacy settings, withdraw consent, or reject all non-essential cookies. "
+              "Essential cookies keep you signed in and remember your preferences between visits. ") * 2
+    titles = [f"Guide {i}: {' '.join(rng.sample(_WORDS[25:], 2))}" for i in range(n_pages)]
+    footer = ("Copyright Fixture Corp. All rights reserved. Contact support for help with your account, "
+              "billing questions, and privacy requests. Terms of service. Privacy policy. Accessibility. "
+              "Status page. Careers. Press. Security disclosures. Community forum. Release notes. ") * 2
+    pages, questions = [], []
+    for i in range(n_pages):
+        nav = "Navigation: " + " | ".join(("> " if j == i else "") + t for j, t in enumerate(titles[:25]))
+        topic = f"widget{i}"
+        fact = f"The {topic} calibration interval is {rng.randint(2, 90)} days."
+        article = _prose(rng, 250) + " " + fact + " " + _prose(rng, 250)
+        session = f"Session {rng.getrandbits(32):08x}."
+        built = f"Built 2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}."
+        text = " ".join([banner, session, nav, titles[i] + ".", article, footer, built])
+        pages.append(Page(url=f"https://docs.fixture.test/guide-{i}", title=titles[i], text=text))
+        questions.append((f"What is the {topic} calibration interval?", fact))
+        if i % 10 == 0:  # print view: same article, different session id and build stamp
+            variant = text.replace(session, f"Session {rng.getrandbits(32):08x}.").replace(built, "Print view.")
+            pages.append(Page(url=f"https://docs.fixture.test/guide-{i}?print=1", title=titles[i], text=variant))
+    questions += [("How do I manage or reject cookies?", None), ("How do I contact support about billing?", None)]
+    return pages, questions
+
+
+def measure(pages: List[Page], questions, threshold: Optional[float], top_k: int) -> dict:
+    from agents.contentProcessor import ContentProcessorAgent
+    from utils import metrics
+    from utils.near_dup import MinHasher, similarity
+    from utils.token_utils import token_counter
+
+    count = token_counter()
+    processor = ContentProcessorAgent(top_k=top_k, ranker="bm25", dedup_threshold=threshold)
+    tr = metrics.Trace("bench")
+    t0 = time.perf_counter()
+    with metrics.use(tr):
+        doc = processor.prepare_site(pages, url="https://docs.fixture.test/")
+    prep_s = time.perf_counter() - t0
+
+    hasher = MinHasher()
+    ranked = processor.rank_many(doc, [q for q, _ in questions])
+    ctx_tokens = dup_slots = found = 0
+    for (_, fact), res in zip(questions, ranked):
+        ctx = [doc.chunks[i] for i in res.top_chunk_indices]
+        ctx_tokens += sum(count(ctx))
+        sigs = [hasher.signature(c) for c in ctx]
+        dup_slots += sum(any(similarity(sigs[j], sigs[i]) >= _WASTED for j in range(i)) for i in range(1, len(sigs)))
+        found += bool(fact) and any(fact in c for c in ctx)
+    n_fact = sum(1 for _, f in questions if f)
+    return {"threshold": threshold, "pages": len(doc.sources or []), "chunks": len(doc.spans),
+            "doc_tokens": sum(count(list(doc.chunks))), "ctx_tokens": ctx_tokens, "dup_slots": dup_slots,
+            "recall": round(found / n_fact, 3), "prep_ms": round(prep_s * 1000, 1),
+            "chunks_deduped": tr.counters.get("chunks_deduped", 0), "pages_deduped": tr.counters.get("pages_deduped", 0)}
+
+
+def lookup_cost(pages: List[Page], threshold: float) -> dict:
+    """Banded LSH vs comparing every chunk signature with every kept one."""
+    from agents.contentProcessor import ContentProcessorAgent
+    from utils.near_dup import LSHIndex, MinHasher, similarity
+    from utils.text_utils import clean_text
+
+    processor = ContentProcessorAgent(dedup_threshold=None)
+    chunks = [clean_text(p.text)[s:e] for p in pages for s, e in processor._chunk_spans(clean_text(p.text))]
+    sigs = MinHasher().signatures(chunks)
+
+    t0 = time.perf_counter()
+    index, kept_lsh = LSHIndex(threshold), 0
+    for i, sig in enumerate(sigs):
+        if not index.query(sig):
+            index.add(i, sig)
+            kept_lsh += 1
+    lsh_s = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    kept, comparisons = [], 0
+    for sig in sigs:
+        comparisons += len(kept)
+        if not any(similarity(k, sig) >= threshold for k in kept):
+            kept.append(sig)
+    brute_s = time.perf_counter() - t0
+    return {"chunks": len(chunks), "kept_lsh": kept_lsh, "kept_all_pairs": len(kept), "lsh_ms": round(lsh_s * 1000, 1),
+            "all_pairs_ms": round(brute_s * 1000, 1), "all_pairs_comparisons": comparisons}
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--pages", type=int, default=60)
+    ap.add_argument("--thresholds", type=float, nargs="+", default=[0.7, 0.8, 0.9])
+    ap.add_argument("--top-k", type=int, default=3)
+    ap.add_argument("-o", "--output", help="write results JSON here")
+    args = ap.parse_args()
+
+    pages, questions = make_site(args.pages)
+    print(f"{len(pages)} pages, {len(questions)} questions\n")
+    cols = ["pages", "chunks", "doc_tokens", "ctx_tokens", "dup_slots", "recall", "prep_ms"]
+    print(f"{'threshold':>9} " + " ".join(f"{c:>10}" for c in cols))
+    results = []
+    for threshold in [None] + args.thresholds:
+        row = measure(pages, questions, threshold, args.top_k)
+        results.append(row)
+        print(f"{str(threshold or 'off'):>9} " + " ".join(f"{row[c]:>10}" for c in cols))
+    base = results[0]
+    for row in results[1:]:
+        print(f"  dedup {row['threshold']}: -{base['chunks'] - row['chunks']} chunks "
+              f"({1 - row['chunks'] / base['chunks']:.0%}), -{base['doc_tokens'] - row['doc_tokens']} document tokens, "
+              f"-{base['ctx_tokens'] - row['ctx_tokens']} context tokens, "
+              f"{base['dup_slots'] - row['dup_slots']} duplicate context slots freed")
+
+    cost = lookup_cost(pages, args.thresholds[-1])
+    print(f"\nlookup over {cost['chunks']} chunks: LSH {cost['lsh_ms']} ms, all pairs {cost['all_pairs_ms']} ms "
+          f"({cost['all_pairs_comparisons']} comparisons); kept {cost['kept_lsh']} vs {cost['kept_all_pairs']}")
+    if args.output:
+        with open(args.output, "w") as fh:
+            json.dump({"options": vars(args), "results": results, "lookup": cost}, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""Recall@k and query latency of the dense and hybrid rankers against TF-IDF and BM25.
+
+Usage:
+    python -m benchmarks.bench_dense [--sizes 500 5000] [--queries 200] [-o dense.json]
+
+Synthetic and offline. Chunks are Zipf filler text headed by common English words. Each query has one relevant chunk
+holding a "fact" built from four made-up stems such as "kalomi" or "torvel". Half the
+queries reuse the fact's word forms ("exact"); the other half inflect the same stems
+differently ("variant": kalomied vs kalomiing), which is the paraphrase case where
+lexical rankers see no shared term. Three other chunks per query contain one stem in
+the query's own form, so a partial lexical match points at the wrong chunk.
+
+"fit" is the one-off cost per document; "query" is the mean latency of one question
+(score + top-k); "batch" is the per-question latency when all questions are scored in
+one call.
+"""
+import argparse
+import json
+import random
+import time
+from typing import Callable, Dict, List, Tuple
+
+from utils.bm25 import BM25Index, top_k_indices
+from utils.dense_index import DenseIndex, HybridIndex
+
+try:
+    from utils.doc_index import DocumentIndex
+except Exception:  # sklearn not installed
+    DocumentIndex = None
+
+# Common English words head the Zipf ranks, so question words like "what" or "page" have realistic df.
+_WORDS = "the of and to a in is that it for on was with as be by this page what does say about".split() + [
+    f"w{i}" for i in range(20_000)]
+_SYLLABLES = "ka lo mi ran tor vel zu qua pex dri son bel fi gor nu sha".split()
+_SUFFIXES = ["", "s", "ing", "ed", "er", "ation"]
+_KS = (1, 3, 5)
+
+
+def make_corpus(n_chunks: int, n_queries: int, words_per_chunk: int = 120,
+                seed: int = 0) -> Tuple[List[str], List[Tuple[str, int, str]]]:
+    """(chunks, [(question, relevant chunk, "exact" | "variant")])."""
+    rng = random.Random(seed)
+    weights = [1.0 / (r + 1) for r in range(len(_WORDS))]
+    chunks = [rng.choices(_WORDS, weights, k=words_per_chunk) for _ in range(n_chunks)]
+    stems = sorted({"".join(rng.sample(_SYLLABLES, 3)) for _ in range(n_queries * 8)})
+    rng.shuffle(stems)
+    targets = rng.sample(range(n_chunks), n_queries)
+    queries = []
+    for q, target in enumerate(targets):
+        words = stems[4 * q:4 * q + 4]
+        doc_suffix, query_suffix = rng.sample(_SUFFIXES, 2)
+        kind = "exact" if q % 2 == 0 else "variant"
+        if kind == "exact":
+            query_suffix = doc_suffix
+        pos = rng.randrange(words_per_chunk)
+        chunks[target][pos:pos] = [w + doc_suffix for w in words]
+        asked = [w + query_suffix for w in rng.sample(words, 3)]
+        for other in rng.sample([c for c in range(n_chunks) if c != target], 3):
+            chunks[other].insert(rng.randrange(len(chunks[other])), rng.choice(asked))
+        queries.append((f"what does the page say about {' '.join(asked)}?", target, kind))
+    return [" ".join(c) for c in chunks], queries
+
+
+def rankers() -> Dict[str, Callable]:
+    lexical = DocumentIndex.fit if DocumentIndex is not None else BM25Index.fit
+    out = {"bm25": BM25Index.fit, "dense": DenseIndex.fit,
+           "hybrid": lambda chunks: HybridIndex(lexical(chunks), DenseIndex.fit(chunks))}
+    if DocumentIndex is not None:
+        out = {"tfidf": DocumentIndex.fit, **out}
+    return out
+
+
+def bench(n_chunks: int, n_queries: int, k_max: int = max(_KS)) -> List[dict]:
+    chunks, queries = make_corpus(n_chunks, n_queries)
+    questions = [q for q, _, _ in queries]
+    rows = []
+    for name, fit in rankers().items():
+        t0 = time.perf_counter()
+        index = fit(chunks)
+        fit_s = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        orders = [top_k_indices(index.score_many([q])[:, 0], k_max) for q in questions]
+        query_s = (time.perf_counter() - t0) / len(questions)
+
+        t0 = time.perf_counter()
+        scores = index.score_many(questions)
+        batch_orders = [top_k_indices(scores[:, j], k_max) for j in range(len(questions))]
+        batch_s = (time.perf_counter() - t0) / len(questions)
+        assert batch_orders == orders
+
+        row = {"ranker": name, "chunks": n_chunks, "fit_s": round(fit_s, 4),
+               "query_ms": round(query_s * 1000, 3), "batch_ms": round(batch_s * 1000, 3)}
+        for kind in ("exact", "variant", "all"):
+            picked = [(order, target) for order, (_, target, t) in zip(orders, queries) if kind in ("all", t)]
+            for k in _KS:
+                row[f"{kind}_r@{k}"] = round(sum(target in order[:k] for order, target in picked) / len(picked), 3)
+        rows.append(row)
+    return rows
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--sizes", type=int, nargs="+", default=[500, 5000])
+    ap.add_argument("--queries", type=int, default=200)
+    ap.add_argument("-o", "--output", help="write results JSON here")
+    args = ap.parse_args()
+
+    results = []
+    cols = [f"{kind}_r@{k}" for kind in ("exact", "variant", "all") for k in _KS]
+    print(f"{'ranker':<8} {'chunks':>7} {'fit (s)':>8} {'query ms':>9} {'batch ms':>9}  "
+          + " ".join(f"{c:>11}" for c in cols))
+    for n in args.sizes:
+        for row in bench(n, args.queries):
+            results.append(row)
+            print(f"{row['ranker']:<8} {n:>7} {row['fit_s']:>8.3f} {row['query_ms']:>9.3f} {row['batch_ms']:>9.3f}  "
+                  + " ".join(f"{row[c]:>11.3f}" for c in cols))
+    if args.output:
+        with open(args.output, "w") as fh:
+            json.dump({"options": vars(args), "results": results}, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""Cold-start import time of the app's modules, and a guard that heavy libraries stay lazy.
+
+Usage:
+    python -m benchmarks.bench_import -o imports.json
+    python -m benchmarks.bench_import -o new.json --baseline imports.json     # run, then compare
+    python -m benchmarks.bench_import --compare imports.json new.json          # compare two saved runs
+
+Each target is imported in a fresh interpreter under `python -X importtime`, --repeat
+times; the fastest run is reported (the OS file cache is warm after the first). Targets:
+
+    orchestrator   what batch_runner and the app import
+    agents         the package alone (lazy re-exports)
+    app_imports    app.py's import block minus streamlit itself
+    warm_up        orchestrator.warm_up(): the deferred cost, paid off the request path
+
+After `import orchestrator`, none of --lazy (numpy, scikit-learn, lxml, bs4, tiktoken,
+openai, pydantic, ...) may be in sys.modules; any that is counts as a regression, as
+does a target that got more than --threshold slower beyond a small absolute floor.
+The exit status is 1 when anything regressed.
+"""
+import argparse
+import json
+import os
+import platform
+import re
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+TARGETS = {
+    "orchestrator": "import orchestrator",
+    "agents": "import agents",
+    "app_imports": ("import orchestrator, utils.doc_store, utils.metrics, utils.llm_cache; "
+                    "from dotenv import load_dotenv"),
+    "warm_up": "import orchestrator; orchestrator.warm_up()",
+}
+LAZY = ["numpy", "scipy", "sklearn", "lxml", "bs4", "tiktoken", "openai", "pydantic", "tenacity"]
+
+_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)")
+
+
+def run_once(code: str, lazy: List[str]) -> dict:
+    """Import in a fresh interpreter; total wall time, per-module cumulative times and leaked heavy modules."""
+    probe = f"{code}\nimport sys, json\nprint(json.dumps([m for m in {lazy!r} if m in sys.modules]))"
+    env = dict(os.environ, PYTHONPATH=ROOT + os.pathsep + os.environ.get("PYTHONPATH", ""))
+    t0 = time.perf_counter()
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", probe], cwd=ROOT, env=env,
+                          capture_output=True, text=True)
+    wall = time.perf_counter() - t0
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "import failed")
+    modules: Dict[str, float] = {}
+    for line in proc.stderr.splitlines():
+        m = _LINE.match(line)
+        if m and len(m.group(3)) <= 1:  # top-level imports only; nested ones are in their parent's total
+            modules[m.group(4)] = int(m.group(2)) / 1e6
+    return {"wall_s": wall, "import_s": sum(modules.values()), "modules": modules,
+            "loaded": json.loads(proc.stdout.strip().splitlines()[-1])}
+
+
+def run_target(name: str, code: str, repeat: int, lazy: List[str], top: int) -> dict:
+    runs = [run_once(code, lazy) for _ in range(repeat)]
+    best = min(runs, key=lambda r: r["import_s"])
+    heaviest = sorted(best["modules"].items(), key=lambda kv: kv[1], reverse=True)[:top]
+    return {"target": name, "min_s": best["import_s"], "wall_min_s": min(r["wall_s"] for r in runs),
+            "heaviest": [[m, round(s, 4)] for m, s in heaviest], "loaded": best["loaded"]}
+
+
+# ---- comparison ----
+def compare(baseline: dict, current: dict, threshold: float, min_time: float = 0.02) -> List[dict]:
+    """One row per target; status is REGRESSION, faster, ok, new or missing."""
+    def keyed(run):
+        return {r["target"]: r for r in run["results"]}
+
+    base, cur = keyed(baseline), keyed(current)
+    out = []
+    for key in list(base) + [k for k in cur if k not in base]:
+        b, c = base.get(key), cur.get(key)
+        row = {"target": key, "status": "ok"}
+        if b is None or c is None:
+            row["status"] = "new" if b is None else "missing"
+            out.append(row)
+            continue
+        row["time_ratio"] = c["min_s"] / b["min_s"] if b["min_s"] else None
+        slower = c["min_s"] > b["min_s"] * (1 + threshold) and c["min_s"] - b["min_s"] > min_time
+        if slower:
+            row["status"] = "REGRESSION"
+            row["why"] = "time"
+        elif c["min_s"] < b["min_s"] * (1 - threshold) and b["min_s"] - c["min_s"] > min_time:
+            row["status"] = "faster"
+        out.append(row)
+    return out
+
+
+def print_comparison(rows: List[dict]) -> int:
+    print(f"{'target':<14} {'time x':>8}  status")
+    for r in rows:
+        t = f"{r['time_ratio']:.2f}" if r.get("time_ratio") else "-"
+        status = r["status"] + (f" ({r['why']})" if r.get("why") else "")
+        print(f"{r['target']:<14} {t:>8}  {status}")
+    regressions = sum(r["status"] == "REGRESSION" for r in rows)
+    print(f"\n{regressions} regression(s)")
+    return 1 if regressions else 0
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True, cwd=ROOT).stdout.strip()
+    except Exception:
+        return None
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--targets", nargs="*", choices=list(TARGETS), default=list(TARGETS))
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--top", type=int, default=8, help="heaviest top-level imports to list per target")
+    ap.add_argument("--lazy", nargs="*", default=LAZY, help="modules `import orchestrator` must not load")
+    ap.add_argument("-o", "--output", help="write results JSON here")
+    ap.add_argument("--baseline", help="compare this run against a saved results JSON")
+    ap.add_argument("--compare", nargs=2, metavar=("BASELINE", "CURRENT"), help="compare two saved runs and exit")
+    ap.add_argument("--threshold", type=float, default=0.25, help="relative slowdown that fails")
+    args = ap.parse_args()
+
+    if args.compare:
+        with open(args.compare[0]) as b, open(args.compare[1]) as c:
+            sys.exit(print_comparison(compare(json.load(b), json.load(c), args.threshold)))
+
+    results = []
+    for name in args.targets:
+        row = run_target(name, TARGETS[name], args.repeat, args.lazy, args.top)
+        results.append(row)
+        print(f"{name:<14} {row['min_s'] * 1000:>9.1f} ms  "
+              + ", ".join(f"{m} {s * 1000:.0f}" for m, s in row["heaviest"][:4]))
+
+    leaked = next((r["loaded"] for r in results if r["target"] == "orchestrator"), [])
+    if leaked:
+        print(f"\n`import orchestrator` loaded heavy modules eagerly: {', '.join(leaked)}")
+
+    run = {
+        "meta": {"python": platform.python_version(), "platform": platform.platform(), "commit": _git_commit(),
+                 "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                 "options": {k: v for k, v in vars(args).items() if k not in ("output", "baseline", "compare")}},
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as fh:
+            json.dump(run, fh, indent=2)
+    status = 1 if leaked else 0
+    if args.baseline:
+        with open(args.baseline) as fh:
+            print()
+            status = max(status, print_comparison(compare(json.load(fh), run, args.threshold)))
+    sys.exit(status)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""Memory held per indexed document: chunk offsets in one int32 array vs copied chunk strings.
+
+Usage:
+    python -m benchmarks.bench_memory [--size-mb 4] [--ranker bm25] [-o memory.json]
+
+A synthetic page of about --size-mb of text (wrapped in paragraph markup, so the HTML
+is larger) is parsed, the HTML is dropped, and `ContentProcessorAgent.prepare` builds
+the document twice: once indexed in memory, once streamed. Memory is what tracemalloc
+still counts after the call with the document alive, after a warm-up run has filled
+the module-level caches. Columns:
+
+    text        the cleaned text buffer, the one copy of the page
+    spans       chunk offsets as held now: a (n, 2) int32 array
+    doc         everything the document holds now (text, spans, index, sentence index)
+    tuples      the same offsets as a list of (start, end) tuples, as held before
+    strings     every chunk as its own string, as held before (in-memory documents only)
+    before      doc - spans + tuples + strings
+    saved       1 - doc / before
+
+Also reports the prompt chunks materialised for one question, and the size of one
+ProcessResult with __slots__ against the same dataclass without them.
+
+Checks (exit status 1 if any fails): the lazy chunks equal the copied strings, and
+every document holds less than before.
+"""
+import argparse
+import gc
+import json
+import sys
+import tracemalloc
+from dataclasses import fields, make_dataclass
+from typing import Callable, Tuple
+
+from benchmarks.bench_streaming import NEEDLE, make_text
+
+_MB = 1024 * 1024
+
+
+def make_page(n_bytes: int) -> str:
+    """HTML of about `n_bytes` of text, one <p> per sentence."""
+    sentences = make_text(n_bytes).replace(". ", ".\n").splitlines()
+    body = "".join(f'<p class="c">{s}</p>\n' for s in sentences)
+    return f"<html><head><title>Memory fixture</title></head><body><article>{body}</article></body></html>"
+
+
+def _retained(fn: Callable) -> Tuple[object, int]:
+    """(fn(), bytes it allocated that are still alive afterwards)."""
+    gc.collect()
+    before = tracemalloc.get_traced_memory()[0]
+    out = fn()
+    gc.collect()
+    return out, tracemalloc.get_traced_memory()[0] - before
+
+
+def measure(text: str, ranker: str, streamed: bool, question: str) -> dict:
+    from agents.contentProcessor import ContentProcessorAgent
+
+    processor = ContentProcessorAgent(ranker=ranker, stream_above=0 if streamed else len(text) + 1)
+    processor.prepare(text)  # warm-up: tokenizer and hash caches are per process, not per document
+    tracemalloc.start()
+    doc, doc_bytes = _retained(lambda: processor.prepare(text))
+    if doc.cleaned_text is text:  # already clean, so shared with the caller rather than allocated
+        doc_bytes += sys.getsizeof(text)
+    tuples, tuple_bytes = _retained(lambda: [(int(s), int(e)) for s, e in doc.spans.tolist()])
+    strings, string_bytes = ([], 0) if streamed else _retained(
+        lambda: [doc.cleaned_text[s:e] for s, e in tuples])
+    copies = strings or [doc.cleaned_text[s:e] for s, e in tuples]
+    same = len(doc.chunks) == len(copies) and all(a == b for a, b in zip(doc.chunks, copies))
+    del strings, copies
+    tracemalloc.stop()
+
+    res = processor.rank(doc, question)
+    prompt = [doc.chunks[i] for i in res.top_chunk_indices]
+    before = doc_bytes - doc.spans.nbytes + tuple_bytes + string_bytes
+    return {"mode": "streamed" if streamed else "in-memory", "chunks": len(doc.spans),
+            "text_mb": round(sys.getsizeof(doc.cleaned_text) / _MB, 2), "spans_mb": round(doc.spans.nbytes / _MB, 3),
+            "doc_mb": round(doc_bytes / _MB, 2), "tuples_mb": round(tuple_bytes / _MB, 2),
+            "strings_mb": round(string_bytes / _MB, 2), "before_mb": round(before / _MB, 2),
+            "saved": round(1 - doc_bytes / before, 3), "prompt_chars": sum(map(len, prompt)),
+            "needle_found": any(NEEDLE in c for c in prompt), "same_chunks": same}
+
+
+def result_sizes() -> dict:
+    """Bytes of one ProcessResult with __slots__, and of the same fields with a __dict__."""
+    from dataclass import ProcessResult
+    plain_cls = make_dataclass("PlainProcessResult", [(f.name, f.type) for f in fields(ProcessResult)])
+    values = ("text", [], [], [0, 1, 2], "bm25", [])
+    slotted, plain = ProcessResult(*values), plain_cls(*values)
+    return {"slots_bytes": sys.getsizeof(slotted),
+            "dict_bytes": sys.getsizeof(plain) + sys.getsizeof(plain.__dict__)}
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--size-mb", type=float, default=4.0, help="text per page (MB); the HTML is larger")
+    ap.add_argument("--ranker", default="bm25")
+    ap.add_argument("-o", "--output", help="write results JSON here")
+    args = ap.parse_args()
+
+    from agents.web_scrapper import parse_html
+    html = make_page(int(args.size_mb * _MB))
+    html_mb = len(html) / _MB
+    text = parse_html(html, "bench://memory", keep_html=False).text
+    del html  # as OrchestratorAgent.load does once the page is parsed
+
+    question = "What is the zephyr quokka calibration constant?"
+    print(f"page: {html_mb:.1f} MB HTML, {len(text) / _MB:.1f} MB text, ranker {args.ranker}\n")
+    cols = ["chunks", "text_mb", "spans_mb", "doc_mb", "tuples_mb", "strings_mb", "before_mb", "saved"]
+    print(f"{'mode':<10} " + " ".join(f"{c:>10}" for c in cols))
+    results = []
+    for streamed in (False, True):
+        row = measure(text, args.ranker, streamed, question)
+        results.append(row)
+        print(f"{row['mode']:<10} " + " ".join(f"{row[c]:>10}" for c in cols))
+    for row in results:
+        print(f"  {row['mode']}: {row['before_mb'] - row['doc_mb']:.2f} MB less per document ({row['saved']:.0%}); "
+              f"prompt chunks materialised for one question: {row['prompt_chars']} chars")
+    sizes = result_sizes()
+    print(f"\nProcessResult: {sizes['slots_bytes']} bytes with __slots__, {sizes['dict_bytes']} with a __dict__")
+
+    checks = [(f"{row['mode']} same chunks", row["same_chunks"]) for row in results] + [
+        (f"{row['mode']} smaller", row["doc_mb"] < row["before_mb"]) for row in results]
+    print()
+    for name, ok in checks:
+        print(f"{name:<22} {ok}")
+    if args.output:
+        with open(args.output, "w") as fh:
+            json.dump({"options": vars(args), "html_mb": round(html_mb, 2), "results": results,
+                       "process_result": sizes, "checks": checks}, fh, indent=2)
+    sys.exit(0 if all(ok for _, ok in checks) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,319 @@
+"""Per-stage timings and memory of the whole pipeline on local pages, fully offline.
+
+Usage:
+    python -m benchmarks.bench_pipeline --sizes 10KB 100KB 1MB 5MB 20MB -o bench.json
+    python -m benchmarks.bench_pipeline --recorded saved_pages/ -o bench.json
+    python -m benchmarks.bench_pipeline -o new.json --baseline bench.json     # run, then compare
+    python -m benchmarks.bench_pipeline --compare bench.json new.json          # compare two saved runs
+
+Synthetic pages (and any recorded *.html under --recorded) are served from a local HTTP
+server; answers come from the stub chat API (benchmarks/stub_llm.py) with --llm-latency.
+Each page runs in a fresh process so peak RSS belongs to that page alone. Stages:
+
+    fetch      WebScraperAgent.download (HTTP + decode)
+    parse      parse_html (lxml or BeautifulSoup extraction)
+    clean      clean_text
+    chunk      chunk_spans / token_chunk_spans
+    index      fitting the configured ranker (skipped for streamed pages, see below)
+    rank       scoring and top-k for all --questions
+    highlight  SentenceIndex build + highlight for all --questions
+    snippets   extract_snippets for all --questions (the unindexed path; skipped on
+               pages whose text exceeds --snippets-max-chars, where it takes minutes)
+    answer     QnAAgent.answer for the first question (stub LLM)
+    process    ContentProcessorAgent.process end to end for one question
+
+Pages whose cleaned text exceeds the processor's `stream_above` are ranked the way
+the processor ranks them: streamed with a bounded top-k (utils.stream_rank), with
+highlights taken from the top chunks.
+
+Time is the median of --repeat runs; "alloc" is the tracemalloc peak of one extra run,
+"rss" the process high-water mark after the stage. Comparison uses the fastest run and
+flags stages that got slower or allocate more than --threshold (relative) beyond a
+small absolute floor; the exit status is 1 when anything regressed.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import re
+import resource
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from multiprocessing import get_context
+from typing import Callable, Dict, List, Optional, Tuple
+
+_WORDS = [f"w{i}" for i in range(8_000)]
+_UNITS = {"KB": 1024, "MB": 1024 * 1024, "B": 1}
+
+
+def parse_size(spec: str) -> int:
+    m = re.fullmatch(r"(\d+(?:\.\d+)?)\s*(KB|MB|B)?", spec.strip(), re.I)
+    if not m:
+        raise argparse.ArgumentTypeError(f"bad size {spec!r}; use e.g. 10KB, 1MB")
+    return int(float(m.group(1)) * _UNITS[(m.group(2) or "B").upper()])
+
+
+def synthetic_page(n_bytes: int, seed: int = 0) -> bytes:
+    """Article-like HTML of roughly `n_bytes`: boilerplate, scripts, headings, prose and tables."""
+    rng = random.Random(seed)
+    weights = [1.0 / (r + 1) for r in range(len(_WORDS))]
+
+    def sentence() -> str:
+        words = rng.choices(_WORDS, weights, k=rng.randint(8, 24))
+        return " ".join(words).capitalize() + rng.choice([".", ".", ".", "?", "!"])
+
+    head = (
+        "<!doctype html><html><head><meta charset='utf-8'><title>Synthetic benchmark page</title>"
+        "<style>" + "body{margin:0} .x{color:red} " * 40 + "</style>"
+        "<script>" + "var a=1;function f(){return a+1};" * 60 + "</script></head><body>"
+        "<nav>" + "".join(f"<a href='/l{i}'>Link {i}</a> " for i in range(40)) + "</nav><article>"
+    )
+    tail = "</article><footer>Footer text &copy; benchmark</footer></body></html>"
+    parts, size, section = [head], len(head) + len(tail), 0
+    while size < n_bytes:
+        section += 1
+        block = [f"<h2>Section {section}</h2>"]
+        block += [f"<p>{' '.join(sentence() for _ in range(rng.randint(3, 7)))}</p>" for _ in range(6)]
+        if section % 5 == 0:
+            block.append("<table>" + "".join(f"<tr><td>{rng.choice(_WORDS)}</td><td>{rng.randint(0, 999)}</td></tr>"
+                                             for _ in range(10)) + "</table>")
+        chunk = "".join(block)
+        parts.append(chunk)
+        size += len(chunk)
+    parts.append(tail)
+    return "".join(parts).encode("utf-8")
+
+
+def questions_for(n: int, seed: int = 1) -> List[str]:
+    rng = random.Random(seed)
+    return [f"What does the page say about {' '.join(rng.choices(_WORDS[:2000], k=3))}?" for _ in range(n)]
+
+
+def serve_pages(pages: Dict[str, bytes]) -> Tuple[ThreadingHTTPServer, str]:
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True
+
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            body = pages.get(self.path.lstrip("/"))
+            if body is None:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+# ---- child process: run every stage for one page ----
+def _rss_mb() -> float:
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def _stage(name: str, fn: Callable, repeat: int, rows: List[dict]):
+    times, out = [], None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn()
+        times.append(time.perf_counter() - t0)
+    rss = _rss_mb()
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    rows.append({"stage": name, "median_s": statistics.median(times), "min_s": min(times), "runs": repeat,
+                 "alloc_peak_mb": peak / 1e6, "rss_peak_mb": rss})
+    return out
+
+
+def run_page(url: str, opts: dict) -> List[dict]:
+    from agents.contentProcessor import ContentProcessorAgent
+    from agents.qna_agent import QnAAgent
+    from agents.web_scrapper import WebScraperAgent, parse_html
+    from utils.stream_rank import highlight_in_spans, stream_top_k
+    from utils.text_utils import ChunkView, chunk_spans, clean_text, extract_snippets
+    from utils.token_utils import token_chunk_spans
+    from utils.sentence_index import SentenceIndex
+    from utils.bm25 import top_k_indices
+
+    repeat, questions, k = opts["repeat"], opts["questions"], opts["top_k"]
+    scraper = WebScraperAgent(max_bytes=opts["max_bytes"], keep_html=False)
+    processor = ContentProcessorAgent(top_k=k, ranker=opts["ranker"], chunking=opts["chunking"])
+    qna = QnAAgent()
+    rows: List[dict] = []
+
+    html, _ = _stage("fetch", lambda: scraper.download(url), repeat, rows)
+    sres = _stage("parse", lambda: parse_html(html, url, keep_html=False), repeat, rows)
+    cleaned = _stage("clean", lambda: clean_text(sres.text), repeat, rows)
+    if opts["chunking"] == "tokens":
+        spans = _stage("chunk", lambda: token_chunk_spans(cleaned, max_total_chars=None, max_chunks=None), repeat, rows)
+    else:
+        spans = _stage("chunk", lambda: chunk_spans(cleaned, processor.max_chars, processor.overlap,
+                                                    max_total_chars=None, max_chunks=None), repeat, rows)
+    if len(cleaned) > processor.stream_above:
+        # Streamed document: no index; rank streams over the chunks, highlights come from the top-k.
+        chunks = ChunkView(cleaned, spans)
+        method = "jaccard" if processor.ranker == "jaccard" else "bm25"
+        orders = _stage("rank", lambda: stream_top_k(chunks, questions, k, method=method), repeat, rows)
+        _stage("highlight", lambda: [highlight_in_spans(cleaned, [spans[i] for i in order], q, k)
+                                     for q, order in zip(questions, orders)], repeat, rows)
+    else:
+        chunks = [cleaned[s:e] for s, e in spans]
+        index = _stage("index", lambda: processor._fit_index(chunks), repeat, rows)
+        if index is not None:
+            def rank_all():
+                scores = index.score_many(questions)
+                return [top_k_indices(scores[:, j], k) for j in range(len(questions))]
+
+            _stage("rank", rank_all, repeat, rows)
+
+        def highlight_all():
+            sentences = SentenceIndex.build(cleaned)
+            return [sentences.highlight(q, k) for q in questions]
+
+        _stage("highlight", highlight_all, repeat, rows)
+    if len(cleaned) <= opts["snippets_max_chars"]:
+        _stage("snippets", lambda: [extract_snippets(cleaned, q, k=k) for q in questions], repeat, rows)
+    context = chunks[:k]
+    qna.answer(questions[0], context)  # warm-up: SDK import and connection setup are not per-answer costs
+    _stage("answer", lambda: qna.answer(questions[0], context), repeat, rows)
+    _stage("process", lambda: processor.process(sres.text, questions[0]), repeat, rows)
+    return rows
+
+
+# ---- comparison ----
+def compare(baseline: dict, current: dict, threshold: float, min_time: float = 0.002,
+            min_alloc: float = 1.0) -> List[dict]:
+    """One row per (page, stage); status is REGRESSION, faster, ok, new or missing."""
+    def keyed(run):
+        return {(r["page"], r["stage"]): r for r in run["results"]}
+
+    base, cur = keyed(baseline), keyed(current)
+    out = []
+    for key in list(base) + [k for k in cur if k not in base]:
+        b, c = base.get(key), cur.get(key)
+        row = {"page": key[0], "stage": key[1], "status": "ok"}
+        if b is None or c is None:
+            row["status"] = "new" if b is None else "missing"
+            out.append(row)
+            continue
+        # Fastest run is the least noisy estimate of a stage's cost on a shared machine.
+        row["time_ratio"] = c["min_s"] / b["min_s"] if b["min_s"] else None
+        row["alloc_ratio"] = c["alloc_peak_mb"] / b["alloc_peak_mb"] if b["alloc_peak_mb"] else None
+        slower = c["min_s"] > b["min_s"] * (1 + threshold) and c["min_s"] - b["min_s"] > min_time
+        heavier = (c["alloc_peak_mb"] > b["alloc_peak_mb"] * (1 + threshold)
+                   and c["alloc_peak_mb"] - b["alloc_peak_mb"] > min_alloc)
+        if slower or heavier:
+            row["status"] = "REGRESSION"
+            row["why"] = ", ".join(w for w, hit in (("time", slower), ("alloc", heavier)) if hit)
+        elif c["min_s"] < b["min_s"] * (1 - threshold) and b["min_s"] - c["min_s"] > min_time:
+            row["status"] = "faster"
+        out.append(row)
+    return out
+
+
+def print_comparison(rows: List[dict]) -> int:
+    print(f"{'page':<18} {'stage':<10} {'time x':>8} {'alloc x':>8}  status")
+    for r in rows:
+        t = f"{r['time_ratio']:.2f}" if r.get("time_ratio") else "-"
+        a = f"{r['alloc_ratio']:.2f}" if r.get("alloc_ratio") else "-"
+        status = r["status"] + (f" ({r['why']})" if r.get("why") else "")
+        print(f"{r['page']:<18} {r['stage']:<10} {t:>8} {a:>8}  {status}")
+    regressions = sum(r["status"] == "REGRESSION" for r in rows)
+    print(f"\n{regressions} regression(s)")
+    return 1 if regressions else 0
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--sizes", type=parse_size, nargs="*", default=[parse_size(s) for s in
+                                                                     ("10KB", "100KB", "1MB", "5MB", "20MB")])
+    ap.add_argument("--recorded", help="directory of saved .html pages to include")
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--questions", type=int, default=10)
+    ap.add_argument("--top-k", type=int, default=3)
+    ap.add_argument("--ranker", choices=["tfidf", "bm25", "jaccard", "dense", "hybrid"], default="tfidf")
+    ap.add_argument("--chunking", choices=["chars", "tokens"], default="chars")
+    ap.add_argument("--snippets-max-chars", type=int, default=2_000_000)
+    ap.add_argument("--llm-latency", type=float, default=0.05, help="stub chat API latency in seconds")
+    ap.add_argument("-o", "--output", help="write results JSON here")
+    ap.add_argument("--baseline", help="compare this run against a saved results JSON")
+    ap.add_argument("--compare", nargs=2, metavar=("BASELINE", "CURRENT"), help="compare two saved runs and exit")
+    ap.add_argument("--threshold", type=float, default=0.2, help="relative slowdown/extra allocation that fails")
+    args = ap.parse_args()
+
+    if args.compare:
+        with open(args.compare[0]) as b, open(args.compare[1]) as c:
+            sys.exit(print_comparison(compare(json.load(b), json.load(c), args.threshold)))
+
+    pages: Dict[str, bytes] = {}
+    for size in args.sizes:
+        label = f"synthetic-{size // 1024}KB" if size < 1024 * 1024 else f"synthetic-{size // (1024 * 1024)}MB"
+        pages[label] = synthetic_page(size)
+    if args.recorded:
+        for name in sorted(os.listdir(args.recorded)):
+            if name.endswith((".html", ".htm")):
+                with open(os.path.join(args.recorded, name), "rb") as fh:
+                    pages[f"recorded-{name}"] = fh.read()
+
+    from benchmarks.stub_llm import serve
+    _, llm_url = serve(latency=args.llm_latency)
+    os.environ.update(OPENAI_BASE_URL=llm_url, OPENAI_API_KEY="stub")
+    _, base = serve_pages(pages)
+
+    opts = {"repeat": args.repeat, "questions": questions_for(args.questions), "top_k": args.top_k,
+            "ranker": args.ranker, "chunking": args.chunking, "snippets_max_chars": args.snippets_max_chars,
+            "max_bytes": max(len(b) for b in pages.values()) + 1}
+    results = []
+    print(f"{'page':<18} {'stage':<10} {'median (ms)':>12} {'alloc (MB)':>11} {'rss (MB)':>9}")
+    for label, body in pages.items():
+        # A fresh interpreter per page keeps RSS high-water marks independent.
+        with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as pool:
+            rows = pool.submit(run_page, f"{base}/{label}", opts).result()
+        for row in rows:
+            row.update(page=label, bytes=len(body))
+            results.append(row)
+            print(f"{label:<18} {row['stage']:<10} {row['median_s'] * 1000:>12.2f} "
+                  f"{row['alloc_peak_mb']:>11.1f} {row['rss_peak_mb']:>9.1f}")
+
+    run = {
+        "meta": {"python": platform.python_version(), "platform": platform.platform(), "commit": _git_commit(),
+                 "time": time.strftime("%Y-%m-%dT%H:%M:%S"), "cpu_count": os.cpu_count(),
+                 "options": {k: v for k, v in vars(args).items() if k not in ("output", "baseline", "compare")}},
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as fh:
+            json.dump(run, fh, indent=2)
+    if args.baseline:
+        with open(args.baseline) as fh:
+            print()
+            sys.exit(print_comparison(compare(json.load(fh), run, args.threshold)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""Latency and memory of the chunk rankers (TF-IDF, BM25, Jaccard) by chunk count.
+
+Usage:
+    python -m benchmarks.bench_ranking [--sizes 10 100 1000 10000 100000] [--queries 20]
+
+"fit" is the one-off per-document cost, "query" the per-question cost (mean over
+--queries), "peak" the tracemalloc peak during fit.
+"""
+import argparse
+import random
+import time
+import tracemalloc
+
+from utils.bm25 import BM25Index, top_k_indices
+from utils.text_utils import simple_rank_chunks
+
+try:
+    from utils.doc_index import DocumentIndex
+except Exception:  # sklearn not installed
+    DocumentIndex = None
+
+_WORDS = [f"w{i}" for i in range(20_000)]
+
+
+def make_chunks(n: int, words_per_chunk: int = 120, seed: int = 0):
+    rng = random.Random(seed)
+    # Zipf-ish vocabulary so document frequencies look like real text.
+    weights = [1.0 / (r + 1) for r in range(len(_WORDS))]
+    return [" ".join(rng.choices(_WORDS, weights, k=words_per_chunk)) for _ in range(n)]
+
+
+def make_queries(n: int, seed: int = 1):
+    rng = random.Random(seed)
+    return [" ".join(rng.choices(_WORDS[:5000], k=6)) for _ in range(n)]
+
+
+def _measure(fn):
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    out = fn()
+    elapsed = time.perf_counter() - t0
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return out, elapsed, peak
+
+
+def bench(n: int, queries, k: int = 3):
+    chunks = make_chunks(n)
+    rows = []
+    fitters = [("bm25", BM25Index.fit)]
+    if DocumentIndex is not None:
+        fitters.insert(0, ("tfidf", DocumentIndex.fit))
+    for name, fit in fitters:
+        index, fit_s, peak = _measure(lambda: fit(chunks))
+        t0 = time.perf_counter()
+        for q in queries:
+            top_k_indices(index.score(q), k)
+        rows.append((name, n, fit_s, (time.perf_counter() - t0) / len(queries), peak))
+    # Jaccard has no fit step: all work happens per question (timed without tracemalloc overhead).
+    t0 = time.perf_counter()
+    simple_rank_chunks(chunks, queries[0])
+    q_s = time.perf_counter() - t0
+    _, _, peak = _measure(lambda: simple_rank_chunks(chunks, queries[0]))
+    rows.append(("jaccard", n, 0.0, q_s, peak))
+    return rows
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1_000, 10_000, 100_000])
+    ap.add_argument("--queries", type=int, default=20)
+    args = ap.parse_args()
+    queries = make_queries(args.queries)
+    print(f"{'method':<8} {'chunks':>8} {'fit (s)':>10} {'query (ms)':>11} {'peak (MB)':>10}")
+    for n in args.sizes:
+        for name, size, fit_s, q_s, peak in bench(n, queries):
+            print(f"{name:<8} {size:>8} {fit_s:>10.3f} {q_s * 1000:>11.2f} {peak / 1e6:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
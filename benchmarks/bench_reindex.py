@@ -0,0 +1,132 @@
+"""Re-indexing a large page after a small edit: `update` vs `prepare` from scratch.
+
+Usage:
+    python -m benchmarks.bench_reindex [--sizes-mb 0.5 2] [--rankers tfidf bm25] [--questions 20] [-o reindex.json]
+
+Each page is synthetic prose (benchmarks.bench_streaming.make_text) indexed with
+`ContentProcessorAgent.prepare`; `stream_above` is raised so every size gets a full
+index. Each edit is then applied, and the new text is indexed twice: by `prepare`,
+and by `update` from the old document. Edits:
+
+    insert    one sentence inserted in the middle
+    reword    one word replaced at 60% of the page
+    prepend   one sentence added at the top (shifts every offset)
+
+Columns:
+
+    prepare_ms  full index of the edited page (best of --repeat)
+    update_ms   incremental index of the edited page (best of --repeat)
+    speedup     prepare_ms / update_ms
+    reused      chunks of the edited page taken over from the old document
+
+Checks (exit status 1 if any fails): `update` gives the same chunks, top-k chunks and
+highlights as `prepare` for every row, and with "content" chunking it is faster than
+`prepare` for every edit.
+"""
+import argparse
+import json
+import sys
+import time
+from typing import Callable, Dict, List
+
+import numpy as np
+
+from benchmarks.bench_streaming import make_text, questions_for
+
+_MB = 1024 * 1024
+_SENTENCE = "An operator added this sentence after the last review."
+
+
+def _at_sentence(text: str, frac: float) -> int:
+    """Offset of the sentence start nearest after `frac` of `text`."""
+    return text.index(". ", int(len(text) * frac)) + 2
+
+
+def _reword(text: str) -> str:
+    i = _at_sentence(text, 0.6)
+    j = text.index(" ", i)
+    return text[:i] + "Meanwhile" + text[j:]
+
+
+EDITS: Dict[str, Callable[[str], str]] = {
+    "insert": lambda text: text[:_at_sentence(text, 0.5)] + _SENTENCE + " " + text[_at_sentence(text, 0.5):],
+    "reword": _reword,
+    "prepend": lambda text: _SENTENCE + " " + text,
+}
+
+
+def best_ms(fn: Callable[[], object], repeat: int):
+    best, out = float("inf"), None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn()
+        best = min(best, time.perf_counter() - t0)
+    return out, round(best * 1000, 1)
+
+
+def same(agent, full, incremental, questions: List[str]) -> bool:
+    if not np.array_equal(full.spans, incremental.spans):
+        return False
+    a, b = agent.rank_many(full, questions), agent.rank_many(incremental, questions)
+    return all(x.top_chunk_indices == y.top_chunk_indices and x.highlights == y.highlights for x, y in zip(a, b))
+
+
+def measure(text: str, chunking: str, ranker: str, questions: List[str], repeat: int) -> List[dict]:
+    from agents.contentProcessor import ContentProcessorAgent
+    agent = ContentProcessorAgent(ranker=ranker, chunking=chunking, stream_above=len(text) * 2)
+    old = agent.prepare(text)
+    rows = []
+    for name, edit in EDITS.items():
+        new = edit(text)
+        full, prepare_ms = best_ms(lambda: agent.prepare(new), repeat)
+        incremental, update_ms = best_ms(lambda: agent.update(old, new), repeat)
+        old_chunks = set(old.chunks)
+        reused = sum(chunk in old_chunks for chunk in incremental.chunks)
+        rows.append({"chunking": chunking, "ranker": ranker, "edit": name, "chunks": len(incremental.spans),
+                     "prepare_ms": prepare_ms, "update_ms": update_ms,
+                     "speedup": round(prepare_ms / max(update_ms, 1e-3), 2),
+                     "reused": round(reused / max(len(incremental.spans), 1), 3),
+                     "same": same(agent, full, incremental, questions)})
+    return rows
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--sizes-mb", type=float, nargs="+", default=[0.5, 2])
+    ap.add_argument("--rankers", nargs="+", default=["tfidf", "bm25"])
+    ap.add_argument("--questions", type=int, default=20)
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("-o", "--output", help="write results JSON here")
+    args = ap.parse_args()
+
+    questions = questions_for(args.questions)
+    measure(make_text(64 * 1024), "content", "tfidf", questions[:1], 1)  # imports and caches are not timed
+    rows = []
+    for size in args.sizes_mb:
+        text = make_text(int(size * _MB))
+        for ranker in args.rankers:
+            for chunking in ("chars", "content"):
+                rows.extend({"size_mb": size, **row} for row in measure(text, chunking, ranker, questions, args.repeat))
+
+    cols = ["chunks", "prepare_ms", "update_ms", "speedup", "reused"]
+    print(f"{'size_mb':>7} {'chunking':<8} {'ranker':<6} {'edit':<8} " + " ".join(f"{c:>10}" for c in cols))
+    for row in rows:
+        print(f"{row['size_mb']:>7} {row['chunking']:<8} {row['ranker']:<6} {row['edit']:<8} "
+              + " ".join(f"{row[c]:>10}" for c in cols))
+    content = [row for row in rows if row["chunking"] == "content"]
+    checks = [("same", all(row["same"] for row in rows),
+               f"{sum(row['same'] for row in rows)}/{len(rows)} updates match prepare"),
+              ("faster", all(row["speedup"] > 1 for row in content),
+               f"content chunking: {min(row['speedup'] for row in content)}x-{max(row['speedup'] for row in content)}x, "
+               f"{min(row['reused'] for row in content):.1%}+ chunks reused")]
+    print(f"\n{'check':<8} {'ok':<5} detail")
+    for name, ok, detail in checks:
+        print(f"{name:<8} {str(ok):<5} {detail}")
+    if args.output:
+        with open(args.output, "w") as fh:
+            json.dump({"options": vars(args), "results": rows, "checks": checks}, fh, indent=2)
+    sys.exit(0 if all(ok for _, ok, _ in checks) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,260 @@
+"""Load test for the HTTP API (service.py): requests/s and tail latency under concurrency.
+
+Usage:
+    python -m benchmarks.bench_service [--concurrency 32] [--clients 8] [--requests 300] [--pages 20]
+                                       [--latency 0.05] [-o service.json]
+
+Starts the stub LLM (benchmarks.stub_llm) and a local page server, both answering
+after --latency seconds, and runs service.py under uvicorn in this process with a
+fresh document store and LLM cache in a temporary directory. --concurrency client
+threads, spread over --clients X-Client-Id values, then send POST /ask:
+
+    cold     every (page, question) pair once: pages fetched and indexed, LLM called
+    warm     --requests requests over the same pairs: served from the caches
+    stream   POST /ask/stream, one new question per request; ttfb is the first delta
+
+Columns: requests, errors, requests/s, and p50/p95/p99 latency in milliseconds.
+
+Checks (exit status 1 if any fails): no errors under load; each page fetched once and
+the LLM called once per pair across both phases; every stream ends in a "result" whose
+answer is the deltas joined; a client over --per-client gets 429; a request past its
+"timeout" gets 504 without waiting for the slow page, and its client slot is freed
+only when the abandoned work ends; a malformed request gets 400.
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import requests
+
+from benchmarks.bench_coalesce import QUESTIONS, make_site, together
+from benchmarks.bench_crawl import serve_site
+from benchmarks.stub_llm import Faults, serve
+
+_SETTINGS = {"ranker": "bm25"}
+
+
+def percentile(values: List[float], p: int) -> float:
+    if len(values) < 2:
+        return values[0] if values else 0.0
+    return statistics.quantiles(values, n=100, method="inclusive")[p - 1]
+
+
+def start_service(**kwargs) -> Tuple[object, str]:
+    """Run service.py's app under uvicorn on a daemon thread; returns (server, base URL)."""
+    import uvicorn
+
+    from service import create_app
+
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(create_app(**kwargs), host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    return server, f"http://127.0.0.1:{port}"
+
+
+def load(api: str, jobs: List[dict], concurrency: int, clients: int, path: str = "/ask") -> dict:
+    """POST every job from `concurrency` threads; returns throughput, latency percentiles and statuses."""
+    lock = threading.Lock()
+    todo = iter(enumerate(jobs))
+    latencies: List[float] = []
+    statuses: Dict[int, int] = {}
+
+    def worker(i: int) -> None:
+        session = requests.Session()
+        headers = {"X-Client-Id": f"client-{i % clients}"}
+        while True:
+            with lock:
+                job = next(todo, None)
+            if job is None:
+                return
+            t0 = time.perf_counter()
+            status = session.post(api + path, json=job[1], headers=headers, timeout=60).status_code
+            secs = time.perf_counter() - t0
+            with lock:
+                latencies.append(secs)
+                statuses[status] = statuses.get(status, 0) + 1
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - t0
+    return {"requests": len(jobs), "errors": len(jobs) - statuses.get(200, 0), "rps": round(len(jobs) / wall, 1),
+            "p50_ms": round(percentile(latencies, 50) * 1000, 1), "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+            "p99_ms": round(percentile(latencies, 99) * 1000, 1), "statuses": statuses, "wall_s": round(wall, 3)}
+
+
+def read_stream(api: str, body: dict, client: str) -> Tuple[Optional[float], float, List[Tuple[str, dict]]]:
+    """(seconds to the first delta, seconds to the end, [(event, data)]) for one POST /ask/stream."""
+    t0 = time.perf_counter()
+    first, events, event = None, [], None
+    with requests.post(api + "/ask/stream", json=body, headers={"X-Client-Id": client}, stream=True,
+                       timeout=60) as r:
+        for line in r.iter_lines(decode_unicode=True):
+            if line.startswith("event: "):
+                event = line[len("event: "):]
+            elif line.startswith("data: "):
+                if event == "delta" and first is None:
+                    first = time.perf_counter() - t0
+                events.append((event, json.loads(line[len("data: "):])))
+    return first, time.perf_counter() - t0, events
+
+
+def streams(api: str, base: str, n: int, concurrency: int, clients: int) -> Tuple[dict, bool]:
+    """Row for n streamed questions, and whether every stream ended in a matching result."""
+    lock = threading.Lock()
+    out: List[Tuple[Optional[float], float, List[Tuple[str, dict]]]] = []
+    todo = iter(range(n))
+
+    def worker(i: int) -> None:
+        while True:
+            with lock:
+                k = next(todo, None)
+            if k is None:
+                return
+            body = {"url": base + "/page-0.html", "question": f"{QUESTIONS[0]} (stream {k})", **_SETTINGS}
+            res = read_stream(api, body, f"client-{i % clients}")
+            with lock:
+                out.append(res)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(min(concurrency, n))]
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - t0
+    ok = True
+    for _, _, events in out:
+        deltas = "".join(d["text"] for e, d in events if e == "delta")
+        ok &= bool(events) and events[-1][0] == "result" and events[-1][1]["answer"] == deltas
+    ttfb = [f for f, _, _ in out if f is not None]
+    total = [t for _, t, _ in out]
+    return {"requests": n, "errors": n - len(ttfb), "rps": round(n / wall, 1),
+            "p50_ms": round(percentile(total, 50) * 1000, 1), "p95_ms": round(percentile(total, 95) * 1000, 1),
+            "p99_ms": round(percentile(total, 99) * 1000, 1), "ttfb_p50_ms": round(percentile(ttfb, 50) * 1000, 1),
+            "ttfb_p95_ms": round(percentile(ttfb, 95) * 1000, 1), "wall_s": round(wall, 3)}, ok
+
+
+def over_limit(api: str, slow: str, per_client: int) -> Dict[int, int]:
+    """Statuses of per_client + 4 simultaneous slow requests from one client."""
+    def ask(i: int) -> int:
+        body = {"url": f"{slow}/page-{i}.html", "question": QUESTIONS[0], **_SETTINGS}
+        return requests.post(api + "/ask", json=body, headers={"X-Client-Id": "greedy"}, timeout=60).status_code
+
+    out, _ = together(per_client + 4, ask)
+    statuses: Dict[int, int] = {}
+    for s in out:
+        statuses[s] = statuses.get(s, 0) + 1
+    return statuses
+
+
+def past_deadline(api: str, slow: str, timeout: float, wait: float) -> Tuple[int, float, int, bool]:
+    """(status, seconds, slots held just after, released within `wait`) for a request that cannot finish in time."""
+    body = {"url": slow + "/shared-timeout.html", "question": QUESTIONS[0], "timeout": timeout, **_SETTINGS}
+    t0 = time.perf_counter()
+    status = requests.post(api + "/ask", json=body, headers={"X-Client-Id": "hasty"}, timeout=60).status_code
+    secs = time.perf_counter() - t0
+
+    def held() -> int:
+        return requests.get(api + "/healthz", timeout=10).json()["active"].get("hasty", 0)
+
+    after, give_up = held(), time.monotonic() + wait
+    while held() and time.monotonic() < give_up:
+        time.sleep(0.05)
+    return status, secs, after, not held()
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--concurrency", type=int, default=32, help="client threads")
+    ap.add_argument("--clients", type=int, default=8, help="distinct X-Client-Id values")
+    ap.add_argument("--requests", type=int, default=300, help="requests in the warm phase")
+    ap.add_argument("--pages", type=int, default=20)
+    ap.add_argument("--streams", type=int, default=32)
+    ap.add_argument("--latency", type=float, default=0.05, help="page server and LLM delay per request (s)")
+    ap.add_argument("--slow-latency", type=float, default=1.0, help="delay of the pages used by the limit checks")
+    ap.add_argument("--workers", type=int, default=32, help="service pipeline threads")
+    ap.add_argument("--cpu-workers", type=int, default=2, help="service parse/index processes")
+    ap.add_argument("--per-client", type=int, default=8)
+    ap.add_argument("-o", "--output", help="write results JSON here")
+    args = ap.parse_args()
+
+    faults = Faults()
+    llm_server, llm_base = serve(latency=args.latency, token_delay=0.002, faults=faults)
+    os.environ.update(OPENAI_BASE_URL=llm_base, OPENAI_API_KEY="stub")
+    site_server, base, requested = serve_site(make_site(args.pages), args.latency)
+    slow_server, slow, _ = serve_site(make_site(args.per_client + 4), args.slow_latency)
+
+    from orchestrator import warm_up
+    from utils.doc_store import DocumentStore
+    from utils.llm_cache import SQLiteResponseCache
+    warm_up(ranker=_SETTINGS["ranker"])  # imports and client set-up are not what is being timed
+
+    pairs = [{"url": f"{base}/page-{p}.html", "question": q, **_SETTINGS}
+             for q in QUESTIONS for p in range(args.pages)]
+    with tempfile.TemporaryDirectory() as tmp:
+        server, api = start_service(workers=args.workers, cpu_workers=args.cpu_workers, per_client=args.per_client,
+                                    timeout=30.0, warm_up=False, store=DocumentStore(os.path.join(tmp, "store")),
+                                    llm_cache=SQLiteResponseCache(os.path.join(tmp, "llm.sqlite3")))
+        try:
+            rows = {"cold": load(api, pairs, args.concurrency, args.clients)}
+            llm_cold = faults.requests
+            rows["warm"] = load(api, [pairs[i % len(pairs)] for i in range(args.requests)],
+                                args.concurrency, args.clients)
+            page_requests, llm_calls = len(requested), faults.requests
+            rows["stream"], streams_ok = streams(api, base, args.streams, args.concurrency, args.clients)
+            limited = over_limit(api, slow, args.per_client)
+            deadline_status, deadline_s, held, released = past_deadline(api, slow, args.slow_latency / 5,
+                                                                          args.slow_latency * 5)
+            bad = requests.post(api + "/ask", json={"url": base + "/page-0.html"}, timeout=10).status_code
+        finally:
+            server.should_exit = True
+            site_server.shutdown()
+            slow_server.shutdown()
+            llm_server.shutdown()
+
+    print(f"{args.concurrency} client threads as {args.clients} clients, {args.pages} pages x {len(QUESTIONS)} "
+          f"questions, {args.latency}s page and LLM latency\n")
+    cols = ["requests", "errors", "rps", "p50_ms", "p95_ms", "p99_ms"]
+    print(f"{'phase':<8} " + " ".join(f"{c:>9}" for c in cols))
+    for name, row in rows.items():
+        print(f"{name:<8} " + " ".join(f"{row[c]:>9}" for c in cols))
+    print(f"  stream time to first delta: p50 {rows['stream']['ttfb_p50_ms']} ms, p95 {rows['stream']['ttfb_p95_ms']} ms")
+
+    checks = [
+        ("no errors", not rows["cold"]["errors"] and not rows["warm"]["errors"],
+         f"statuses cold {rows['cold']['statuses']}, warm {rows['warm']['statuses']}"),
+        ("shared caches", page_requests == args.pages and llm_calls == llm_cold == len(pairs),
+         f"{page_requests} page requests for {args.pages} pages, {llm_calls} LLM calls for {len(pairs)} pairs"),
+        ("stream", streams_ok, f"{args.streams} streams ended in a result matching their deltas: {streams_ok}"),
+        ("per-client", limited.get(429, 0) >= 1 and limited.get(200, 0) + limited.get(429, 0) == args.per_client + 4,
+         f"{args.per_client + 4} at once from one client: {limited}"),
+        ("deadline", deadline_status == 504 and deadline_s < args.slow_latency and held == 1 and released,
+         f"status {deadline_status} after {deadline_s:.2f}s; slot held until the work ended: {held == 1 and released}"),
+        ("bad request", bad == 400, f"status {bad} without a question"),
+    ]
+    print(f"\n{'check':<14} {'ok':<5} detail")
+    for name, ok, detail in checks:
+        print(f"{name:<14} {str(ok):<5} {detail}")
+    if args.output:
+        with open(args.output, "w") as fh:
+            json.dump({"options": vars(args), "results": rows, "checks": checks}, fh, indent=2)
+    sys.exit(0 if all(ok for _, ok, _ in checks) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""Peak memory and latency of whole-document ranking: capped, fully in memory, and streamed.
+
+Usage:
+    python -m benchmarks.bench_streaming [--sizes-mb 5 50] [--questions 10] [-o streaming.json]
+
+Modes, each in a fresh process on the same cleaned synthetic text:
+
+    capped     the old behaviour: first 600,000 chars / 200 chunks, BM25 index over those
+    in-memory  every chunk as a string plus a BM25 index over all of them
+    streamed   ContentProcessorAgent on a streamed document: chunk offsets only, two
+               passes per question batch and a top-k heap (utils.stream_rank)
+
+A "needle" sentence is planted at 90% of the text; `found` says whether the first
+question's top-k contains it. Times are the fastest of --repeat runs; "alloc" is the
+tracemalloc peak of one extra run, not counting the text itself.
+"""
+import argparse
+import itertools
+import json
+import random
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from typing import Callable, List, Tuple
+
+_WORDS = [f"w{i}" for i in range(8_000)]
+NEEDLE = "The zephyr quokka calibration constant is forty two."
+MODES = ("capped", "in-memory", "streamed")
+
+
+def make_text(n_bytes: int, seed: int = 0) -> str:
+    """Cleaned Zipf-distributed prose of about `n_bytes`, with NEEDLE at 90%."""
+    rng = random.Random(seed)
+    cum_weights = list(itertools.accumulate(1.0 / (r + 1) for r in range(len(_WORDS))))
+    parts, size, planted = [], 0, False
+    while size < n_bytes:
+        if not planted and size >= 0.9 * n_bytes:
+            parts.append(NEEDLE)
+            planted = True
+        sentence = " ".join(rng.choices(_WORDS, cum_weights=cum_weights, k=rng.randint(8, 24))).capitalize() + "."
+        parts.append(sentence)
+        size += len(sentence) + 1
+    return " ".join(parts)
+
+
+def questions_for(n: int, seed: int = 1) -> List[str]:
+    rng = random.Random(seed)
+    return ["What is the zephyr quokka calibration constant?"] + [
+        f"What does the page say about {' '.join(rng.choices(_WORDS[:2000], k=3))}?" for _ in range(n - 1)]
+
+
+def _measure(fn: Callable, repeat: int) -> Tuple[object, float, float]:
+    best, out = float("inf"), None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn()
+        best = min(best, time.perf_counter() - t0)
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+    tracemalloc.stop()
+    return out, best, peak
+
+
+def run_mode(mode: str, n_bytes: int, n_questions: int, top_k: int, repeat: int) -> dict:
+    from agents.contentProcessor import ContentProcessorAgent
+    from utils.bm25 import BM25Index, top_k_indices
+    from utils.text_utils import chunk_spans
+
+    text = make_text(n_bytes)
+    questions = questions_for(n_questions)
+    needle_at = text.index(NEEDLE)
+
+    if mode == "streamed":
+        processor = ContentProcessorAgent(top_k=top_k, ranker="bm25")
+
+        def run():
+            doc = processor.prepare(text)
+            return doc.spans, [r.top_chunk_indices for r in processor.rank_many(doc, questions)]
+    else:
+        cap = {"max_total_chars": 600_000, "max_chunks": 200} if mode == "capped" else \
+              {"max_total_chars": None, "max_chunks": None}
+
+        def run():
+            spans = chunk_spans(text, **cap)
+            chunks = [text[s:e] for s, e in spans]
+            scores = BM25Index.fit(chunks).score_many(questions)
+            return spans, [top_k_indices(scores[:, j], top_k) for j in range(len(questions))]
+
+    (spans, orders), secs, peak = _measure(run, repeat)
+    found = any(spans[i][0] <= needle_at < spans[i][1] for i in orders[0])
+    return {"mode": mode, "mb": round(len(text) / (1024 * 1024), 1), "chunks": len(spans), "time_s": round(secs, 3),
+            "alloc_peak_mb": round(peak, 1), "found": found}
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--sizes-mb", type=float, nargs="+", default=[5, 50])
+    ap.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    ap.add_argument("--questions", type=int, default=10)
+    ap.add_argument("--top-k", type=int, default=3)
+    ap.add_argument("--repeat", type=int, default=2)
+    ap.add_argument("-o", "--output", help="write results JSON here")
+    args = ap.parse_args()
+
+    results = []
+    print(f"{'mode':<10} {'MB':>6} {'chunks':>8} {'time (s)':>9} {'alloc (MB)':>11}  found")
+    for mb in args.sizes_mb:
+        for mode in args.modes:
+            with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as pool:
+                row = pool.submit(run_mode, mode, int(mb * 1024 * 1024), args.questions, args.top_k,
+                                  args.repeat).result()
+            results.append(row)
+            print(f"{row['mode']:<10} {row['mb']:>6} {row['chunks']:>8} {row['time_s']:>9.3f} "
+                  f"{row['alloc_peak_mb']:>11.1f}  {row['found']}")
+    if args.output:
+        with open(args.output, "w") as fh:
+            json.dump({"options": vars(args), "results": results}, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
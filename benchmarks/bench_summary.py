@@ -0,0 +1,123 @@
+"""Page coverage and LLM calls of map-reduce summaries vs top-k chunks, before and after an edit.
+
+Usage:
+    python -m benchmarks.bench_summary [--sentences 4000] [--facts 40] [--latency 0.05] [-o summary.json]
+
+A long synthetic page carries --facts planted sentences spread evenly through it. It
+is served from a local HTTP server; answers come from the stub LLM (benchmarks.stub_llm)
+after --latency seconds. Each mode summarises the page, then an edited copy (one
+sentence inserted, one rewritten, both near the middle), on one OrchestratorAgent
+with no document store and no LLM cache. Columns:
+
+    sections    sections summarised (map_reduce) or chunks in the prompt (top_k)
+    coverage    planted facts inside text that reached the LLM
+    calls       LLM calls for the first summary
+    edit calls  LLM calls for the edited page (partial summaries are cached by content)
+    reused      sections of the edited page whose summary was reused
+    time_s      wall time of the first summary
+
+Checks (exit status 1 if any fails): map_reduce covers every fact, and the edited page
+costs at most a few calls (the changed sections, merges and the final combine).
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from typing import Dict, List, Tuple
+
+from benchmarks.bench_crawl import serve_site
+from benchmarks.stub_llm import Faults, serve
+
+_WORDS = ("the of and to a in is that it for on was with as by this are from or an at can release service "
+          "deploy region latency queue worker cache shard replica backup rollout metric alert").split()
+
+
+def make_sentences(n: int, n_facts: int, seed: int = 0) -> Tuple[List[str], List[str]]:
+    """(sentences, planted fact sentences); facts sit at evenly spaced positions."""
+    rng = random.Random(seed)
+    sentences = [" ".join(rng.choices(_WORDS, k=rng.randint(10, 22))).capitalize() + "." for _ in range(n)]
+    facts = []
+    for i in range(n_facts):
+        fact = f"The widget{i} rollout finished in region {rng.randint(1, 40)} after {rng.randint(2, 90)} minutes."
+        sentences[(i * n) // n_facts + n // (2 * n_facts)] = fact
+        facts.append(fact)
+    return sentences, facts
+
+
+def page(sentences: List[str]) -> Tuple[str, bytes]:
+    html = f"<html><head><title>Status history</title></head><body><p>{' '.join(sentences)}</p></body></html>"
+    return "text/html; charset=utf-8", html.encode("utf-8")
+
+
+def reached(summary: Dict, doc) -> List[Tuple[int, int]]:
+    """Spans of the page text that went into an LLM prompt."""
+    if summary["sections"]:
+        return [(s["start"], s["end"]) for s in summary["sections"]]
+    return [tuple(doc.spans[i].tolist()) for i in summary["top_chunk_indices"]]
+
+
+def measure(orch, mode: str, base: str, facts: List[str], faults: Faults) -> dict:
+    calls = faults.requests
+    t0 = time.perf_counter()
+    first = orch.summarize(base + "/page.html", mode=mode)
+    secs = time.perf_counter() - t0
+    calls, edit_calls = faults.requests - calls, faults.requests
+    edited = orch.summarize(base + "/edited.html", mode=mode)
+    edit_calls = faults.requests - edit_calls
+
+    doc = orch.load(base + "/page.html")
+    texts = [doc.cleaned_text[s:e] for s, e in reached(first, doc)]
+    covered = sum(any(f in t for t in texts) for f in facts)
+    return {"mode": mode, "sections": len(texts), "coverage": round(covered / len(facts), 3), "calls": calls,
+            "edit_calls": edit_calls, "reused": sum(s["cached"] for s in edited["sections"]),
+            "time_s": round(secs, 3)}
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--sentences", type=int, default=4000)
+    ap.add_argument("--facts", type=int, default=40)
+    ap.add_argument("--latency", type=float, default=0.05, help="stub LLM delay per request (s)")
+    ap.add_argument("-o", "--output", help="write results JSON here")
+    args = ap.parse_args()
+
+    sentences, facts = make_sentences(args.sentences, args.facts)
+    mid = len(sentences) // 2
+    edited = sentences[:mid] + ["Update: the queue backlog cleared at noon."] + sentences[mid:]
+    edited[mid + 40] = "This sentence was rewritten after the incident review."
+    faults = Faults()
+    llm_server, llm_base = serve(latency=args.latency, faults=faults)
+    os.environ.update(OPENAI_BASE_URL=llm_base, OPENAI_API_KEY="stub")
+    site_server, base, _ = serve_site({"/page.html": page(sentences), "/edited.html": page(edited)}, 0.0)
+
+    from orchestrator import OrchestratorAgent, warm_up
+    warm_up(ranker="bm25")
+    try:
+        rows = [measure(OrchestratorAgent(ranker="bm25", instrument=False, cpu_workers=0), mode, base, facts, faults)
+                for mode in ("top_k", "map_reduce")]
+    finally:
+        site_server.shutdown()
+        llm_server.shutdown()
+
+    print(f"{args.sentences} sentences, {args.facts} planted facts, {args.latency}s LLM latency\n")
+    cols = ["sections", "coverage", "calls", "edit_calls", "reused", "time_s"]
+    print(f"{'mode':<11} " + " ".join(f"{c:>10}" for c in cols))
+    for row in rows:
+        print(f"{row['mode']:<11} " + " ".join(f"{row[c]:>10}" for c in cols))
+    mr = rows[1]
+    checks = [("coverage", mr["coverage"] == 1.0, f"{mr['coverage']:.0%} of facts reached the LLM"),
+              ("edit", mr["edit_calls"] <= 5, f"{mr['edit_calls']} calls after the edit, "
+                                              f"{mr['reused']}/{mr['sections']} sections reused")]
+    print(f"\n{'check':<9} {'ok':<5} detail")
+    for name, ok, detail in checks:
+        print(f"{name:<9} {str(ok):<5} {detail}")
+    if args.output:
+        with open(args.output, "w") as fh:
+            json.dump({"options": vars(args), "results": rows, "checks": checks}, fh, indent=2)
+    sys.exit(0 if all(ok for _, ok, _ in checks) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+"""Local stand-in for the OpenAI chat-completions API (plain and SSE streaming).
+
+Usage:
+    python -m benchmarks.stub_llm --port 8799 --latency 0.2 --token-delay 0.01
+    OPENAI_BASE_URL=http://127.0.0.1:8799/v1 OPENAI_API_KEY=stub streamlit run app.py
+
+The reply is deterministic: it echoes the question from the prompt word by word,
+so answers are stable across runs and cacheable. JSON-mode requests (batched
+questions) get one {"id", "answer"} entry per numbered question. `--fail-rate` /
+`--fail-first` inject 429 (with Retry-After) and 503 responses to exercise retries, and
+`--drop-after` cuts streamed replies after that many words.
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Iterator, List, Optional, Tuple
+
+
+def _reply_for(body: dict) -> str:
+    prompt = (body.get("messages") or [{}])[-1].get("content", "")
+    if (body.get("response_format") or {}).get("type") == "json_object":
+        block = prompt.split("Questions:\n", 1)[-1]
+        questions = re.findall(r"^(\d+)\. (.*)$", block, re.M)
+        return json.dumps({"answers": [{"id": int(i), "answer": f"Stub answer to: {q.strip()}"} for i, q in questions]})
+    m = re.search(r"Question: (.*?)\nAnswer:", prompt, re.S)
+    question = m.group(1).strip() if m else prompt[-200:]
+    return f"Stub answer to: {question}"
+
+
+class Faults:
+    """Failure injection shared by all handler threads; counts what it served.
+
+    Failures are 429 (with Retry-After) or 503, mixed 70/30 unless `fail_status` fixes
+    one. Streamed replies stop after `drop_after` deltas, the connection closed in the
+    middle of the chunked body. `arrivals` holds the monotonic time each request came
+    in, and `peak` the most requests the stub was handling at once.
+    """
+
+    def __init__(self, fail_rate: float = 0.0, fail_first: int = 0, retry_after: float = 0.05, seed: int = 0,
+                 fail_status: Optional[int] = None, drop_after: Optional[int] = None):
+        self.fail_rate = fail_rate
+        self.fail_first = fail_first
+        self.retry_after = retry_after
+        self.fail_status = fail_status
+        self.drop_after = drop_after
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.failures = 0
+        self.arrivals: List[float] = []
+        self.in_flight = 0
+        self.peak = 0
+
+    def next_failure(self) -> Optional[int]:
+        with self._lock:
+            self.requests += 1
+            if self.requests <= self.fail_first or self._rng.random() < self.fail_rate:
+                self.failures += 1
+                if self.fail_status is not None:
+                    return self.fail_status
+                return 429 if self._rng.random() < 0.7 else 503
+            return None
+
+    @contextmanager
+    def handling(self) -> Iterator[None]:
+        with self._lock:
+            self.arrivals.append(time.monotonic())
+            self.in_flight += 1
+            self.peak = max(self.peak, self.in_flight)
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+
+def make_handler(latency: float, token_delay: float, faults: Optional[Faults] = None):
+    faults = faults or Faults()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True  # headers and body go out in separate writes
+
+        def log_message(self, *args):
+            pass
+
+        def do_POST(self):
+            if not self.path.rstrip("/").endswith("/chat/completions"):
+                self.send_error(404)
+                return
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            with faults.handling():
+                self._complete(body)
+
+        def _complete(self, body: dict):
+            time.sleep(latency)
+            status = faults.next_failure()
+            if status is not None:
+                self._json(status, {"error": {"message": "injected failure", "type": "stub"}},
+                           headers={"Retry-After": str(faults.retry_after)} if status == 429 else None)
+                return
+            reply = _reply_for(body)
+            model = body.get("model", "stub")
+            usage = {"prompt_tokens": len(json.dumps(body.get("messages", []))) // 4,
+                     "completion_tokens": len(reply.split())}
+            usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+            if body.get("stream"):
+                self._stream(reply, model, usage if (body.get("stream_options") or {}).get("include_usage") else None)
+            else:
+                self._json(200, {
+                    "id": "chatcmpl-stub", "object": "chat.completion", "created": int(time.time()), "model": model,
+                    "choices": [{"index": 0, "message": {"role": "assistant", "content": reply},
+                                 "finish_reason": "stop"}],
+                    "usage": usage,
+                })
+
+        def _json(self, status: int, payload: dict, headers: Optional[dict] = None):
+            data = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            for k, v in (headers or {}).items():
+                self.send_header(k, v)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _stream(self, reply: str, model: str, usage: Optional[dict] = None):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            self.close_connection = True
+            chunk = {"id": "chatcmpl-stub", "object": "chat.completion.chunk", "created": 0, "model": model}
+            words = reply.split(" ")
+            for i, word in enumerate(words):
+                if faults.drop_after is not None and i >= faults.drop_after:
+                    return  # no terminating chunk: the client sees the connection drop mid-body
+                delta = {"content": word if i == 0 else " " + word}
+                self._event({**chunk, "choices": [{"index": 0, "delta": delta, "finish_reason": None}]})
+                time.sleep(token_delay)
+            self._event({**chunk, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]})
+            if usage is not None:
+                self._event({**chunk, "choices": [], "usage": usage})
+            self._write_chunk(b"data: [DONE]\n\n")
+            self._write_chunk(b"")
+
+        def _event(self, payload: dict):
+            self._write_chunk(b"data: " + json.dumps(payload).encode("utf-8") + b"\n\n")
+
+        def _write_chunk(self, data: bytes):
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+            self.wfile.flush()
+
+    return Handler
+
+
+def serve(port: int = 0, latency: float = 0.0, token_delay: float = 0.0,
+          faults: Optional[Faults] = None) -> Tuple[ThreadingHTTPServer, str]:
+    """Start the stub in a daemon thread; returns (server, base_url for OPENAI_BASE_URL)."""
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(latency, token_delay, faults))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--port", type=int, default=8799)
+    ap.add_argument("--latency", type=float, default=0.2, help="seconds before the first byte")
+    ap.add_argument("--token-delay", type=float, default=0.01, help="seconds between streamed words")
+    ap.add_argument("--fail-rate", type=float, default=0.0, help="fraction of requests answered 429/503")
+    ap.add_argument("--fail-first", type=int, default=0, help="fail this many requests before anything else")
+    ap.add_argument("--drop-after", type=int, help="cut streamed replies after this many words")
+    args = ap.parse_args()
+    faults = Faults(args.fail_rate, args.fail_first, drop_after=args.drop_after)
+    server, base_url = serve(args.port, args.latency, args.token_delay, faults)
+    print(f"stub chat API on {base_url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
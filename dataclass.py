@@ -1,29 +1,77 @@
-from typing import List, Optional
-from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from dataclasses import dataclass, field
 
-@dataclass
+@dataclass(slots=True)
 class ScrapeResult:
     url: str
-    html: str
+    html: Optional[str]  # None when the scraper runs with keep_html=False
     text: str
     title: Optional[str] = None
+    cache_status: str = "miss"  # "miss" (no validators) | "revalidated" (304, stored body) | "network" (changed, re-downloaded)
+    links: List[str] = field(default_factory=list)  # absolute <a href> targets; only when parsed with links=True
 
-@dataclass
+@dataclass(slots=True)
 class ProcessResult:
-    cleaned_text: str
-    chunks: List[str]
+    cleaned_text: str  # the document's buffer, shared, not copied
+    chunks: Sequence[str]  # the document's ChunkView; index it for the chunks you need
     highlights: List[str]
     top_chunk_indices: List[int]
-    method: str  # "tfidf" | "jaccard"
-   
+    method: str  # "tfidf" | "bm25" | "jaccard"
+    highlight_spans: List[Tuple[int, int]] = field(default_factory=list)  # offsets into cleaned_text
+
+@dataclass(slots=True)
+class IndexedDocument:
+    """Question-independent state of a page: cleaned text, chunk offsets and ranking index.
+
+    The cleaned text is the only copy of the page; chunks are (start, end) rows of
+    `spans`, a (n_chunks, 2) int32 array, and `chunks` slices them on access.
+    """
+    url: str
+    title: Optional[str]
+    cleaned_text: str
+    spans: Any  # (n_chunks, 2) int32 np.ndarray; lists of (start, end) are converted
+    index: Optional[Any] = None  # DocumentIndex | BM25Index, or None -> jaccard
+    sentences: Optional[Any] = None  # SentenceIndex for highlighting
+    streamed: bool = False  # too long to index: ranked in one streaming pass per question batch
+    # Crawled site: (start offset in cleaned_text, url, title) per page, in text order.
+    sources: Optional[List[Tuple[int, str, Optional[str]]]] = None
+    # MinHash rows of the indexed chunks (utils.near_dup), kept so a re-index only hashes new chunks.
+    signatures: Optional[Any] = None
+    chunks: Sequence[str] = field(init=False, repr=False)
 
-    
+    def __post_init__(self):
+        from utils.text_utils import ChunkView, span_array
+        self.spans = span_array(self.spans)
+        self.chunks = ChunkView(self.cleaned_text, self.spans)
+
+    def source_of(self, chunk: int) -> Optional[str]:
+        """URL of the page chunk `chunk` came from (None for a single-page document)."""
+        if not self.sources:
+            return None
+        from bisect import bisect_right
+        i = bisect_right([start for start, _, _ in self.sources], int(self.spans[chunk, 0])) - 1
+        return self.sources[max(i, 0)][1]
 
 @dataclass
 class QnAResult:
     answer: str
     reasoning: Optional[str]
     provider: str 
+    cached: bool = False  # served from the LLM response cache
+
+@dataclass
+class BatchStats:
+    """How `answer_many` sent its questions, and what one call per question would have cost."""
+    mode: str  # "batched" | "parallel"
+    questions: int
+    llm_calls: int = 0  # requests actually sent (cache hits and fallbacks excluded)
+    prompt_tokens: int = 0  # estimated prompt tokens actually sent
+    separate_prompt_tokens: int = 0  # estimated prompt tokens for one call per question
+    elapsed_s: float = 0.0
+    slowest_call_s: float = 0.0  # longest LLM request sent, retries and rate-limiter wait included
+    # One call per question, `llm_workers` at a time: measured in parallel mode, else estimated
+    # as slowest_call_s * ceil(questions / llm_workers) (high: a batched reply is the longer one).
+    separate_elapsed_s: float = 0.0
 
 @dataclass
 class OrchestratorResult:
@@ -34,3 +82,50 @@ class OrchestratorResult:
     provider: str
     top_chunk_indices: List[int]
     total_chunks: int
+    highlight_spans: List[Tuple[int, int]] = field(default_factory=list)
+    batch: Optional[BatchStats] = None  # set by answer_many; the same object on every result of a call
+    metrics: Optional[Dict[str, Any]] = None  # utils.metrics Trace.to_dict(): stage seconds, counters, attributes
+    sources: List[str] = field(default_factory=list)  # page URL per top chunk when the document is a crawled site
+    reasoning: Optional[str] = None  # QnAResult.reasoning, e.g. that a streamed answer was cut off
+
+@dataclass
+class PageOutcome:
+    url: str
+    title: Optional[str] = None
+    total_chunks: int = 0
+    error: Optional[str] = None
+
+@dataclass
+class MultiOrchestratorResult:
+    question: str
+    answer: str
+    provider: str
+    pages: List[PageOutcome]
+    top_chunks: List[Tuple[str, int]]  # (url, chunk index) in rank order
+    highlights: List[str]
+    metrics: Optional[Dict[str, Any]] = None
+
+@dataclass
+class CrawlEvent:
+    """One finished URL of a crawl, reported to the progress callback as it happens."""
+    url: str
+    depth: int
+    status: str  # "fetched" | "skipped" (not HTML) | "blocked" (robots.txt) | "error"
+    detail: Optional[str] = None  # error message or skipped reason
+    fetched: int = 0  # pages fetched so far
+    queued: int = 0  # discovered URLs still waiting
+    budget: int = 0  # max_pages
+
+@dataclass(slots=True)
+class CrawledPage:
+    url: str
+    title: Optional[str]
+    text: str
+    depth: int
+
+@dataclass
+class CrawlResult:
+    seed: str
+    pages: List[CrawledPage]
+    counts: Dict[str, int]  # CrawlEvent.status -> number of URLs
+    elapsed_s: float = 0.0
@@ -1,66 +1,557 @@
+import os
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 from dataclasses import dataclass
-from typing import Dict,Optional, List,Any
-from agents.web_scrapper import WebScraperAgent
+from typing import Callable, Dict, Optional, List, Any, Tuple
+from agents.web_scrapper import WebScraperAgent, parse_html
+from agents.site_crawler import SiteCrawler
 from agents.contentProcessor import ContentProcessorAgent
-from agents.qna_agent import QnAAgent
-from dataclass import OrchestratorResult
+from agents.qna_agent import AnswerStream, QnAAgent
+from dataclass import BatchStats, CrawlEvent, IndexedDocument, MultiOrchestratorResult, OrchestratorResult, PageOutcome
+from utils import metrics
+from utils.doc_store import DocumentStore
+from utils.llm_cache import MemoryResponseCache, ResponseCache
+from utils.single_flight import SingleFlight
+from utils.text_utils import extract_snippets
+from utils.token_utils import count_tokens, section_spans
+
+# BeautifulSoup parsing and index fitting are CPU-bound and hold the GIL, so multi-URL
+# runs hand them to a process pool shared by every agent with the same `cpu_workers`
+# (created on first use).
+_CPU_POOLS: Dict[int, ProcessPoolExecutor] = {}
+_CPU_POOL_LOCK = threading.Lock()
+
+def _cpu_pool(workers: int) -> Optional[ProcessPoolExecutor]:
+    if workers <= 0:
+        return None
+    with _CPU_POOL_LOCK:
+        pool = _CPU_POOLS.get(workers)
+        if pool is None:
+            pool = _CPU_POOLS[workers] = ProcessPoolExecutor(max_workers=workers)
+        return pool
+
+SUMMARY_MODES = ("top_k", "map_reduce")
+
+# Concurrent loads of the same page with the same settings (e.g. several sessions
+# submitting one URL) fetch and index it once; the others wait for that document.
+_IN_FLIGHT = SingleFlight("inflight_load")
+
+def _parse_and_prepare(processor: ContentProcessorAgent, html: str, url: str, cache_status: str,
+                       previous: Optional[IndexedDocument] = None) -> IndexedDocument:
+    sres = parse_html(html, url, cache_status, keep_html=False)
+    if previous is not None:
+        return processor.update(previous, sres.text, url=sres.url, title=sres.title)
+    return processor.prepare(sres.text, url=sres.url, title=sres.title)
+
+def warm_up(ranker: str = "tfidf", store: Optional[DocumentStore] = None, recent: int = 8) -> Dict[str, float]:
+    """Pay the deferred import/initialisation costs up front; returns seconds per step.
+
+    Heavy dependencies (numpy, scikit-learn, lxml/bs4, tiktoken, openai, pydantic) are
+    imported on first use so `import orchestrator` stays fast. Call this off the request
+    path (see `start_warm_up`) so the first real question doesn't pay for them.
+    """
+    from agents.contentProcessor import _document_index_cls
+    from agents.qna_agent import LLMUnavailableError, _batch_schema
+    from agents.web_scrapper import _lxml
+    from utils.token_utils import get_encoder
+
+    def parser():
+        if _lxml() is None:
+            import bs4  # noqa: F401
+
+    def indexer():
+        # A throwaway document exercises the same imports and code paths as a real page.
+        ContentProcessorAgent(ranker=ranker).prepare("Warm up the index. It has two sentences.", url="warmup://")
+        if ranker == "tfidf":
+            _document_index_cls()
+
+    def llm():
+        try:
+            QnAAgent()._openai_client()
+        except LLMUnavailableError:
+            pass
+        _batch_schema()
+
+    def stored():
+        for key in store.recent_keys(recent):
+            store.get(key)
+
+    steps = {"parser": parser, "index": indexer, "tokenizer": get_encoder, "llm": llm}
+    if store is not None and recent > 0:
+        steps["store"] = stored
+    timings: Dict[str, float] = {}
+    for name, step in steps.items():
+        t0 = time.perf_counter()
+        try:
+            step()
+        except Exception:
+            pass  # warm-up is best effort; the real call will surface the error
+        timings[name] = round(time.perf_counter() - t0, 4)
+    return timings
+
+
+def start_warm_up(**kwargs) -> threading.Thread:
+    """Run `warm_up` on a daemon thread and return it."""
+    thread = threading.Thread(target=warm_up, kwargs=kwargs, name="webqa-warm-up", daemon=True)
+    thread.start()
+    return thread
+
 
 class OrchestratorAgent:
-    def __init__(self, *, top_k: int = 3, max_chars: int = 1200, overlap: int = 150, model: Optional[str] = None):
-        self.scraper = WebScraperAgent()
-        self.processor = ContentProcessorAgent(top_k=top_k, max_chars=max_chars, overlap=overlap)
-        self.qna = QnAAgent(model=model)
+    def __init__(self, *, top_k: int = 3, max_chars: int = 1200, overlap: int = 150, model: Optional[str] = None,
+                 ranker: str = "tfidf", chunking: str = "chars", max_tokens: int = 256, overlap_tokens: int = 32,
+                 store: Optional[DocumentStore] = None, llm_cache: Optional[ResponseCache] = None,
+                 fetch_workers: int = 8, cpu_workers: int = min(4, os.cpu_count() or 1), llm_workers: int = 4,
+                 batch_token_budget: int = 6000, instrument: Optional[bool] = None,
+                 crawl_depth: int = 0, crawl_max_pages: int = 20, crawl_delay: float = 0.25,
+                 coalesce_timeout: float = 300.0, offload_cpu: bool = False, summary_mode: str = "top_k",
+                 summary_section_tokens: int = 1500, summary_reduce_tokens: int = 6000, summary_max_sections: int = 48):
+        self.scraper = WebScraperAgent(keep_html=False)
+        self.processor = ContentProcessorAgent(top_k=top_k, max_chars=max_chars, overlap=overlap, ranker=ranker,
+                                               chunking=chunking, max_tokens=max_tokens, overlap_tokens=overlap_tokens)
+        self.qna = QnAAgent(model=model, cache=llm_cache)
+        self.store = store
+        self.fetch_workers = fetch_workers
+        self.cpu_workers = cpu_workers
+        self.llm_workers = llm_workers
+        self.batch_token_budget = batch_token_budget
+        # Per-call stage timings/counters (utils.metrics); off -> no trace is opened at all.
+        self.instrument = metrics.enabled_by_default() if instrument is None else instrument
+        # crawl_depth > 0 turns every URL into the seed of a same-site crawl, answered from one index.
+        self.crawl_depth = crawl_depth
+        self.crawler = SiteCrawler(self.scraper, max_depth=crawl_depth, max_pages=crawl_max_pages,
+                                   workers=fetch_workers, host_delay=crawl_delay)
+        # How long a load waits on an identical one already in flight before giving up (TimeoutError).
+        self.coalesce_timeout = coalesce_timeout
+        # Parse and index single-page loads in the CPU process pool too (as `load_many` does),
+        # so many concurrent requests in one process are not serialised on the GIL.
+        self.offload_cpu = offload_cpu
+        # summarize(): "top_k" summarises only the chunks ranked against the instruction, in one
+        # call; "map_reduce" summarises every section of the page and combines the partial
+        # summaries, at one LLM call per section plus the combining ones.
+        self.summary_mode = summary_mode
+        self.summary_section_tokens = summary_section_tokens
+        self.summary_reduce_tokens = summary_reduce_tokens
+        self.summary_max_sections = summary_max_sections
+        # Partial summaries are keyed by section text, so a page that changed only re-summarises
+        # the edited sections; without an LLM cache they are still kept for this process.
+        self.summary_cache = llm_cache if llm_cache is not None else MemoryResponseCache(max_entries=4096)
 
-    def run(self, url: str, question: str) -> OrchestratorResult:
-        sres = self.scraper.fetch(url)
-        pres = self.processor.process(sres.text, question)
-        context = [pres.chunks[i] for i in pres.top_chunk_indices]
+    def _store_key(self, url: str) -> str:
+        if self.crawl_depth > 0:
+            return DocumentStore.make_key(url, crawl_depth=self.crawl_depth, crawl_max_pages=self.crawler.max_pages,
+                                          **self.processor.chunk_params())
+        return DocumentStore.make_key(url, **self.processor.chunk_params())
+
+    def stored(self, url: str) -> Optional[IndexedDocument]:
+        """The fresh stored document for `url` and these settings, or None."""
+        if self.store is None:
+            return None
+        doc = self.store.get(self._store_key(url))
+        metrics.current().cache("docstore", doc is not None)
+        return doc
+
+    def _previous(self, url: str) -> Optional[IndexedDocument]:
+        """The expired stored copy of `url`, if any: re-indexing the new version reuses its unchanged chunks."""
+        if self.store is None:
+            return None
+        doc = self.store.get_stale(self._store_key(url))
+        metrics.current().cache("stale", doc is not None)
+        return doc
+
+    def remember(self, url: str, doc: IndexedDocument) -> None:
+        """Store `doc` as the document for `url` and these settings (no-op without a store)."""
+        if self.store is not None:
+            self.store.put(self._store_key(url), doc)
+
+    def load(self, url: str, on_progress: Optional[Callable[[CrawlEvent], None]] = None) -> IndexedDocument:
+        """Fetch, clean, chunk and index `url` — or reuse the stored copy for these chunking params.
+
+        A load of the same page and params already running in this process is joined
+        rather than repeated. In crawl mode (`crawl_depth` > 0) this is `load_site`;
+        `on_progress` is only used there.
+        """
+        if self.crawl_depth > 0:
+            return self.load_site(url, on_progress)
+        doc = self.stored(url)
+        if doc is not None:
+            return doc
+        return self._coalesced(url, lambda: self._fetch_and_prepare(url))
+
+    def _coalesced(self, url: str, build: Callable[[], IndexedDocument]) -> IndexedDocument:
+        doc, _ = _IN_FLIGHT.do(self._store_key(url), build, timeout=self.coalesce_timeout)
+        return doc
+
+    def _fetch_and_prepare(self, url: str) -> IndexedDocument:
+        tr = metrics.current()
+        with tr.stage("fetch"):
+            html, cache_status = self.scraper.download(url)
+        if self.offload_cpu and self.cpu_workers > 0:
+            with tr.stage("prepare"):  # parse, clean, chunk and index in a worker process
+                doc = self.submit_prepare(html, url, cache_status).result()
+            self.remember(url, doc)
+            return doc
+        with tr.stage("parse"):
+            sres = parse_html(html, url, cache_status, keep_html=False)
+            del html  # the markup can be several times the text; nothing below needs it
+        previous = self._previous(url)
+        if previous is not None:
+            doc = self.processor.update(previous, sres.text, url=sres.url, title=sres.title)
+        else:
+            doc = self.processor.prepare(sres.text, url=sres.url, title=sres.title)
+        self.remember(url, doc)
+        return doc
+
+    def load_site(self, url: str, on_progress: Optional[Callable[[CrawlEvent], None]] = None) -> IndexedDocument:
+        """Crawl the site from `url` and index every fetched page into one document.
+
+        Chunks keep their page (`IndexedDocument.source_of`), and answers cite it. The
+        whole site is stored under the seed URL and crawl settings. A caller that joins a
+        crawl already in flight gets no `on_progress` events, only the finished document.
+        """
+        doc = self.stored(url)
+        if doc is not None:
+            return doc
+        return self._coalesced(url, lambda: self._crawl_and_prepare(url, on_progress))
+
+    def _crawl_and_prepare(self, url: str, on_progress: Optional[Callable[[CrawlEvent], None]]) -> IndexedDocument:
+        tr = metrics.current()
+        with tr.stage("fetch"):  # concurrent fetches and their parses, as one wall-clock stage
+            crawl = self.crawler.crawl(url, on_progress)
+        if not crawl.pages:
+            raise RuntimeError(f"Crawl of {url} fetched no pages: {crawl.counts}")
+        doc = self.processor.prepare_site(crawl.pages, url=crawl.seed, title=crawl.pages[0].title)
+        self.remember(url, doc)
+        return doc
+
+    @staticmethod
+    def _context(doc: IndexedDocument, indices: List[int]) -> List[str]:
+        """Chunks handed to the LLM; on a crawled site each one names its page."""
+        if not doc.sources:
+            return [doc.chunks[i] for i in indices]
+        return [f"(Source: {doc.source_of(i)}) {doc.chunks[i]}" for i in indices]
+
+    @staticmethod
+    def _sources(doc: IndexedDocument, indices: List[int]) -> List[str]:
+        return [doc.source_of(i) for i in indices] if doc.sources else []
+
+    def submit_prepare(self, html: str, url: str, cache_status: str) -> Future:
+        """Parse and index fetched `html` in the CPU pool, updating the expired stored copy if there is one."""
+        return self._submit_cpu(html, url, cache_status, self._previous(url))
+
+    def _submit_cpu(self, html: str, url: str, cache_status: str,
+                    previous: Optional[IndexedDocument] = None) -> Future:
+        pool = _cpu_pool(self.cpu_workers)
+        if pool is not None:
+            try:
+                return pool.submit(_parse_and_prepare, self.processor, html, url, cache_status, previous)
+            except RuntimeError:
+                pass  # pool broken or shut down -> parse in this process
+        fut: Future = Future()
+        try:
+            fut.set_result(_parse_and_prepare(self.processor, html, url, cache_status, previous))
+        except Exception as e:
+            fut.set_exception(e)
+        return fut
+
+    def load_many(self, urls: List[str]) -> Dict[str, Any]:
+        """Load several URLs at once: concurrent fetches feed parse/index jobs in the CPU pool.
+
+        Returns {url: IndexedDocument | Exception}; one failing page never sinks the batch.
+        """
+        out: Dict[str, Any] = {}
+        pending = []
+        for url in dict.fromkeys(urls):
+            doc = self.stored(url)
+            if doc is not None:
+                out[url] = doc
+            else:
+                pending.append(url)
+        if not pending:
+            return out
+
+        parses: Dict[Future, str] = {}
+        with ThreadPoolExecutor(max_workers=max(1, min(self.fetch_workers, len(pending)))) as fetch_pool:
+            fetches = {fetch_pool.submit(self.scraper.download, url): url for url in pending}
+            for fut in as_completed(fetches):
+                url = fetches[fut]
+                try:
+                    html, cache_status = fut.result()
+                except Exception as e:
+                    out[url] = e
+                    continue
+                parses[self.submit_prepare(html, url, cache_status)] = url
+        for fut in as_completed(parses):
+            url = parses[fut]
+            try:
+                doc = fut.result()
+            except Exception as e:
+                out[url] = e
+                continue
+            self.remember(url, doc)
+            out[url] = doc
+        return out
+
+    def run_many(self, urls: List[str], question: str) -> MultiOrchestratorResult:
+        """Answer one question across several pages with a single LLM call over the merged top-k."""
+        with metrics.trace("run_many", self.instrument) as tr:
+            result = self._run_many(urls, question)
+        result.metrics = tr.to_dict() if tr.enabled else None
+        return result
+
+    def _run_many(self, urls: List[str], question: str) -> MultiOrchestratorResult:
+        tr = metrics.current()
+        with tr.stage("load"):  # fetch/parse/index run in pools, so only their total is timed
+            loaded = self.load_many(urls)
+        pages: List[PageOutcome] = []
+        chunks: List[str] = []
+        refs = []
+        for url in dict.fromkeys(urls):
+            doc = loaded[url]
+            if isinstance(doc, Exception):
+                pages.append(PageOutcome(url=url, error=f"{type(doc).__name__}: {doc}"))
+                continue
+            pages.append(PageOutcome(url=url, title=doc.title, total_chunks=len(doc.chunks)))
+            if doc.streamed:
+                # Too long to merge whole: only its own top-k competes with the other pages.
+                with tr.stage("rank"):
+                    keep = self.processor.rank(doc, question).top_chunk_indices
+            else:
+                keep = range(len(doc.chunks))
+            chunks.extend(doc.chunks[i] for i in keep)
+            refs.extend((url, i) for i in keep)
+        # Pages of one site repeat their navigation and footers; keep one copy of each.
+        unique = self.processor.unique(chunks)
+        chunks = [chunks[i] for i in unique]
+        refs = [refs[i] for i in unique]
+
+        with tr.stage("rank"):
+            order, _ = self.processor.rank_chunks(chunks, question)
+        top = order[: self.processor.top_k]
+        context = [f"(Source: {refs[i][0]}) {chunks[i]}" for i in top]
         qres = self.qna.answer(question, context)
+        with tr.stage("snippets"):
+            highlights = extract_snippets(" ".join(chunks[i] for i in top), question, k=self.processor.top_k)
+        return MultiOrchestratorResult(
+            question=question,
+            answer=qres.answer,
+            provider=qres.provider,
+            pages=pages,
+            top_chunks=[refs[i] for i in top],
+            highlights=highlights,
+        )
+
+    def run(self, url: str, question: str) -> OrchestratorResult:
+        with metrics.trace("run", self.instrument) as tr:
+            doc = self.load(url)
+            pres = self.processor.rank(doc, question)
+            context = self._context(doc, pres.top_chunk_indices)
+            qres = self.qna.answer(question, context)
         return OrchestratorResult(
-            url=sres.url,
-            title=sres.title,
+            url=doc.url,
+            title=doc.title,
             highlights=pres.highlights,
             answer=qres.answer,
             provider=qres.provider,
             top_chunk_indices=pres.top_chunk_indices,
             total_chunks=len(pres.chunks),
+            highlight_spans=pres.highlight_spans,
+            metrics=tr.to_dict() if tr.enabled else None,
+            sources=self._sources(doc, pres.top_chunk_indices),
+            reasoning=qres.reasoning,
         )
 
-    # NEW: summarize current page using top chunks as context
-    def summarize(self, url: str, style: str = "bullet-5") -> Dict[str, Any]:
-        prompt = "Summarize the page in 5 concise bullet points." if style == "bullet-5" else "Summarize this page briefly."
-        sres = self.scraper.fetch(url)
-        pres = self.processor.process(sres.text, prompt)
-        context = [pres.chunks[i] for i in pres.top_chunk_indices]
-        qres = self.qna.answer(prompt, context)
+    def run_stream(self, url: str, question: str) -> AnswerStream:
+        """Like `run`, but the answer streams; iterate for deltas, then read `.result`."""
+        tr = metrics.Trace("run_stream") if self.instrument else metrics.NULL_TRACE
+        with metrics.use(tr):
+            doc = self.load(url)
+            pres = self.processor.rank(doc, question)
+        context = self._context(doc, pres.top_chunk_indices)
+
+        def stream():
+            # The LLM stage runs while the caller iterates, so the trace is re-entered here.
+            with metrics.use(tr):
+                qres = yield from self.qna._stream(question, context)
+            if tr.enabled:
+                tr.finish()
+                metrics.REGISTRY.observe(tr)
+            return qres
+
+        return AnswerStream(stream(), then=lambda qres: OrchestratorResult(
+            url=doc.url,
+            title=doc.title,
+            highlights=pres.highlights,
+            answer=qres.answer,
+            provider=qres.provider,
+            top_chunk_indices=pres.top_chunk_indices,
+            total_chunks=len(pres.chunks),
+            highlight_spans=pres.highlight_spans,
+            metrics=tr.to_dict() if tr.enabled else None,
+            sources=self._sources(doc, pres.top_chunk_indices),
+            reasoning=qres.reasoning,
+        ))
+
+    def summarize(self, url: str, style: str = "bullet-5", mode: Optional[str] = None) -> Dict[str, Any]:
+        """Summary of the page in `style` ("bullet-5" | "short-paragraph").
+
+        `mode` (default `summary_mode`): "map_reduce" splits the whole page into sections
+        of about a third of `summary_section_tokens`, summarises them concurrently (under
+        the shared LLM rate limit) and combines the partial summaries; "top_k" summarises
+        the `top_k` chunks that rank best against the instruction, in one call.
+        """
+        mode = mode or self.summary_mode
+        if mode not in SUMMARY_MODES:
+            raise ValueError(f"summary mode must be one of {SUMMARY_MODES}, got {mode!r}")
+        with metrics.trace("summarize", self.instrument) as tr:
+            doc = self.load(url)
+            if mode == "map_reduce":
+                qres, sections = self._map_reduce(doc, style)
+                indices, highlights, spans = [], [r["summary"] for r in sections], []
+                sources = list(dict.fromkeys(r["source"] for r in sections if r["source"]))
+            else:
+                prompt = ("Summarize the page in 5 concise bullet points." if style == "bullet-5"
+                          else "Summarize this page briefly.")
+                pres = self.processor.rank(doc, prompt)
+                qres = self.qna.answer(prompt, self._context(doc, pres.top_chunk_indices))
+                sections, indices = [], pres.top_chunk_indices
+                highlights, spans = pres.highlights, pres.highlight_spans
+                sources = self._sources(doc, indices)
         return {
-            "url": sres.url,
-            "title": sres.title,
+            "url": doc.url,
+            "title": doc.title,
             "summary": qres.answer,
             "provider": qres.provider,
-            "top_chunk_indices": pres.top_chunk_indices,
-            "highlights": pres.highlights,
-            "total_chunks": len(pres.chunks),
+            "mode": mode,
+            "top_chunk_indices": indices,
+            "highlights": highlights,
+            "highlight_spans": spans,
+            "total_chunks": len(doc.chunks),
+            "sections": sections,
+            "metrics": tr.to_dict() if tr.enabled else None,
+            "sources": sources,
         }
 
+    def _map_reduce(self, doc: IndexedDocument, style: str) -> Tuple[Any, List[Dict[str, Any]]]:
+        """(final QnAResult, one {start, end, source, summary, cached} per section)."""
+        tr = metrics.current()
+        text = doc.cleaned_text
+        # Very long pages get larger sections rather than more than about summary_max_sections calls.
+        budget = max(self.summary_section_tokens, 3 * (len(text) // 4) // max(1, self.summary_max_sections))
+        with tr.stage("sections"):
+            spans = section_spans(text, budget, boundaries=[start for start, _, _ in doc.sources or []])
+        partials = self._summarize_each([text[s:e] for s, e in spans])
+        tr.add("sections", len(spans))
+        tr.add("sections_reused", sum(r.cached for r in partials))
+        sections = [{"start": s, "end": e, "source": self._source_at(doc, s), "summary": r.answer, "cached": r.cached}
+                    for (s, e), r in zip(spans, partials)]
+
+        level = [r.answer for r in partials]
+        # More partial summaries than fit one prompt: merge neighbours first, as often as needed.
+        while len(level) > 1 and count_tokens("\n\n".join(level)) > self.summary_reduce_tokens:
+            level = [r.answer for r in self._summarize_each(["\n\n".join(g) for g in self._groups(level)])]
+        with tr.stage("reduce"):
+            return self.qna.reduce_summaries(level, style, doc.title, self.summary_cache), sections
+
+    def _summarize_each(self, texts: List[str]) -> list:
+        """`QnAAgent.summarize_section` for every text, `llm_workers` at a time."""
+        tr = metrics.current()
+
+        def one(text: str):
+            with metrics.use(tr):  # pool threads do not inherit the caller's context
+                return self.qna.summarize_section(text, self.summary_cache)
+
+        with tr.stage("map"), ThreadPoolExecutor(max_workers=max(1, min(self.llm_workers, len(texts)))) as pool:
+            return list(pool.map(one, texts))
+
+    def _groups(self, partials: List[str]) -> List[List[str]]:
+        """Consecutive partial summaries packed up to `summary_reduce_tokens`, at least two per group."""
+        groups: List[List[str]] = []
+        total = 0
+        for p, n in zip(partials, [count_tokens(p) for p in partials]):
+            if groups and (len(groups[-1]) < 2 or total + n <= self.summary_reduce_tokens):
+                groups[-1].append(p)
+                total += n
+            else:
+                groups.append([p])
+                total = n
+        return groups
+
+    @staticmethod
+    def _source_at(doc: IndexedDocument, offset: int) -> Optional[str]:
+        if not doc.sources:
+            return None
+        from bisect import bisect_right
+        return doc.sources[max(0, bisect_right([start for start, _, _ in doc.sources], offset) - 1)][1]
+
     # NEW: answer multiple questions against the same URL
     def answer_many(self, url: str, questions: List[str]) -> List[OrchestratorResult]:
-        results: List[OrchestratorResult] = []
-        # Process once using the first question (for ranking); reuse for others for speed.
-        first_q = questions[0] if questions else ""
-        sres = self.scraper.fetch(url)
-        pres = self.processor.process(sres.text, first_q or "extract key facts")
-        base_context = [pres.chunks[i] for i in pres.top_chunk_indices]
-        for q in questions:
-            # Optionally, you could re-rank per question. Here we use base_context for speed.
-            qres = self.qna.answer(q, base_context)
-            results.append(OrchestratorResult(
-                url=sres.url,
-                title=sres.title,
+        """Answer every question about one page, batched into one LLM call when it fits.
+
+        If the shared prompt plus expected answers stays within `batch_token_budget`, the
+        questions go out together (see `QnAAgent.answer_batch`); otherwise one call per
+        question runs in parallel. Every result carries the same BatchStats.
+        """
+        with metrics.trace("answer_many", self.instrument) as tr:
+            results = self.answer_questions(self.load(url), questions)
+        if tr.enabled:
+            snapshot = tr.to_dict()
+            for res in results:
+                res.metrics = snapshot
+        return results
+
+    def answer_questions(self, doc: IndexedDocument, questions: List[str]) -> List[OrchestratorResult]:
+        """`answer_many` for a document that is already loaded."""
+        # Every question gets its own ranking; the fitted index scores them all in one product.
+        ranked = self.processor.rank_many(doc, questions)
+        contexts = [self._context(doc, pres.top_chunk_indices) for pres in ranked]
+
+        started = time.perf_counter()
+        per_question = [self.qna.separate_prompt_tokens([q], [c]) for q, c in zip(questions, contexts)]
+        separate = sum(per_question)
+        batched = self.qna.batch_prompt_tokens(questions, contexts)
+        budget_needed = batched + self.qna.expected_completion_tokens * len(questions)
+        if len(questions) > 1 and budget_needed <= self.batch_token_budget:
+            stats = BatchStats(mode="batched", questions=len(questions), separate_prompt_tokens=separate)
+            answers = self.qna.answer_batch(questions, contexts, stats)
+        else:
+            stats = BatchStats(mode="parallel", questions=len(questions), separate_prompt_tokens=separate)
+            # LLM calls go out concurrently; the shared rate limiter still caps in-flight requests.
+            tr = metrics.current()
+
+            def answer_one(question: str, context: List[str]):
+                with metrics.use(tr):  # pool threads do not inherit the caller's context
+                    began = time.perf_counter()
+                    return self.qna.answer(question, context), time.perf_counter() - began
+
+            with ThreadPoolExecutor(max_workers=max(1, min(self.llm_workers, len(questions)))) as pool:
+                timed = list(pool.map(answer_one, questions, contexts))
+            answers, took = [a for a, _ in timed], [t for _, t in timed]
+            sent = [not a.cached and a.provider != "fallback" for a in answers]
+            stats.llm_calls = sum(sent)
+            stats.prompt_tokens = sum(t for t, s in zip(per_question, sent) if s)
+            stats.slowest_call_s = round(max((t for t, s in zip(took, sent) if s), default=0.0), 3)
+        stats.elapsed_s = round(time.perf_counter() - started, 3)
+        if stats.mode == "parallel":
+            stats.separate_elapsed_s = stats.elapsed_s
+        else:
+            rounds = -(-len(questions) // max(1, self.llm_workers))
+            stats.separate_elapsed_s = round(stats.slowest_call_s * rounds, 3)
+
+        return [
+            OrchestratorResult(
+                url=doc.url,
+                title=doc.title,
                 highlights=pres.highlights,
                 answer=qres.answer,
                 provider=qres.provider,
                 top_chunk_indices=pres.top_chunk_indices,
                 total_chunks=len(pres.chunks),
-            ))
-        return results
\ No newline at end of file
+                highlight_spans=pres.highlight_spans,
+                batch=stats,
+                sources=self._sources(doc, pres.top_chunk_indices),
+                reasoning=qres.reasoning,
+            )
+            for pres, qres in zip(ranked, answers)
+        ]
@@ -0,0 +1,382 @@
+"""Async HTTP API for programmatic clients, next to the Streamlit UI.
+
+Usage:
+    python service.py [--host 127.0.0.1] [--port 8000] [--workers 16] [--per-client 4] [--timeout 60]
+
+Endpoints (JSON in, JSON out):
+
+    POST /ask          {"url", "question"}             -> OrchestratorResult
+    POST /ask/stream   {"url", "question"}             -> text/event-stream: "delta" events, then "result"
+    POST /ask_many     {"url", "questions": [...]}     -> {"results": [OrchestratorResult, ...]}
+    POST /summarize    {"url", "style"?, "mode"?}      -> summary dict
+    GET  /healthz, GET /metrics (Prometheus text)
+
+Every POST body may also carry the sidebar settings (top_k, max_chars, overlap, ranker,
+chunking, crawl_depth, crawl_pages) and a "timeout" in seconds, capped by --timeout.
+The event loop only parses requests and writes responses: pipeline calls run on a
+thread pool, and page parsing and indexing in the orchestrator's process pool.
+
+Clients are told apart by the X-Client-Id header, else by address. A client with
+--per-client requests still running gets 429; a request past its deadline gets 504
+(work already running is not interrupted, but it keeps the client's slot until it
+ends and still fills the caches). Fetch failures are 502. Documents and LLM answers
+go through the same on-disk document store and response cache as the app
+(WEBQA_STORE_DIR, WEBQA_LLM_CACHE).
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from dataclasses import asdict
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
+from starlette.routing import Route
+
+from agents.contentProcessor import CHUNKERS, RANKERS
+from orchestrator import SUMMARY_MODES, OrchestratorAgent, start_warm_up
+from utils import metrics
+from utils.doc_store import DocumentStore
+from utils.llm_cache import ResponseCache, SQLiteResponseCache
+
+# Sidebar settings a request may override: name -> (min, max, default); same ranges as the app.
+_INT_SETTINGS = {
+    "top_k": (1, 10, 3),
+    "max_chars": (300, 4000, 1200),
+    "overlap": (0, 1000, 150),
+    "crawl_depth": (0, 4, 0),
+    "crawl_pages": (1, 100, 20),
+}
+MAX_QUESTIONS = 20
+
+
+class ServiceError(Exception):
+    def __init__(self, status: int, message: str, headers: Optional[Dict[str, str]] = None):
+        super().__init__(message)
+        self.status = status
+        self.headers = headers
+
+
+def _error(status: int, message: str, headers: Optional[Dict[str, str]] = None) -> JSONResponse:
+    return JSONResponse({"error": message, "status": status}, status_code=status, headers=headers)
+
+
+def _status_for(exc: BaseException) -> int:
+    """HTTP status for an exception raised by the pipeline."""
+    import requests
+    if isinstance(exc, TimeoutError):  # a coalesced load gave up waiting
+        return 504
+    if isinstance(exc, (requests.RequestException, RuntimeError)):  # fetch failed / crawl found nothing
+        return 502
+    if isinstance(exc, ValueError):  # unsupported content, bad URL
+        return 422
+    return 500
+
+
+def settings_from(body: Dict[str, Any]) -> Tuple[Any, ...]:
+    """Validated (top_k, max_chars, overlap, ranker, chunking, crawl_depth, crawl_pages) from a request body."""
+    values = {}
+    for name, (lo, hi, default) in _INT_SETTINGS.items():
+        v = body.get(name, default)
+        if isinstance(v, bool) or not isinstance(v, int) or not lo <= v <= hi:
+            raise ServiceError(400, f"{name} must be an integer from {lo} to {hi}")
+        values[name] = v
+    ranker, chunking = body.get("ranker", "tfidf"), body.get("chunking", "chars")
+    if ranker not in RANKERS:
+        raise ServiceError(400, f"ranker must be one of {list(RANKERS)}")
+    if chunking not in CHUNKERS:
+        raise ServiceError(400, f"chunking must be one of {list(CHUNKERS)}")
+    return (values["top_k"], values["max_chars"], values["overlap"], ranker, chunking,
+            values["crawl_depth"], values["crawl_pages"])
+
+
+def _text(body: Dict[str, Any], name: str) -> str:
+    v = body.get(name)
+    if not isinstance(v, str) or not v.strip():
+        raise ServiceError(400, f"{name!r} is required and must be a non-empty string")
+    return v.strip()
+
+
+class _Slot:
+    """One of a client's concurrent-request slots; released once, when its work has really ended."""
+
+    def __init__(self, limits: "ClientLimits", client: str):
+        self._limits = limits
+        self._client = client
+        self._held = True
+
+    def release(self) -> None:
+        if self._held:
+            self._held = False
+            self._limits._release(self._client)
+
+    def handover(self) -> "_Slot":
+        """Move the slot to a new owner that outlives this handler; releasing this one is then a no-op."""
+        self._held = False
+        return _Slot(self._limits, self._client)
+
+    def release_when_done(self, work: Future, loop: asyncio.AbstractEventLoop) -> None:
+        """Keep the slot until `work` (running on a pool thread) finishes."""
+        owner = self.handover()
+
+        def done(_) -> None:
+            try:
+                loop.call_soon_threadsafe(owner.release)
+            except RuntimeError:  # the server has stopped; there is no count left to keep
+                pass
+
+        work.add_done_callback(done)
+
+
+class ClientLimits:
+    """Per-client cap on requests in progress. Used on the event loop thread only."""
+
+    def __init__(self, per_client: int):
+        self.per_client = per_client
+        self._active: Dict[str, int] = {}
+
+    def acquire(self, client: str) -> _Slot:
+        if self._active.get(client, 0) >= self.per_client:
+            raise ServiceError(429, f"client {client!r} already has {self.per_client} requests in progress",
+                               headers={"Retry-After": "1"})
+        self._active[client] = self._active.get(client, 0) + 1
+        return _Slot(self, client)
+
+    def _release(self, client: str) -> None:
+        left = self._active.get(client, 0) - 1
+        if left > 0:
+            self._active[client] = left
+        else:
+            self._active.pop(client, None)
+
+    def active(self) -> Dict[str, int]:
+        return dict(self._active)
+
+
+class Service:
+    """Routes, per-client limits and deadlines around shared, warm `OrchestratorAgent`s."""
+
+    def __init__(self, *, workers: int = 16, per_client: int = 4, timeout: float = 60.0,
+                 cpu_workers: int = min(4, os.cpu_count() or 1), store: Optional[DocumentStore] = None,
+                 llm_cache: Optional[ResponseCache] = None, model: Optional[str] = None, warm_up: bool = True):
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="webqa-api")
+        self.limits = ClientLimits(per_client)
+        self.timeout = timeout
+        self.cpu_workers = cpu_workers
+        self.store = store
+        self.llm_cache = llm_cache
+        self.model = model
+        self.warm_up = warm_up
+        self._agents: Dict[Tuple[Any, ...], OrchestratorAgent] = {}
+        self._agents_lock = threading.Lock()
+
+    def agent(self, settings: Tuple[Any, ...]) -> OrchestratorAgent:
+        """One warm agent per settings combination, shared by every request (like the app's cache_resource)."""
+        with self._agents_lock:
+            orch = self._agents.get(settings)
+            if orch is None:
+                top_k, max_chars, overlap, ranker, chunking, crawl_depth, crawl_pages = settings
+                orch = self._agents[settings] = OrchestratorAgent(
+                    top_k=top_k, max_chars=max_chars, overlap=overlap, ranker=ranker, chunking=chunking,
+                    model=self.model, store=self.store, llm_cache=self.llm_cache, cpu_workers=self.cpu_workers,
+                    crawl_depth=crawl_depth, crawl_max_pages=crawl_pages, offload_cpu=True)
+            return orch
+
+    # ---------- request plumbing ----------
+    @staticmethod
+    def client_of(request: Request) -> str:
+        return request.headers.get("x-client-id") or (request.client.host if request.client else "unknown")
+
+    def deadline_for(self, body: Dict[str, Any]) -> float:
+        timeout = body.get("timeout", self.timeout)
+        if isinstance(timeout, bool) or not isinstance(timeout, (int, float)) or timeout <= 0:
+            raise ServiceError(400, "timeout must be a positive number of seconds")
+        return asyncio.get_running_loop().time() + min(float(timeout), self.timeout)
+
+    async def _body(self, request: Request) -> Dict[str, Any]:
+        try:
+            body = json.loads(await request.body() or b"{}")
+        except ValueError:
+            raise ServiceError(400, "request body must be JSON") from None
+        if not isinstance(body, dict):
+            raise ServiceError(400, "request body must be a JSON object")
+        return body
+
+    async def _offload(self, slot: _Slot, deadline: float, fn: Callable, *args) -> Any:
+        """Run `fn(*args)` on the pool; 504 at the deadline, keeping `slot` until the work ends."""
+        loop = asyncio.get_running_loop()
+        work = self.executor.submit(fn, *args)
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(work), max(0.0, deadline - loop.time()))
+        except asyncio.TimeoutError:
+            if not work.cancel():  # already running: it cannot be stopped, but it still counts
+                slot.release_when_done(work, loop)
+            raise ServiceError(504, "deadline exceeded") from None
+
+    async def _handle(self, request: Request, call: Callable[[Dict[str, Any], _Slot, float], Any]) -> Response:
+        slot = None
+        try:
+            body = await self._body(request)
+            deadline = self.deadline_for(body)
+            slot = self.limits.acquire(self.client_of(request))
+            return await call(body, slot, deadline)
+        except ServiceError as e:
+            return _error(e.status, str(e), e.headers)
+        except Exception as e:
+            return _error(_status_for(e), f"{type(e).__name__}: {e}")
+        finally:
+            if slot is not None:
+                slot.release()
+
+    # ---------- endpoints ----------
+    async def ask(self, request: Request) -> Response:
+        async def call(body, slot, deadline):
+            orch = self.agent(settings_from(body))
+            res = await self._offload(slot, deadline, orch.run, _text(body, "url"), _text(body, "question"))
+            return JSONResponse(asdict(res))
+        return await self._handle(request, call)
+
+    async def ask_many(self, request: Request) -> Response:
+        async def call(body, slot, deadline):
+            questions = body.get("questions")
+            if (not isinstance(questions, list) or not questions or len(questions) > MAX_QUESTIONS
+                    or not all(isinstance(q, str) and q.strip() for q in questions)):
+                raise ServiceError(400, f"'questions' must be a list of 1 to {MAX_QUESTIONS} non-empty strings")
+            orch = self.agent(settings_from(body))
+            results = await self._offload(slot, deadline, orch.answer_many, _text(body, "url"),
+                                          [q.strip() for q in questions])
+            return JSONResponse({"results": [asdict(r) for r in results]})
+        return await self._handle(request, call)
+
+    async def summarize(self, request: Request) -> Response:
+        async def call(body, slot, deadline):
+            style = body.get("style", "bullet-5")
+            if style not in ("bullet-5", "short-paragraph"):
+                raise ServiceError(400, "style must be 'bullet-5' or 'short-paragraph'")
+            mode = body.get("mode", "top_k")
+            if mode not in SUMMARY_MODES:
+                raise ServiceError(400, f"mode must be one of {list(SUMMARY_MODES)}")
+            orch = self.agent(settings_from(body))
+            return JSONResponse(await self._offload(slot, deadline, orch.summarize, _text(body, "url"), style, mode))
+        return await self._handle(request, call)
+
+    async def ask_stream(self, request: Request) -> Response:
+        """Server-sent events: "delta" ({"text"}) as the answer arrives, then "result" or "error".
+
+        Load and ranking errors are ordinary JSON error responses; once the stream has
+        started, failures and the deadline arrive as an "error" event.
+        """
+        async def call(body, slot, deadline):
+            orch = self.agent(settings_from(body))
+            stream = await self._offload(slot, deadline, orch.run_stream, _text(body, "url"), _text(body, "question"))
+            return StreamingResponse(self._events(stream, slot.handover(), deadline), media_type="text/event-stream",
+                                     headers={"Cache-Control": "no-cache"})
+        return await self._handle(request, call)
+
+    async def _events(self, stream, slot: _Slot, deadline: float) -> AsyncIterator[bytes]:
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+        stop = threading.Event()
+
+        def put(item) -> None:
+            loop.call_soon_threadsafe(queue.put_nowait, item)
+
+        def pump() -> None:  # pool thread: iterate the LLM stream, hand deltas to the loop
+            try:
+                for delta in stream:
+                    if stop.is_set():
+                        return
+                    put(("delta", {"text": delta}))
+                put(("result", asdict(stream.result)))
+            except Exception as e:
+                put(("error", {"error": f"{type(e).__name__}: {e}", "status": 502}))
+            finally:
+                put(None)
+
+        try:
+            work = self.executor.submit(pump)
+        except RuntimeError:  # shutting down
+            slot.release()
+            raise
+        slot.release_when_done(work, loop)
+        try:
+            while True:
+                try:
+                    item = await asyncio.wait_for(queue.get(), max(0.0, deadline - loop.time()))
+                except asyncio.TimeoutError:
+                    yield _sse("error", {"error": "deadline exceeded", "status": 504})
+                    return
+                if item is None:
+                    return
+                yield _sse(*item)
+        finally:
+            stop.set()  # client gone or deadline passed: the pump stops at the next delta
+
+    async def healthz(self, request: Request) -> Response:
+        return JSONResponse({"ok": True, "agents": len(self._agents), "active": self.limits.active()})
+
+    async def metrics(self, request: Request) -> Response:
+        return PlainTextResponse(metrics.REGISTRY.render_prometheus(), media_type="text/plain; version=0.0.4")
+
+    def app(self) -> Starlette:
+        @asynccontextmanager
+        async def lifespan(_app):
+            if self.warm_up:
+                start_warm_up(store=self.store)
+            yield
+            self.executor.shutdown(wait=False, cancel_futures=True)
+
+        return Starlette(routes=[
+            Route("/ask", self.ask, methods=["POST"]),
+            Route("/ask/stream", self.ask_stream, methods=["POST"]),
+            Route("/ask_many", self.ask_many, methods=["POST"]),
+            Route("/summarize", self.summarize, methods=["POST"]),
+            Route("/healthz", self.healthz, methods=["GET"]),
+            Route("/metrics", self.metrics, methods=["GET"]),
+        ], lifespan=lifespan)
+
+
+def _sse(event: str, data: Dict[str, Any]) -> bytes:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n".encode("utf-8")
+
+
+def create_app(**kwargs) -> Starlette:
+    """ASGI app over the app's on-disk document store and LLM cache; kwargs go to `Service`."""
+    if "store" not in kwargs:
+        kwargs["store"] = DocumentStore()
+    if "llm_cache" not in kwargs:
+        kwargs["llm_cache"] = SQLiteResponseCache()
+    return Service(**kwargs).app()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8000)
+    ap.add_argument("--workers", type=int, default=16, help="threads running pipeline calls")
+    ap.add_argument("--cpu-workers", type=int, default=min(4, os.cpu_count() or 1),
+                    help="processes parsing and indexing pages")
+    ap.add_argument("--per-client", type=int, default=4, help="concurrent requests per client")
+    ap.add_argument("--timeout", type=float, default=60.0, help="max seconds per request")
+    ap.add_argument("--model", default=None)
+    ap.add_argument("--no-store", action="store_true", help="do not read or write the document store")
+    ap.add_argument("--no-llm-cache", action="store_true", help="do not read or write the LLM response cache")
+    args = ap.parse_args(argv)
+
+    import uvicorn
+    app = create_app(workers=args.workers, cpu_workers=args.cpu_workers, per_client=args.per_client,
+                     timeout=args.timeout, model=args.model,
+                     store=None if args.no_store else DocumentStore(),
+                     llm_cache=None if args.no_llm_cache else SQLiteResponseCache())
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,46 @@
+"""Shared fixtures: a local stub LLM and a local page server (the ones the benchmarks use)."""
+import os
+import sys
+from typing import Callable, Dict, List, Tuple
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from benchmarks.bench_crawl import serve_site  # noqa: E402
+from benchmarks.stub_llm import Faults, serve  # noqa: E402
+
+
+@pytest.fixture
+def stub_llm(monkeypatch) -> Callable[..., Faults]:
+    """`stub_llm(latency=0.0, **fault_plan)` starts the stub LLM, points OPENAI_* at it and returns its Faults."""
+    servers = []
+
+    def start(latency: float = 0.0, token_delay: float = 0.0, **fault_plan) -> Faults:
+        faults = Faults(**fault_plan)
+        server, base = serve(latency=latency, token_delay=token_delay, faults=faults)
+        servers.append(server)
+        monkeypatch.setenv("OPENAI_BASE_URL", base)
+        monkeypatch.setenv("OPENAI_API_KEY", "stub")
+        return faults
+
+    yield start
+    for server in servers:
+        server.shutdown()
+
+
+@pytest.fixture
+def site() -> Callable[..., Tuple[str, List[str]]]:
+    """`site(pages, latency=0.0)` serves {path: (content type, body)}; returns (base URL, requested paths)."""
+    servers = []
+
+    def start(pages: Dict[str, Tuple[str, bytes]], latency: float = 0.0) -> Tuple[str, List[str]]:
+        server, base, requested = serve_site(pages, latency)
+        servers.append(server)
+        return base, requested
+
+    yield start
+    for server in servers:
+        server.shutdown()
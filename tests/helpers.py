@@ -0,0 +1,9 @@
+"""Fixture pages for the local page server."""
+from typing import Tuple
+
+
+def html_page(title: str, body: str, links: Tuple[str, ...] = ()) -> Tuple[str, bytes]:
+    """(content type, body) of a minimal HTML page, as `serve_site` takes them."""
+    anchors = "".join(f'<a href="{href}">{href}</a> ' for href in links)
+    html = f"<html><head><title>{title}</title></head><body><p>{body}</p>{anchors}</body></html>"
+    return "text/html; charset=utf-8", html.encode("utf-8")
@@ -0,0 +1,44 @@
+import json
+
+import batch_runner
+
+from tests.helpers import html_page
+
+
+def write_jsonl(path, rows):
+    path.write_text("".join(json.dumps(row) + "\n" for row in rows), encoding="utf-8")
+
+
+def read_jsonl(path):
+    return [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+
+
+def test_checkpoint_skips_answered_ids_only(tmp_path):
+    out = tmp_path / "answers.jsonl"
+    write_jsonl(out, [{"id": "1", "answer": "yes", "error": None},
+                      {"id": "2", "answer": None, "error": "ReadTimeout: timed out"}])
+    with open(out, "a", encoding="utf-8") as fh:
+        fh.write('{"id": "3", "ans')  # torn last line of a killed run
+    assert batch_runner.load_checkpoint(str(out)) == {"1"}
+    assert out.read_text(encoding="utf-8").endswith("\n")
+
+
+def test_resume_retries_errored_rows(tmp_path, stub_llm, site):
+    stub_llm()
+    base, requested = site({"/ok.html": html_page("Ok", "Sensors are recalibrated every six weeks."),
+                            "/flaky.html": html_page("Flaky", "Logs are kept in the maintenance book.")})
+    questions = tmp_path / "questions.jsonl"
+    write_jsonl(questions, [{"id": "1", "url": base + "/ok.html", "question": "How often are sensors recalibrated?"},
+                            {"id": "2", "url": base + "/flaky.html", "question": "Where are logs kept?"}])
+    out = tmp_path / "answers.jsonl"
+    write_jsonl(out, [{"id": "1", "url": base + "/ok.html", "answer": "Every six weeks.", "error": None},
+                      {"id": "2", "url": base + "/flaky.html", "answer": None, "error": "ReadTimeout: timed out"}])
+
+    code = batch_runner.main([str(questions), "-o", str(out), "--resume", "--no-store", "--no-llm-cache",
+                              "--cpu-workers", "1", "--host-delay", "0"])
+
+    assert code == 0
+    assert requested == ["/flaky.html"]  # the answered pair is not fetched again
+    rows = read_jsonl(out)
+    assert [row["id"] for row in rows] == ["1", "2", "2"]
+    assert rows[-1]["error"] is None and rows[-1]["answer"].startswith("Stub answer to: Where are logs kept?")
@@ -0,0 +1,79 @@
+import pytest
+
+from agents.site_crawler import SiteCrawler
+from benchmarks.bench_crawl import FACT, build_site
+from orchestrator import OrchestratorAgent
+
+UNBOUNDED = 1000  # more pages than the fixture site has
+
+
+@pytest.fixture
+def docs(site):
+    """(base URL, requested paths) of the fixture docs site (benchmarks.bench_crawl.build_site)."""
+    return site(build_site(12))
+
+
+def crawl(base, requested, **kwargs):
+    requested.clear()
+    kwargs = {"max_depth": 2, "max_pages": UNBOUNDED, "workers": 4, "host_delay": 0, **kwargs}
+    events = []
+    result = SiteCrawler(**kwargs).crawl(base + "/", events.append)
+    return result, list(requested), events
+
+
+def test_robots_txt_is_honoured(docs):
+    result, paths, _ = crawl(*docs)
+    assert "/robots.txt" in paths
+    assert not any(p.startswith("/private/") for p in paths)
+    assert result.counts.get("blocked") == 1
+
+
+def test_stays_on_site_and_skips_nofollow(docs):
+    _, paths, events = crawl(*docs)
+    assert events and all(e.url.startswith(docs[0] + "/") for e in events)  # never tried off-site.invalid
+    assert "/nofollow.html" not in paths
+
+
+def test_each_page_is_fetched_once(docs):
+    _, paths, _ = crawl(*docs)
+    pages = [p for p in paths if p != "/robots.txt"]
+    assert len(pages) == len(set(pages))  # fragment and duplicate links collapse
+
+
+def test_depth_limit(docs):
+    _, paths, _ = crawl(*docs, max_depth=2)
+    assert "/docs/deep/level-2.html" in paths and "/docs/deep/level-3.html" not in paths
+    _, paths, _ = crawl(*docs, max_depth=3)
+    assert "/docs/deep/level-3.html" in paths
+
+
+def test_page_budget(docs):
+    result, paths, _ = crawl(*docs, max_depth=3, max_pages=5)
+    assert len([p for p in paths if p != "/robots.txt"]) <= 5
+    assert len(result.pages) <= 5
+
+
+def test_non_html_is_skipped(docs):
+    result, paths, events = crawl(*docs)
+    assert "/files/manual.pdf" not in paths  # filtered by its extension, never requested
+    assert result.counts.get("skipped") == 1  # /download answers application/pdf
+    assert [e.url for e in events if e.status == "skipped"] == [docs[0] + "/download"]
+
+
+def test_progress_events_stream_every_url(docs):
+    result, _, events = crawl(*docs)
+    fetched = [e for e in events if e.status == "fetched"]
+    assert len(fetched) == len(result.pages)
+    assert [e.fetched for e in fetched] == list(range(1, len(fetched) + 1))
+    assert all(e.budget == UNBOUNDED for e in events)
+
+
+def test_crawl_mode_answers_from_a_deep_page(docs, stub_llm):
+    stub_llm()
+    base, _ = docs
+    orch = OrchestratorAgent(ranker="bm25", crawl_depth=3, crawl_max_pages=UNBOUNDED, crawl_delay=0,
+                             cpu_workers=0, instrument=False)
+    res = orch.run(base + "/", "What is the flux capacitor tolerance?")
+    assert base + "/docs/deep/level-3.html" in res.sources
+    doc = orch.load(base + "/")
+    assert FACT in doc.cleaned_text
@@ -0,0 +1,66 @@
+from agents.qna_agent import QnAAgent
+from orchestrator import OrchestratorAgent
+from utils import metrics
+from utils.rate_limit import LLMRateLimiter
+
+from tests.helpers import html_page
+
+QUESTION = "How often are the sensors recalibrated?"
+CONTEXT = ["Sensors in bay 4 are recalibrated every 6 weeks by the duty engineer."]
+
+
+def answer(agent):
+    with metrics.trace("ask") as tr:
+        res = agent.answer(QUESTION, CONTEXT)
+    return res, tr.to_dict()
+
+
+def test_transient_errors_are_retried(stub_llm):
+    faults = stub_llm(fail_first=2, fail_status=503)
+    res, trace = answer(QnAAgent(limiter=LLMRateLimiter()))
+    assert res.provider.startswith("openai:")
+    assert faults.requests == 3
+    assert trace["counters"]["llm_calls"] == 1  # one logical call, however many attempts
+
+
+def test_retry_waits_for_retry_after(stub_llm):
+    # The first backoff without the header is at most 0.5 s, so only honouring it waits 0.8 s.
+    faults = stub_llm(fail_first=1, fail_status=429, retry_after=0.8)
+    res, _ = answer(QnAAgent(limiter=LLMRateLimiter()))
+    assert res.provider.startswith("openai:")
+    assert faults.requests == 2
+    assert faults.arrivals[1] - faults.arrivals[0] >= 0.8
+
+
+def test_fallback_after_the_last_attempt(stub_llm):
+    faults = stub_llm(fail_first=10 ** 6, fail_status=429, retry_after=0.01)
+    agent = QnAAgent(limiter=LLMRateLimiter())
+    res, trace = answer(agent)
+    assert faults.requests == agent.max_attempts
+    assert res.provider == "fallback"
+    assert trace["attributes"]["fallback_reason"] == "llm_error"
+
+
+def test_answer_many_stays_under_the_concurrency_ceiling(stub_llm, site):
+    faults = stub_llm(latency=0.1)
+    body = " ".join(f"Sensors in bay {i} are recalibrated every {i + 3} weeks." for i in range(40))
+    base, _ = site({"/page.html": html_page("Maintenance", body)})
+    questions = [f"How often are the sensors in bay {i} recalibrated?" for i in range(8)]
+    orch = OrchestratorAgent(ranker="bm25", cpu_workers=0, instrument=False, llm_workers=len(questions),
+                             batch_token_budget=0)  # one call per question, sent concurrently
+    orch.qna.limiter = LLMRateLimiter(max_concurrency=2)
+    results = orch.answer_many(base + "/page.html", questions)
+    assert all(r.provider.startswith("openai:") for r in results)
+    assert faults.requests == len(questions)
+    assert faults.peak == 2
+
+
+def test_batched_dispatch_estimates_one_call_per_question(stub_llm, site):
+    stub_llm(latency=0.2)
+    base, _ = site({"/page.html": html_page("Maintenance", " ".join(CONTEXT * 20))})
+    questions = [f"How often are the sensors in bay {i} recalibrated?" for i in range(6)]
+    orch = OrchestratorAgent(ranker="bm25", cpu_workers=0, instrument=False, llm_workers=4)
+    stats = orch.answer_many(base + "/page.html", questions)[0].batch
+    assert stats.mode == "batched" and stats.llm_calls == 1
+    assert 0.2 <= stats.slowest_call_s <= stats.elapsed_s
+    assert stats.separate_elapsed_s == round(stats.slowest_call_s * 2, 3)  # 6 questions, 4 at a time
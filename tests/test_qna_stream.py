@@ -0,0 +1,69 @@
+from agents.qna_agent import QnAAgent
+from orchestrator import OrchestratorAgent
+from utils import metrics
+from utils.llm_cache import MemoryResponseCache
+from utils.rate_limit import LLMRateLimiter
+
+from tests.helpers import html_page
+
+QUESTION = "How often are the sensors recalibrated?"
+CONTEXT = ["Sensors in bay 4 are recalibrated every 6 weeks by the duty engineer."]
+
+
+def stream(agent):
+    """(deltas, result, trace counters) of one answer_stream call."""
+    with metrics.trace("stream") as tr:
+        answer = agent.answer_stream(QUESTION, CONTEXT)
+        deltas = list(answer)
+    return deltas, answer.result, tr.to_dict()["counters"]
+
+
+def test_stream_yields_deltas_and_records_usage(stub_llm):
+    faults = stub_llm()
+    deltas, res, counters = stream(QnAAgent(limiter=LLMRateLimiter()))
+    assert len(deltas) > 1
+    assert "".join(deltas) == res.answer == f"Stub answer to: {QUESTION}"
+    assert res.provider.startswith("openai:") and not res.cached
+    assert faults.requests == 1
+    assert counters["llm_calls"] == 1
+    assert counters["prompt_tokens"] > 0 and counters["completion_tokens"] == len(res.answer.split())
+
+
+def test_failure_before_first_token_streams_the_fallback(stub_llm):
+    stub_llm(fail_first=10 ** 6, fail_status=429, retry_after=0.01)
+    deltas, res, _ = stream(QnAAgent(limiter=LLMRateLimiter()))
+    assert res.provider == "fallback"
+    assert deltas == [res.answer]
+
+
+def test_cut_stream_keeps_partial_answer_and_is_not_cached(stub_llm):
+    faults = stub_llm(drop_after=3)
+    agent = QnAAgent(cache=MemoryResponseCache(), limiter=LLMRateLimiter())
+    deltas, res, _ = stream(agent)
+    assert deltas[-1] == "\n\n(stream interrupted)"
+    assert res.answer == "Stub answer to:"
+    assert res.reasoning.startswith("Stream interrupted")
+    _, again, _ = stream(agent)
+    assert not again.cached
+    assert faults.requests == 2
+
+
+def test_repeated_question_is_a_cache_hit(stub_llm):
+    faults = stub_llm()
+    agent = QnAAgent(cache=MemoryResponseCache(), limiter=LLMRateLimiter())
+    _, first, _ = stream(agent)
+    deltas, again, counters = stream(agent)
+    assert again.cached and again.answer == first.answer
+    assert deltas == [first.answer]
+    assert faults.requests == 1
+    assert counters.get("cache_llm_hits") == 1
+
+
+def test_run_stream_assembles_the_orchestrator_result(stub_llm, site):
+    stub_llm(drop_after=3)
+    base, _ = site({"/page.html": html_page("Maintenance", " ".join(CONTEXT * 20))})
+    orch = OrchestratorAgent(ranker="bm25", cpu_workers=0, instrument=False)
+    answer = orch.run_stream(base + "/page.html", QUESTION)
+    assert "".join(answer).endswith("(stream interrupted)")
+    assert answer.result.title == "Maintenance"
+    assert answer.result.reasoning.startswith("Stream interrupted")  # what keeps the app from caching it
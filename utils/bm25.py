@@ -0,0 +1,151 @@
+import re
+from array import array
+from collections import Counter
+from typing import Dict, List, Sequence
+
+import numpy as np
+
+_TOKEN = re.compile(r"(?u)\b\w\w+\b")
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN.findall((text or "").lower())
+
+
+def top_k_indices(scores: np.ndarray, k: int) -> List[int]:
+    """Indices of the k highest scores, best first, without sorting the whole array."""
+    n = len(scores)
+    if k <= 0 or n == 0:
+        return []
+    if k < n:
+        part = np.argpartition(-scores, k - 1)[:k]
+    else:
+        part = np.arange(n)
+    return part[np.argsort(-scores[part], kind="stable")].tolist()
+
+
+class BM25Index:
+    """Okapi BM25 over chunks, stored as compact NumPy arrays (no sklearn needed).
+
+    Postings are CSR by term: the documents containing term ``j`` are
+    ``doc_ids[term_ptr[j]:term_ptr[j + 1]]`` with matching ``tfs``.
+    """
+
+    method = "bm25"
+
+    def __init__(self, vocabulary: Dict[str, int], term_ptr: np.ndarray, doc_ids: np.ndarray, tfs: np.ndarray,
+                 doc_len: np.ndarray, k1: float = 1.5, b: float = 0.75):
+        self.vocabulary = vocabulary
+        self.term_ptr = term_ptr
+        self.doc_ids = doc_ids
+        self.tfs = tfs
+        self.doc_len = doc_len
+        self.k1 = k1
+        self.b = b
+        n_docs = len(doc_len)
+        df = np.diff(term_ptr).astype(np.float32)
+        self.idf = np.log1p((n_docs - df + 0.5) / (df + 0.5)).astype(np.float32)
+        avgdl = float(doc_len.mean()) if n_docs else 0.0
+        # Per-document length normalisation, precomputed once.
+        self._norm = (k1 * (1 - b + b * doc_len / (avgdl or 1.0))).astype(np.float32)
+
+    @classmethod
+    def fit(cls, chunks: List[str], k1: float = 1.5, b: float = 0.75) -> "BM25Index":
+        vocabulary: Dict[str, int] = {}
+        token_ids = array("i")
+        doc_len = np.zeros(len(chunks), dtype=np.int32)
+        for d, chunk in enumerate(chunks):
+            tokens = tokenize(chunk)
+            doc_len[d] = len(tokens)
+            token_ids.extend(vocabulary.setdefault(t, len(vocabulary)) for t in tokens)
+        n_docs = max(len(chunks), 1)
+        key_dtype = np.int32 if (len(vocabulary) + 1) * n_docs < 2**31 else np.int64
+        # One sort of (term, doc) keys yields term-major postings with their tfs.
+        keys = np.frombuffer(token_ids, dtype=np.int32).astype(key_dtype)
+        keys *= n_docs
+        keys += np.repeat(np.arange(len(chunks), dtype=key_dtype), doc_len)
+        keys, tfs = np.unique(keys, return_counts=True)
+        term_ptr = np.zeros(len(vocabulary) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(keys // n_docs, minlength=len(vocabulary)), out=term_ptr[1:])
+        return cls(vocabulary, term_ptr, (keys % n_docs).astype(np.int32), tfs.astype(np.float32), doc_len, k1=k1, b=b)
+
+    def updated(self, reuse: Sequence[int], chunks: Sequence[str]) -> "BM25Index":
+        """Index of `chunks`, a new version of the indexed chunk list.
+
+        `reuse[i]` is the row of an unchanged chunk in this index, or -1 for a chunk to
+        tokenize. Unchanged chunks keep their postings; only new chunks are tokenized,
+        and idf and average length are recomputed. Scores equal `fit(chunks)`.
+        """
+        reuse = np.asarray(reuse, dtype=np.int64)
+        n_docs = max(len(chunks), 1)
+        term_of = np.repeat(np.arange(len(self.term_ptr) - 1, dtype=np.int64), np.diff(self.term_ptr))
+        # Postings in doc-major order, so each reused chunk's postings are one slice.
+        order = np.argsort(self.doc_ids, kind="stable")
+        doc_ptr = np.zeros(len(self.doc_len) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(self.doc_ids, minlength=len(self.doc_len)), out=doc_ptr[1:])
+        dst = np.flatnonzero(reuse >= 0)
+        src = reuse[dst]
+        lens = doc_ptr[src + 1] - doc_ptr[src]
+        picked = order[np.repeat(doc_ptr[src] - np.cumsum(lens) + lens, lens) + np.arange(lens.sum())]
+
+        vocabulary = dict(self.vocabulary)
+        doc_len = np.zeros(len(chunks), dtype=np.int32)
+        doc_len[dst] = self.doc_len[src]
+        new_terms, new_docs, new_tfs = array("q"), array("q"), array("f")
+        for d in np.flatnonzero(reuse < 0).tolist():
+            tokens = tokenize(chunks[d])
+            doc_len[d] = len(tokens)
+            for term, tf in Counter(tokens).items():
+                new_terms.append(vocabulary.setdefault(term, len(vocabulary)))
+                new_docs.append(d)
+                new_tfs.append(tf)
+        terms = np.concatenate([term_of[picked], np.frombuffer(new_terms, dtype=np.int64)])
+        docs = np.concatenate([np.repeat(dst, lens), np.frombuffer(new_docs, dtype=np.int64)])
+        tfs = np.concatenate([self.tfs[picked], np.frombuffer(new_tfs, dtype=np.float32)])
+
+        # Terms no chunk uses any more are dropped, so the vocabulary tracks the page.
+        used, terms = np.unique(terms, return_inverse=True)
+        words = sorted(vocabulary, key=vocabulary.get)
+        vocabulary = {words[j]: i for i, j in enumerate(used.tolist())}
+        keys = terms.astype(np.int64) * n_docs + docs
+        order = np.argsort(keys, kind="stable")
+        term_ptr = np.zeros(len(used) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(terms, minlength=len(used)), out=term_ptr[1:])
+        return BM25Index(vocabulary, term_ptr, docs[order].astype(np.int32), tfs[order].astype(np.float32),
+                         doc_len, k1=self.k1, b=self.b)
+
+    def score(self, question: str) -> np.ndarray:
+        scores = np.zeros(len(self.doc_len), dtype=np.float32)
+        for term in set(tokenize(question)):
+            j = self.vocabulary.get(term)
+            if j is None:
+                continue
+            lo, hi = self.term_ptr[j], self.term_ptr[j + 1]
+            docs, tf = self.doc_ids[lo:hi], self.tfs[lo:hi]
+            scores[docs] += self.idf[j] * tf * (self.k1 + 1) / (tf + self._norm[docs])
+        return scores
+
+    def score_many(self, questions: List[str]) -> np.ndarray:
+        """(n_chunks, n_questions), same layout as DocumentIndex.score_many."""
+        out = np.zeros((len(self.doc_len), len(questions)), dtype=np.float32)
+        for q, question in enumerate(questions):
+            out[:, q] = self.score(question)
+        return out
+
+    # ---------- persistence ----------
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        terms = sorted(self.vocabulary, key=self.vocabulary.get)
+        return {
+            "vocab": np.array(terms, dtype=str),
+            "term_ptr": self.term_ptr,
+            "doc_ids": self.doc_ids,
+            "tfs": self.tfs,
+            "doc_len": self.doc_len,
+            "params": np.array([self.k1, self.b], dtype=np.float64),
+        }
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, np.ndarray]) -> "BM25Index":
+        vocabulary = {str(t): i for i, t in enumerate(arrays["vocab"])}
+        k1, b = (float(x) for x in arrays["params"])
+        return cls(vocabulary, arrays["term_ptr"], arrays["doc_ids"], arrays["tfs"], arrays["doc_len"], k1=k1, b=b)
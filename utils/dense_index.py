@@ -0,0 +1,199 @@
+import math
+import zlib
+from collections import Counter
+from functools import lru_cache
+from typing import Dict, Iterator, List, Tuple
+
+import numpy as np
+
+from utils.bm25 import tokenize
+
+DIM = 512  # width of the stored vectors
+SEED = 0x5EED  # fixes the hash family, so stored vectors and new queries agree across processes
+GRAM_BUCKETS = 1 << 24  # hashed n-gram ids; only the ones a document uses are stored
+_NGRAMS = (3, 4, 5)
+_BLOCK_ROWS = 256  # texts projected at a time, bounding the temporary (text, n-gram) arrays
+
+
+@lru_cache(maxsize=1 << 16)
+def _word_grams(word: str) -> np.ndarray:
+    """Hashed ids of a word's boundary-marked char 3-5 grams plus the whole word (fastText-style).
+
+    Inflections and compounds share most of their n-grams, which is what lets
+    "retrying" match "retries" where a lexical ranker sees two unrelated terms.
+    """
+    padded = f"<{word}>"
+    grams = {padded} | {padded[i:i + n] for n in _NGRAMS for i in range(len(padded) - n + 1)}
+    # crc32 is stable across runs, unlike hash().
+    return np.array(sorted(zlib.crc32(g.encode("utf-8")) % GRAM_BUCKETS for g in grams), dtype=np.int64)
+
+
+def _sketch(grams: np.ndarray, dim: int, seed: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Two signed coordinates per n-gram id: a sparse random projection to `dim` columns."""
+    coords, signs = [], []
+    for j in range(2):
+        h = (grams.astype(np.uint64) + np.uint64(seed + j)) * np.uint64(0x9E3779B97F4A7C15)
+        h ^= h >> np.uint64(29)
+        coords.append((h >> np.uint64(32)) % np.uint64(dim))
+        signs.append(np.where(h & np.uint64(1 << 31), -1.0, 1.0))
+    return np.concatenate(coords).astype(np.int64), np.concatenate(signs)
+
+
+def _normalize(m: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(m, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return np.ascontiguousarray(m / norms, dtype=np.float32)
+
+
+def _grams_by_text(texts: List[str]) -> Iterator[Tuple[int, np.ndarray, np.ndarray, np.ndarray]]:
+    """Per block of texts: (first row, row, n-gram id, sublinear word tf) per (text, word, n-gram)."""
+    for lo in range(0, len(texts), _BLOCK_ROWS):
+        vocab: Dict[str, int] = {}
+        rows, ids, tfs = [], [], []
+        for r, text in enumerate(texts[lo:lo + _BLOCK_ROWS]):
+            for word, n in Counter(tokenize(text)).items():
+                rows.append(r)
+                ids.append(vocab.setdefault(word, len(vocab)))
+                tfs.append(1.0 + math.log(n))
+        if not rows:
+            continue
+        # The block's words as one ragged array, then gathered per (text, word) pair.
+        per_word = [_word_grams(w) for w in vocab]
+        lens = np.array([len(g) for g in per_word], dtype=np.int64)
+        starts = np.concatenate(([0], np.cumsum(lens)[:-1]))
+        ids = np.array(ids, dtype=np.int64)
+        reps = lens[ids]
+        offsets = np.arange(reps.sum()) - np.repeat(np.cumsum(reps) - reps, reps) + np.repeat(starts[ids], reps)
+        yield (lo, np.repeat(np.array(rows, dtype=np.int64), reps), np.concatenate(per_word)[offsets],
+               np.repeat(np.array(tfs), reps))
+
+
+class DenseIndex:
+    """Fixed-width float32 chunk vectors from hashed character n-grams; no model, network or GPU.
+
+    Each n-gram is weighted by tf and its idf within the document, then projected with
+    a sparse random projection (two signed hashed columns) to `dim` floats and the row
+    L2-normalised. Vectors live in one contiguous (n_chunks, dim) matrix, so a batch of
+    questions is scored with one matrix product. The idf of every n-gram the document
+    uses is kept so questions are weighted like chunks.
+    """
+
+    method = "dense"
+
+    def __init__(self, vectors: np.ndarray, grams: np.ndarray, idf: np.ndarray, dim: int = DIM, seed: int = SEED):
+        self.vectors = vectors  # (n_chunks, dim) float32, rows L2-normalised
+        self.grams = grams  # sorted n-gram ids seen in the document
+        self.idf = idf  # their idf; unseen n-grams get the maximum
+        self.dim = dim
+        self.seed = seed
+        self._unseen_idf = np.float32(math.log(1 + len(vectors)) + 1)
+
+    def _project(self, texts: List[str], idf_of) -> np.ndarray:
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for lo, rows, grams, tfs in _grams_by_text(texts):
+            coords, signs = _sketch(grams, self.dim, self.seed)
+            weights = np.tile(tfs * idf_of(grams), 2) * signs
+            n = min(_BLOCK_ROWS, len(texts) - lo)
+            out[lo:lo + n] = np.bincount(np.tile(rows, 2) * self.dim + coords, weights=weights,
+                                         minlength=n * self.dim).reshape(n, self.dim)
+        return _normalize(out)
+
+    def _idf_of(self, grams: np.ndarray) -> np.ndarray:
+        pos = np.minimum(np.searchsorted(self.grams, grams), max(len(self.grams) - 1, 0))
+        found = self.grams[pos] == grams if len(self.grams) else np.zeros(len(grams), dtype=bool)
+        return np.where(found, self.idf[pos] if len(self.idf) else 0, self._unseen_idf)
+
+    @classmethod
+    def fit(cls, chunks: List[str], dim: int = DIM, seed: int = SEED) -> "DenseIndex":
+        chunks = list(chunks)
+        # Document frequency of each n-gram: distinct (chunk, n-gram) pairs.
+        seen = [np.unique(grams + (lo + rows) * GRAM_BUCKETS) % GRAM_BUCKETS
+                for lo, rows, grams, _ in _grams_by_text(chunks)]
+        grams, df = np.unique(np.concatenate(seen) if seen else np.zeros(0, dtype=np.int64), return_counts=True)
+        idf = (np.log((1 + len(chunks)) / (1 + df)) + 1).astype(np.float32)  # smoothed, like TfidfVectorizer
+        index = cls(np.zeros((len(chunks), dim), dtype=np.float32), grams, idf, dim, seed)
+        index.vectors = index._project(chunks, index._idf_of)
+        return index
+
+    def transform_many(self, questions: List[str]) -> np.ndarray:
+        """Questions -> (n_questions, dim) L2-normalised vectors in the fitted space."""
+        return self._project(list(questions), self._idf_of)
+
+    def score_many(self, questions: List[str]) -> np.ndarray:
+        """Cosine scores (n_chunks, n_questions), same layout as the lexical indexes."""
+        if not questions:
+            return np.zeros((len(self.vectors), 0), dtype=np.float32)
+        return self.vectors @ self.transform_many(questions).T
+
+    def score(self, question: str) -> np.ndarray:
+        return self.score_many([question])[:, 0]
+
+    # ---------- persistence ----------
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        return {"vectors": self.vectors, "grams": self.grams, "idf": self.idf,
+                "params": np.array([self.dim, self.seed], dtype=np.int64)}
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, np.ndarray]) -> "DenseIndex":
+        dim, seed = (int(x) for x in arrays["params"])
+        return cls(np.ascontiguousarray(arrays["vectors"], dtype=np.float32), arrays["grams"], arrays["idf"],
+                   dim, seed)
+
+
+def _rrf(scores: np.ndarray, k: float, window: int) -> np.ndarray:
+    """Reciprocal-rank contributions 1 / (k + rank) per column (rank 1 = best).
+
+    Only each column's top `window` chunks with a positive score contribute; a
+    weak match deep in one list is not evidence.
+    """
+    order = np.argsort(-scores, axis=0, kind="stable")
+    ranks = np.empty_like(order)
+    np.put_along_axis(ranks, order, np.arange(1, len(scores) + 1)[:, None], axis=0)
+    out = 1.0 / (k + ranks)
+    out[(ranks > window) | (scores <= 0)] = 0.0
+    return out.astype(np.float32)
+
+
+class HybridIndex:
+    """Lexical (TF-IDF or BM25) and dense scores fused with reciprocal rank fusion.
+
+    RRF only looks at ranks, so the two scorers need no calibration against each
+    other. Each ranker votes for its top `window` chunks only.
+    """
+
+    method = "hybrid"
+
+    def __init__(self, lexical, dense: DenseIndex, k: float = 60.0, window: int = 20):
+        self.lexical = lexical
+        self.dense = dense
+        self.k = k
+        self.window = window
+
+    def score_many(self, questions: List[str]) -> np.ndarray:
+        if not questions:
+            return np.zeros((len(self.dense.vectors), 0), dtype=np.float32)
+        return (_rrf(self.lexical.score_many(questions), self.k, self.window)
+                + _rrf(self.dense.score_many(questions), self.k, self.window))
+
+    def score(self, question: str) -> np.ndarray:
+        return self.score_many([question])[:, 0]
+
+    # ---------- persistence ----------
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        arrays = {"lexical_method": np.array(self.lexical.method), "k": np.array(self.k),
+                  "window": np.array(self.window)}
+        arrays.update({f"lex_{k}": v for k, v in self.lexical.to_arrays().items()})
+        arrays.update({f"dense_{k}": v for k, v in self.dense.to_arrays().items()})
+        return arrays
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, np.ndarray]) -> "HybridIndex":
+        lex = {k[len("lex_"):]: v for k, v in arrays.items() if k.startswith("lex_")}
+        dense = {k[len("dense_"):]: v for k, v in arrays.items() if k.startswith("dense_")}
+        if str(arrays["lexical_method"]) == "bm25":
+            from utils.bm25 import BM25Index
+            lexical = BM25Index.from_arrays(lex)
+        else:
+            from utils.doc_index import DocumentIndex  # needs sklearn
+            lexical = DocumentIndex.from_arrays(lex)
+        return cls(lexical, DenseIndex.from_arrays(dense), k=float(arrays["k"]), window=int(arrays["window"]))
@@ -0,0 +1,123 @@
+from collections import Counter
+from functools import lru_cache
+from typing import Dict, List, Sequence
+
+import numpy as np
+from scipy.sparse import csr_matrix
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+
+@lru_cache(maxsize=1)
+def _analyzer():
+    return TfidfVectorizer(stop_words="english").build_analyzer()
+
+
+class DocumentIndex:
+    """TF-IDF chunk matrix fitted once per document; questions are only transformed.
+
+    Scores match cosine similarity against the fitted matrix, and any number of
+    questions can be scored together with one sparse matrix product.
+    """
+
+    method = "tfidf"
+
+    def __init__(self, vocabulary: Dict[str, int], idf: np.ndarray, matrix: csr_matrix):
+        self.vocabulary = vocabulary
+        self.idf = idf
+        self.matrix = matrix  # (n_chunks, n_terms), rows L2-normalised
+
+    @classmethod
+    def fit(cls, chunks: List[str]) -> "DocumentIndex":
+        vec = TfidfVectorizer(stop_words="english")
+        X = vec.fit_transform(chunks)
+        return cls(dict(vec.vocabulary_), vec.idf_.astype(np.float32), X.tocsr().astype(np.float32))
+
+    def updated(self, reuse: Sequence[int], chunks: Sequence[str]) -> "DocumentIndex":
+        """Index of `chunks`, a new version of the indexed chunk list.
+
+        `reuse[i]` is the row of an unchanged chunk in this index, or -1 for a chunk to
+        analyse. A stored row divided by the idf is its term counts up to a factor, and
+        the factor goes away when the row is normalised again, so unchanged chunks are
+        not re-tokenized: only document frequencies and idf are recomputed. Scores
+        equal `fit(chunks)` up to float32 rounding.
+        """
+        reuse = np.asarray(reuse, dtype=np.int64)
+        analyze = _analyzer()
+        vocabulary = dict(self.vocabulary)
+        rows, cols, vals = [], [], []
+        for r in np.flatnonzero(reuse < 0).tolist():
+            for term, n in Counter(analyze(chunks[r])).items():
+                rows.append(r)
+                cols.append(vocabulary.setdefault(term, len(vocabulary)))
+                vals.append(n)
+        width = len(vocabulary)
+        kept = np.flatnonzero(reuse >= 0)
+        old = self.matrix[reuse[kept]].tocoo()
+        counts = csr_matrix(
+            (np.concatenate([old.data / self.idf[old.col], np.asarray(vals, dtype=np.float32)]),
+             (np.concatenate([kept[old.row], np.asarray(rows, dtype=np.int64)]),
+              np.concatenate([old.col, np.asarray(cols, dtype=np.int64)]))),
+            shape=(len(chunks), width), dtype=np.float32)
+
+        # Terms no chunk uses any more are dropped, so the vocabulary tracks the page.
+        df = np.bincount(counts.indices, minlength=width)
+        used = np.flatnonzero(df)
+        if not len(used):
+            raise ValueError("empty vocabulary; perhaps the documents only contain stop words")
+        counts = counts[:, used]
+        words = sorted(vocabulary, key=vocabulary.get)
+        vocabulary = {words[j]: i for i, j in enumerate(used.tolist())}
+        idf = (np.log((1 + len(chunks)) / (1 + df[used])) + 1).astype(np.float32)  # smooth_idf, as fitted
+        weighted = counts.multiply(idf[None, :]).tocsr()
+        norms = np.sqrt(np.asarray(weighted.multiply(weighted).sum(axis=1)).ravel())
+        norms[norms == 0] = 1.0
+        return DocumentIndex(vocabulary, idf, csr_matrix(weighted.multiply(1.0 / norms[:, None]), dtype=np.float32))
+
+    def transform_many(self, questions: List[str]) -> csr_matrix:
+        """Questions -> (n_questions, n_terms) L2-normalised TF-IDF rows, using the fitted vocabulary."""
+        analyze = _analyzer()
+        rows, cols, vals = [], [], []
+        for r, question in enumerate(questions):
+            for term, n in Counter(analyze(question or "")).items():
+                j = self.vocabulary.get(term)
+                if j is not None:
+                    rows.append(r)
+                    cols.append(j)
+                    vals.append(n * self.idf[j])
+        Q = csr_matrix((np.asarray(vals, dtype=np.float32), (rows, cols)), shape=(len(questions), len(self.idf)))
+        norms = np.sqrt(np.asarray(Q.multiply(Q).sum(axis=1)).ravel())
+        norms[norms == 0] = 1.0
+        return csr_matrix(Q.multiply(1.0 / norms[:, None]), dtype=np.float32)
+
+    def transform(self, question: str) -> csr_matrix:
+        return self.transform_many([question])
+
+    def score_many(self, questions: List[str]) -> np.ndarray:
+        """Cosine scores for a batch of questions in one sparse product: (n_chunks, n_questions)."""
+        if not questions:
+            return np.zeros((self.matrix.shape[0], 0), dtype=np.float32)
+        return (self.matrix @ self.transform_many(questions).T).toarray()
+
+    def score(self, question: str) -> np.ndarray:
+        return self.score_many([question])[:, 0]
+
+    # ---------- persistence ----------
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        terms = sorted(self.vocabulary, key=self.vocabulary.get)
+        return {
+            "vocab": np.array(terms, dtype=str),
+            "idf": self.idf,
+            "data": self.matrix.data,
+            "indices": self.matrix.indices,
+            "indptr": self.matrix.indptr,
+            "shape": np.array(self.matrix.shape, dtype=np.int64),
+        }
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, np.ndarray]) -> "DocumentIndex":
+        vocabulary = {str(t): i for i, t in enumerate(arrays["vocab"])}
+        matrix = csr_matrix(
+            (arrays["data"], arrays["indices"], arrays["indptr"]),
+            shape=tuple(int(x) for x in arrays["shape"]),
+        )
+        return cls(vocabulary, arrays["idf"], matrix)
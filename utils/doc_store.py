@@ -0,0 +1,219 @@
+import hashlib
+import io
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Dict, Iterator, List, Optional
+
+from dataclass import IndexedDocument
+
+if TYPE_CHECKING:
+    import numpy as np
+
+DEFAULT_STORE_DIR = os.getenv("WEBQA_STORE_DIR", os.path.join(".cache", "docstore"))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS docs (
+    key TEXT PRIMARY KEY,
+    url TEXT NOT NULL,
+    blob TEXT NOT NULL,
+    meta TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created REAL NOT NULL,
+    accessed REAL NOT NULL
+)
+"""
+
+
+class DocumentStore:
+    """Persistent store of `IndexedDocument`s keyed by (url, chunking params).
+
+    Blobs are uncompressed ``.npz`` files named by the digest of their contents, so
+    identical pages share one file. A small SQLite manifest tracks keys, sizes and
+    access times for TTL expiry and LRU eviction. Safe to share across threads and
+    processes.
+
+    An entry past its `ttl` is no longer served by `get`, but is kept for another
+    `keep_stale` seconds: `get_stale` hands it to an incremental re-index of the page
+    (`ContentProcessorAgent.update`), which then replaces it.
+    """
+
+    def __init__(
+        self,
+        root: Optional[str] = None,
+        ttl: float = 24 * 60 * 60,
+        max_entries: int = 500,
+        max_bytes: int = 512 * 1024 * 1024,
+        keep_stale: float = 7 * 24 * 60 * 60,
+    ):
+        self.root = root or DEFAULT_STORE_DIR
+        self.ttl = ttl
+        self.keep_stale = keep_stale
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(os.path.join(self.root, "blobs"), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(_SCHEMA)
+
+    @staticmethod
+    def make_key(url: str, **params) -> str:
+        raw = json.dumps({"url": url, **params}, sort_keys=True)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(os.path.join(self.root, "manifest.sqlite"), timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _blob_path(self, blob: str) -> str:
+        return os.path.join(self.root, "blobs", blob + ".npz")
+
+    # ---------- read ----------
+    def get(self, key: str) -> Optional[IndexedDocument]:
+        return self._read(key, stale=False)
+
+    def get_stale(self, key: str) -> Optional[IndexedDocument]:
+        """The entry for `key` even if past its TTL (the previous version of a page), without touching it."""
+        return self._read(key, stale=True)
+
+    def _read(self, key: str, stale: bool) -> Optional[IndexedDocument]:
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            row = conn.execute("SELECT blob, meta, created FROM docs WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            blob, meta, created = row
+            if now - created > self.ttl + self.keep_stale:
+                self._delete(conn, key, blob)
+                return None
+            if not stale:
+                if now - created > self.ttl:
+                    return None
+                conn.execute("UPDATE docs SET accessed = ? WHERE key = ?", (now, key))
+        import numpy as np
+        try:
+            with np.load(self._blob_path(blob), allow_pickle=False) as npz:
+                arrays = {k: npz[k] for k in npz.files}
+        except (OSError, ValueError):
+            with self._lock, self._connect() as conn:
+                self._delete(conn, key, blob)
+            return None
+        return _decode(json.loads(meta), arrays)
+
+    def recent_keys(self, n: int = 8) -> List[str]:
+        """Keys of the `n` most recently used entries (what a warm-up should read first)."""
+        with self._lock, self._connect() as conn:
+            return [k for (k,) in conn.execute("SELECT key FROM docs ORDER BY accessed DESC LIMIT ?", (n,))]
+
+    # ---------- write ----------
+    def put(self, key: str, doc: IndexedDocument) -> None:
+        import numpy as np
+        meta, arrays = _encode(doc)
+        buf = io.BytesIO()
+        np.savez(buf, **arrays)
+        data = buf.getvalue()
+        blob = hashlib.sha256(data).hexdigest()
+        path = self._blob_path(blob)
+        if not os.path.exists(path):
+            tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            old = conn.execute("SELECT blob FROM docs WHERE key = ?", (key,)).fetchone()
+            conn.execute(
+                "INSERT OR REPLACE INTO docs (key, url, blob, meta, size, created, accessed) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, doc.url, blob, json.dumps(meta), len(data), now, now),
+            )
+            if old and old[0] != blob:
+                self._drop_blob_if_unused(conn, old[0])
+            self._evict(conn, now)
+
+    # ---------- eviction ----------
+    def _evict(self, conn: sqlite3.Connection, now: float) -> None:
+        for key, blob in conn.execute("SELECT key, blob FROM docs WHERE created < ?",
+                                      (now - self.ttl - self.keep_stale,)).fetchall():
+            self._delete(conn, key, blob)
+        count, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM docs").fetchone()
+        if count <= self.max_entries and total <= self.max_bytes:
+            return
+        for key, blob, size in conn.execute("SELECT key, blob, size FROM docs ORDER BY accessed ASC").fetchall():
+            if count <= self.max_entries and total <= self.max_bytes:
+                break
+            self._delete(conn, key, blob)
+            count, total = count - 1, total - size
+
+    def _delete(self, conn: sqlite3.Connection, key: str, blob: str) -> None:
+        conn.execute("DELETE FROM docs WHERE key = ?", (key,))
+        self._drop_blob_if_unused(conn, blob)
+
+    def _drop_blob_if_unused(self, conn: sqlite3.Connection, blob: str) -> None:
+        if conn.execute("SELECT 1 FROM docs WHERE blob = ? LIMIT 1", (blob,)).fetchone():
+            return
+        try:
+            os.remove(self._blob_path(blob))
+        except FileNotFoundError:
+            pass
+
+    def clear(self) -> None:
+        with self._lock, self._connect() as conn:
+            for key, blob in conn.execute("SELECT key, blob FROM docs").fetchall():
+                self._delete(conn, key, blob)
+
+
+def _encode(doc: IndexedDocument):
+    import numpy as np
+    meta = {"url": doc.url, "title": doc.title, "method": doc.index.method if doc.index else "jaccard",
+            "streamed": doc.streamed, "sources": doc.sources}
+    arrays: Dict[str, "np.ndarray"] = {
+        "text": np.frombuffer(doc.cleaned_text.encode("utf-8"), dtype=np.uint8),
+        "spans": doc.spans,
+    }
+    if doc.index is not None:
+        arrays.update({f"index_{k}": v for k, v in doc.index.to_arrays().items()})
+    if doc.sentences is not None:
+        arrays.update({f"sent_{k}": v for k, v in doc.sentences.to_arrays().items()})
+    if doc.signatures is not None:
+        arrays["signatures"] = doc.signatures
+    return meta, arrays
+
+
+def _decode(meta: Dict, arrays: Dict[str, "np.ndarray"]) -> IndexedDocument:
+    from utils.sentence_index import SentenceIndex
+    index_arrays = {k[len("index_"):]: v for k, v in arrays.items() if k.startswith("index_")}
+    sent_arrays = {k[len("sent_"):]: v for k, v in arrays.items() if k.startswith("sent_")}
+    index = None
+    if index_arrays:
+        if meta.get("method") == "bm25":
+            from utils.bm25 import BM25Index
+            index = BM25Index.from_arrays(index_arrays)
+        elif meta.get("method") == "dense":
+            from utils.dense_index import DenseIndex
+            index = DenseIndex.from_arrays(index_arrays)
+        elif meta.get("method") == "hybrid":
+            from utils.dense_index import HybridIndex
+            index = HybridIndex.from_arrays(index_arrays)
+        else:
+            from utils.doc_index import DocumentIndex  # needs sklearn; only for tfidf docs
+            index = DocumentIndex.from_arrays(index_arrays)
+    return IndexedDocument(
+        url=meta["url"],
+        title=meta.get("title"),
+        cleaned_text=arrays["text"].tobytes().decode("utf-8"),
+        spans=arrays["spans"],
+        index=index,
+        sentences=SentenceIndex.from_arrays(sent_arrays) if sent_arrays else None,
+        streamed=meta.get("streamed", False),
+        sources=[tuple(src) for src in meta["sources"]] if meta.get("sources") else None,
+        signatures=arrays.get("signatures"),
+    )
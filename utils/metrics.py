@@ -0,0 +1,319 @@
+"""Per-request stage timings and counters, with Prometheus and OpenTelemetry-style export.
+
+Code anywhere in the pipeline records into the *current* trace:
+
+    with metrics.current().stage("parse"):
+        ...
+    metrics.current().add("bytes_downloaded", n)
+
+The orchestrator opens a trace per call (`metrics.trace("run")`); outside of one,
+`current()` is a shared no-op object, so disabled instrumentation costs a context-var
+lookup and an empty `with` block. Finished traces feed the process-wide REGISTRY,
+which renders Prometheus text (histograms, so p50/p99 aggregate across replicas).
+"""
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+STAGES = ("fetch", "parse", "clean", "chunk", "vectorize", "rank", "snippets", "llm")
+_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def enabled_by_default() -> bool:
+    return os.getenv("WEBQA_METRICS", "1").lower() not in ("0", "false", "no", "off")
+
+
+class _NullStage:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_STAGE = _NullStage()
+
+
+class NullTrace:
+    """Stand-in used when no trace is active; every method is a no-op."""
+    __slots__ = ()
+    enabled = False
+
+    def stage(self, name: str) -> _NullStage:
+        return _NULL_STAGE
+
+    def add(self, name: str, value: float = 1) -> None:
+        pass
+
+    def set(self, name: str, value: Any) -> None:
+        pass
+
+    def cache(self, layer: str, hit: bool) -> None:
+        pass
+
+
+NULL_TRACE = NullTrace()
+
+
+class _Stage:
+    __slots__ = ("trace", "name", "span_id", "parent", "start")
+
+    def __init__(self, trace: "Trace", name: str):
+        self.trace = trace
+        self.name = name
+
+    def __enter__(self):
+        stack = self.trace._stack()
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent = stack[-1] if stack else None  # the enclosing block's span id
+        stack.append(self.span_id)
+        self.start = time.time_ns()
+        return self
+
+    def __exit__(self, *exc):
+        end = time.time_ns()
+        self.trace._stack().pop()
+        self.trace._close(self.name, self.span_id, self.parent, self.start, end)
+        return False
+
+
+class Trace:
+    """Stage wall times, counters and attributes for one orchestrator call."""
+    enabled = True
+
+    def __init__(self, operation: str):
+        self.operation = operation
+        self.trace_id = f"{random.getrandbits(128):032x}"
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.stages: Dict[str, float] = {}
+        self.counters: Dict[str, float] = {}
+        self.attributes: Dict[str, Any] = {}
+        # (name, span_id, parent span_id or None for the root, start_ns, end_ns)
+        self.spans: List[Tuple[str, str, Optional[str], int, int]] = []
+        self._local = threading.local()  # span ids of the open stages per thread, for span parents
+        self._lock = threading.Lock()
+
+    def _stack(self) -> List[str]:
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def stage(self, name: str) -> _Stage:
+        """Time a block; repeated or concurrent blocks of the same stage add up."""
+        return _Stage(self, name)
+
+    def _close(self, name: str, span_id: str, parent: Optional[str], start: int, end: int) -> None:
+        with self._lock:
+            self.stages[name] = self.stages.get(name, 0.0) + (end - start) / 1e9
+            self.spans.append((name, span_id, parent, start, end))
+
+    def add(self, name: str, value: float = 1) -> None:
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def set(self, name: str, value: Any) -> None:
+        with self._lock:
+            self.attributes[name] = value
+
+    def cache(self, layer: str, hit: bool) -> None:
+        self.add(f"cache_{layer}_{'hits' if hit else 'misses'}")
+
+    def finish(self) -> None:
+        self.end_ns = time.time_ns()
+
+    @property
+    def total_s(self) -> float:
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e9
+
+    def to_dict(self) -> Dict[str, Any]:
+        """JSON-safe snapshot; also the input of `to_otel_spans`."""
+        with self._lock:
+            return {
+                "operation": self.operation,
+                "total_s": round(self.total_s, 6),
+                "stages": {k: round(v, 6) for k, v in self.stages.items()},
+                "counters": dict(self.counters),
+                "attributes": dict(self.attributes),
+                "trace_id": self.trace_id,
+                "start_ns": self.start_ns,
+                "end_ns": self.end_ns,
+                "spans": [list(span) for span in self.spans],
+            }
+
+
+def to_otel_spans(data: Dict[str, Any], service: str = "webqa") -> List[Dict[str, Any]]:
+    """Spans in the OTLP/JSON shape from a `Trace.to_dict()`: a root span plus one per timed block."""
+    root_id = f"{random.getrandbits(64):016x}"
+    spans = [{
+        "traceId": data["trace_id"], "spanId": root_id, "parentSpanId": "", "name": data["operation"],
+        "startTimeUnixNano": data["start_ns"], "endTimeUnixNano": data["end_ns"] or time.time_ns(),
+        "attributes": [_otel_attr("service.name", service)]
+        + [_otel_attr(k, v) for k, v in {**data["counters"], **data["attributes"]}.items()],
+    }]
+    for name, span_id, parent, start, end in sorted(data["spans"], key=lambda span: span[3]):
+        spans.append({
+            "traceId": data["trace_id"], "spanId": span_id, "parentSpanId": parent or root_id,
+            "name": name, "startTimeUnixNano": start, "endTimeUnixNano": end, "attributes": [],
+        })
+    return spans
+
+
+def _otel_attr(key: str, value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"key": key, "value": {"boolValue": value}}
+    if isinstance(value, int):
+        return {"key": key, "value": {"intValue": str(value)}}
+    if isinstance(value, float):
+        return {"key": key, "value": {"doubleValue": value}}
+    return {"key": key, "value": {"stringValue": str(value)}}
+
+
+_CURRENT: ContextVar[Any] = ContextVar("webqa_trace", default=NULL_TRACE)
+
+
+def current():
+    """The active Trace, or NULL_TRACE when instrumentation is off or no call is traced."""
+    return _CURRENT.get()
+
+
+@contextmanager
+def use(tr) -> Iterator[Any]:
+    """Make `tr` current in this thread/context (e.g. inside a pool worker)."""
+    token = _CURRENT.set(tr)
+    try:
+        yield tr
+    finally:
+        try:
+            _CURRENT.reset(token)
+        except ValueError:  # resumed from another context (a generator handed across threads)
+            _CURRENT.set(NULL_TRACE)
+
+
+@contextmanager
+def trace(operation: str, enabled: bool = True) -> Iterator[Any]:
+    """Open a trace for one orchestrator call; on exit it is finished and fed to REGISTRY."""
+    if not enabled:
+        yield NULL_TRACE
+        return
+    tr = Trace(operation)
+    with use(tr):
+        try:
+            yield tr
+        finally:
+            tr.finish()
+            REGISTRY.observe(tr)
+
+
+class MetricsRegistry:
+    """Process-wide aggregates of finished traces, rendered as Prometheus text."""
+
+    def __init__(self, buckets: Tuple[float, ...] = _BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        # (metric, labels) -> [bucket counts..., +Inf count, sum]
+        self._hist: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], List[float]] = {}
+        self._counters: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], float] = {}
+
+    def _observe(self, metric: str, labels: Tuple[Tuple[str, str], ...], value: float) -> None:
+        h = self._hist.get((metric, labels))
+        if h is None:
+            h = self._hist[(metric, labels)] = [0.0] * (len(self.buckets) + 2)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                h[i] += 1
+        h[-2] += 1
+        h[-1] += value
+
+    def _inc(self, metric: str, labels: Tuple[Tuple[str, str], ...], value: float) -> None:
+        self._counters[(metric, labels)] = self._counters.get((metric, labels), 0) + value
+
+    def observe(self, tr: Trace) -> None:
+        op = (("operation", tr.operation),)
+        with self._lock:
+            self._observe("webqa_request_seconds", op, tr.total_s)
+            for stage, seconds in tr.stages.items():
+                self._observe("webqa_stage_seconds", op + (("stage", stage),), seconds)
+            for name, value in tr.counters.items():
+                if name.startswith("cache_"):
+                    layer, _, result = name[len("cache_"):].rpartition("_")
+                    self._inc("webqa_cache_lookups_total", (("layer", layer), ("result", result)), value)
+                else:
+                    self._inc(f"webqa_{name}_total", (), value)
+            reason = tr.attributes.get("fallback_reason")
+            if reason:
+                self._inc("webqa_fallbacks_total", op + (("reason", str(reason)[:60]),), 1)
+
+    def render_prometheus(self) -> str:
+        def fmt(labels: Tuple[Tuple[str, str], ...]) -> str:
+            if not labels:
+                return ""
+            return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels) + "}"
+
+        lines: List[str] = []
+        with self._lock:
+            typed = set()
+            for (metric, labels), h in sorted(self._hist.items()):
+                if metric not in typed:
+                    lines.append(f"# TYPE {metric} histogram")
+                    typed.add(metric)
+                for bound, count in zip(self.buckets, h):
+                    lines.append(f"{metric}_bucket{fmt(labels + (('le', repr(bound)),))} {count:g}")
+                lines.append(f"{metric}_bucket{fmt(labels + (('le', '+Inf'),))} {h[-2]:g}")
+                lines.append(f"{metric}_sum{fmt(labels)} {h[-1]:.6f}")
+                lines.append(f"{metric}_count{fmt(labels)} {h[-2]:g}")
+            for (metric, labels), value in sorted(self._counters.items()):
+                if metric not in typed:
+                    lines.append(f"# TYPE {metric} counter")
+                    typed.add(metric)
+                lines.append(f"{metric}{fmt(labels)} {value:g}")
+        return "\n".join(lines) + "\n"
+
+    def reset(self) -> None:
+        with self._lock:
+            self._hist.clear()
+            self._counters.clear()
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+REGISTRY = MetricsRegistry()
+
+_SERVER: Optional[ThreadingHTTPServer] = None
+_SERVER_LOCK = threading.Lock()
+
+
+def serve_prometheus(port: int, host: str = "0.0.0.0") -> ThreadingHTTPServer:
+    """Expose REGISTRY at http://host:port/metrics from a daemon thread (started once per process)."""
+    global _SERVER
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            if self.path.rstrip("/") != "/metrics":
+                self.send_error(404)
+                return
+            body = REGISTRY.render_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    with _SERVER_LOCK:
+        if _SERVER is None:
+            _SERVER = ThreadingHTTPServer((host, port), Handler)
+            threading.Thread(target=_SERVER.serve_forever, daemon=True).start()
+        return _SERVER
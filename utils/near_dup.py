@@ -0,0 +1,143 @@
+import re
+import zlib
+from functools import lru_cache
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+NUM_PERM = 64  # signature length: 256 bytes per text
+SEED = 0xD0D0  # fixes the hash family, so signatures are comparable across processes
+SHINGLE = 3  # words per shingle
+_MASK32 = np.uint64(0xFFFFFFFF)
+# Every word counts, single digits included: "step 1" and "step 2" must not look alike.
+_WORD = re.compile(r"\w+")
+
+
+@lru_cache(maxsize=1 << 16)
+def _word_hash(word: str) -> int:
+    return zlib.crc32(word.encode("utf-8"))
+
+
+def _shingles(text: str, k: int = SHINGLE) -> np.ndarray:
+    """32-bit hashes of the text's distinct word k-grams (the word set for shorter texts)."""
+    words = np.array([_word_hash(w) for w in _WORD.findall(text.lower())], dtype=np.uint64)
+    if len(words) < k:
+        return np.unique(words)
+    h = np.zeros(len(words) - k + 1, dtype=np.uint64)
+    for j in range(k):  # polynomial combination of the k word hashes, mod 2^32
+        h = (h * np.uint64(0x01000193) + words[j:len(words) - k + 1 + j]) & _MASK32
+    return np.unique(h)
+
+
+class MinHasher:
+    """MinHash signatures: `num_perm` minima of multiply-shift hashes over a text's shingles.
+
+    The fraction of positions where two signatures agree estimates the Jaccard
+    similarity of the two shingle sets.
+    """
+
+    def __init__(self, num_perm: int = NUM_PERM, shingle: int = SHINGLE, seed: int = SEED):
+        rng = np.random.default_rng(seed)
+        self.num_perm = num_perm
+        self.shingle = shingle
+        self._a = rng.integers(1, 1 << 63, size=(num_perm, 1), dtype=np.uint64) | np.uint64(1)  # odd multipliers
+        self._b = rng.integers(0, 1 << 63, size=(num_perm, 1), dtype=np.uint64)
+
+    def signature(self, text: str) -> np.ndarray:
+        shingles = _shingles(text, self.shingle)
+        if not len(shingles):
+            return np.full(self.num_perm, 0xFFFFFFFF, dtype=np.uint32)  # empty texts only match each other
+        return ((self._a * shingles + self._b) >> np.uint64(32)).min(axis=1).astype(np.uint32)
+
+    def signatures(self, texts: Sequence[str]) -> np.ndarray:
+        out = np.empty((len(texts), self.num_perm), dtype=np.uint32)
+        for i, text in enumerate(texts):
+            out[i] = self.signature(text)
+        return out
+
+
+def similarity(a: np.ndarray, b: np.ndarray) -> float:
+    """Estimated Jaccard similarity of two signatures."""
+    return float(np.mean(a == b))
+
+
+def lsh_params(threshold: float, num_perm: int = NUM_PERM) -> Tuple[int, int]:
+    """(bands, rows) whose LSH S-curve is steepest near `threshold`: about (1/bands)^(1/rows)."""
+    return min(((num_perm // r, r) for r in range(1, num_perm + 1)),
+               key=lambda br: abs((1 / br[0]) ** (1 / br[1]) - threshold))
+
+
+class LSHIndex:
+    """Banded LSH over MinHash signatures: candidates share at least one whole band.
+
+    A lookup touches one bucket per band instead of every stored signature; the
+    candidates are then checked against `threshold` on the full signature.
+    """
+
+    def __init__(self, threshold: float = 0.9, num_perm: int = NUM_PERM):
+        self.threshold = threshold
+        self.bands, self.rows = lsh_params(threshold, num_perm)
+        self._buckets: List[Dict[bytes, List[int]]] = [{} for _ in range(self.bands)]
+        self._sigs: Dict[int, np.ndarray] = {}
+
+    def _keys(self, sig: np.ndarray):
+        for band in range(self.bands):
+            yield band, sig[band * self.rows:(band + 1) * self.rows].tobytes()
+
+    def add(self, key: int, sig: np.ndarray) -> None:
+        self._sigs[key] = sig
+        for band, k in self._keys(sig):
+            self._buckets[band].setdefault(k, []).append(key)
+
+    def query(self, sig: np.ndarray) -> List[int]:
+        """Stored keys whose estimated similarity to `sig` is at least `threshold`, in insertion order."""
+        found = set()
+        for band, k in self._keys(sig):
+            found.update(self._buckets[band].get(k, ()))
+        return sorted(key for key in found if similarity(self._sigs[key], sig) >= self.threshold)
+
+
+def near_duplicates(texts: Sequence[str], threshold: float = 0.9,
+                    hasher: Optional[MinHasher] = None) -> Dict[int, int]:
+    """{index: index of the earlier text it nearly duplicates}; first occurrences are kept.
+
+    Each text is compared with the kept texts only, so a chain of small edits does
+    not let a text be dropped for resembling something that was itself dropped.
+    """
+    return {i: match for i, _, match in _scan(texts, threshold, hasher, {}) if match is not None}
+
+
+def unique_indices(texts: Sequence[str], threshold: float = 0.9) -> List[int]:
+    """Indices of `texts` with near-duplicates of earlier texts removed, in order."""
+    dup_of = near_duplicates(texts, threshold)
+    return [i for i in range(len(texts)) if i not in dup_of]
+
+
+def unique_signed(texts: Sequence[str], threshold: float = 0.9, known: Optional[Dict[int, np.ndarray]] = None,
+                  hasher: Optional[MinHasher] = None) -> Tuple[List[int], np.ndarray]:
+    """`unique_indices`, plus the kept texts' signatures as one (n_kept, num_perm) array.
+
+    Signatures in `known` (by index into `texts`) are used instead of hashing those
+    texts again, e.g. for the unchanged chunks of a page being re-indexed.
+    """
+    hasher = hasher or MinHasher()
+    kept = [(i, sig) for i, sig, match in _scan(texts, threshold, hasher, known or {}) if match is None]
+    sigs = np.array([sig for _, sig in kept], dtype=np.uint32).reshape(-1, hasher.num_perm)
+    return [i for i, _ in kept], sigs
+
+
+def _scan(texts: Sequence[str], threshold: float, hasher: Optional[MinHasher],
+          known: Dict[int, np.ndarray]) -> Iterator[Tuple[int, np.ndarray, Optional[int]]]:
+    """(index, signature, earlier kept index it duplicates or None) for every text, in order."""
+    hasher = hasher or MinHasher()
+    index = LSHIndex(threshold, hasher.num_perm)
+    for i, text in enumerate(texts):
+        sig = known.get(i)
+        if sig is None:
+            sig = hasher.signature(text)
+        match = index.query(sig)
+        if match:
+            yield i, sig, match[0]
+        else:
+            index.add(i, sig)
+            yield i, sig, None
@@ -0,0 +1,107 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+from urllib.parse import urlsplit
+
+
+class TokenBucket:
+    """Classic token bucket refilled continuously at `per_minute / 60` tokens per second."""
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self.tokens = self.capacity
+        self._last = time.monotonic()
+        self._cond = threading.Condition()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._last) * self.rate)
+        self._last = now
+
+    def take(self, n: float) -> None:
+        """Block until `n` tokens are available (requests larger than the bucket wait for a full one)."""
+        n = min(n, self.capacity)
+        with self._cond:
+            while True:
+                self._refill()
+                if self.tokens >= n:
+                    self.tokens -= n
+                    return
+                self._cond.wait((n - self.tokens) / self.rate)
+
+    def adjust(self, delta: float) -> None:
+        """Return (delta > 0) or charge (delta < 0) tokens once the real cost is known."""
+        with self._cond:
+            self._refill()
+            self.tokens = min(self.capacity, self.tokens + delta)
+            self._cond.notify_all()
+
+
+class LLMRateLimiter:
+    """Caps in-flight LLM requests and tokens per minute across every agent in the process."""
+
+    def __init__(self, max_concurrency: int = 8, tokens_per_minute: int = 200_000):
+        self.max_concurrency = max_concurrency
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._tokens = TokenBucket(tokens_per_minute)
+
+    @contextmanager
+    def slot(self, estimated_tokens: int) -> Iterator["_Reservation"]:
+        self._tokens.take(estimated_tokens)
+        self._slots.acquire()
+        reservation = _Reservation(self._tokens, estimated_tokens)
+        try:
+            yield reservation
+        finally:
+            self._slots.release()
+
+
+class _Reservation:
+    def __init__(self, bucket: TokenBucket, estimated: int):
+        self._bucket = bucket
+        self.estimated = estimated
+
+    def settle(self, actual_tokens: int) -> None:
+        if actual_tokens:
+            self._bucket.adjust(self.estimated - actual_tokens)
+
+
+class HostPoliteness:
+    """Minimum delay between request starts to the same host (concurrency is capped by the scraper)."""
+
+    def __init__(self, min_interval: float):
+        self.min_interval = min_interval
+        self._lock = threading.Lock()
+        self._next: Dict[str, float] = {}
+
+    def wait(self, url: str, min_interval: Optional[float] = None) -> None:
+        """Sleep until this host's next slot; `min_interval` overrides the default (e.g. robots.txt Crawl-delay)."""
+        interval = self.min_interval if min_interval is None else min_interval
+        if interval <= 0:
+            return
+        host = urlsplit(url).netloc.lower()
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next.get(host, now))
+            self._next[host] = slot + interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+_DEFAULT_LIMITER = None
+_DEFAULT_LOCK = threading.Lock()
+
+
+def default_limiter() -> LLMRateLimiter:
+    """Process-wide limiter configured from WEBQA_LLM_CONCURRENCY / WEBQA_LLM_TPM."""
+    global _DEFAULT_LIMITER
+    with _DEFAULT_LOCK:
+        if _DEFAULT_LIMITER is None:
+            _DEFAULT_LIMITER = LLMRateLimiter(
+                max_concurrency=int(os.getenv("WEBQA_LLM_CONCURRENCY", "8")),
+                tokens_per_minute=int(os.getenv("WEBQA_LLM_TPM", "200000")),
+            )
+        return _DEFAULT_LIMITER
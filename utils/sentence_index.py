@@ -0,0 +1,120 @@
+import re
+from array import array
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+# Same sentence split and word pattern as text_utils.extract_snippets.
+_SENT_BREAK = re.compile(r"(?<=[.!?])\s+")
+_WORD = re.compile(r"\w+")
+
+
+def sentence_spans(text: str) -> List[Tuple[int, int]]:
+    """(start, end) of each sentence in `text`, split like `extract_snippets` does."""
+    spans, start = [], 0
+    for m in _SENT_BREAK.finditer(text):
+        spans.append((start, m.start()))
+        start = m.end()
+    spans.append((start, len(text)))
+    return spans
+
+
+class SentenceIndex:
+    """Sentence offsets plus a binary sentence-term matrix (CSR), built once per document.
+
+    `highlight` scores every sentence against a question with one vectorised Jaccard
+    pass, giving the same ranking as `extract_snippets` without re-tokenising the text.
+    """
+
+    def __init__(self, spans: np.ndarray, indptr: np.ndarray, terms: np.ndarray, vocabulary: Dict[str, int]):
+        self.spans = spans  # (n_sentences, 2) int32 offsets into the cleaned text
+        self.indptr = indptr
+        self.terms = terms
+        self.vocabulary = vocabulary
+        self._sizes = np.diff(indptr).astype(np.float32)
+        self._rows = np.repeat(np.arange(len(spans), dtype=np.int32), np.diff(indptr))
+
+    @classmethod
+    def build(cls, text: str) -> "SentenceIndex":
+        spans = sentence_spans(text)
+        vocabulary: Dict[str, int] = {}
+        terms = array("i")
+        indptr = array("q", [0])
+        for s, e in spans:
+            terms.extend({vocabulary.setdefault(w, len(vocabulary)) for w in _WORD.findall(text[s:e].lower())})
+            indptr.append(len(terms))
+        return cls(
+            np.asarray(spans, dtype=np.int32).reshape(-1, 2),
+            np.frombuffer(indptr, dtype=np.int64).copy(),
+            np.frombuffer(terms, dtype=np.int32).copy(),
+            vocabulary,
+        )
+
+    def updated(self, old_text: str, text: str) -> "SentenceIndex":
+        """Index of `text`, a new version of `old_text` (the text this indexes).
+
+        Sentences found verbatim in the old text keep their word sets; only the others
+        are tokenized. Highlights equal `build(text)`.
+        """
+        old_rows = {old_text[s:e]: i for i, (s, e) in enumerate(self.spans.tolist())}
+        spans = sentence_spans(text)
+        vocabulary = dict(self.vocabulary)
+        reuse = np.full(len(spans), -1, dtype=np.int64)
+        lens = np.zeros(len(spans), dtype=np.int64)
+        new_terms: Dict[int, List[int]] = {}
+        sizes = np.diff(self.indptr)
+        for i, (s, e) in enumerate(spans):
+            r = old_rows.get(text[s:e])
+            if r is not None:
+                reuse[i], lens[i] = r, sizes[r]
+            else:
+                ids = new_terms[i] = list({vocabulary.setdefault(w, len(vocabulary))
+                                           for w in _WORD.findall(text[s:e].lower())})
+                lens[i] = len(ids)
+        indptr = np.zeros(len(spans) + 1, dtype=np.int64)
+        np.cumsum(lens, out=indptr[1:])
+        terms = np.empty(indptr[-1], dtype=np.int32)
+        dst = np.flatnonzero(reuse >= 0)
+        n = lens[dst]
+        within = np.arange(n.sum()) - np.repeat(np.cumsum(n) - n, n)
+        terms[np.repeat(indptr[dst], n) + within] = self.terms[np.repeat(self.indptr[reuse[dst]], n) + within]
+        for i, ids in new_terms.items():
+            terms[indptr[i]:indptr[i + 1]] = ids
+
+        # Words no sentence uses any more are dropped, so the vocabulary tracks the page.
+        used, terms = np.unique(terms, return_inverse=True)
+        words = sorted(vocabulary, key=vocabulary.get)
+        return SentenceIndex(np.asarray(spans, dtype=np.int32).reshape(-1, 2), indptr, terms.astype(np.int32),
+                             {words[j]: i for i, j in enumerate(used.tolist())})
+
+    def highlight(self, question: str, k: int = 3) -> List[Tuple[int, int]]:
+        """Spans of the k sentences with the highest word-set Jaccard overlap, best first."""
+        q_words = set(_WORD.findall((question or "").lower()))
+        q_ids = np.fromiter((self.vocabulary[w] for w in q_words if w in self.vocabulary), dtype=np.int32)
+        inter = np.bincount(self._rows, weights=np.isin(self.terms, q_ids), minlength=len(self.spans))
+        union = self._sizes + len(q_words) - inter
+        union[union == 0] = 1
+        best = _top_k_stable(inter / union, k)
+        return [(int(self.spans[i, 0]), int(self.spans[i, 1])) for i in best]
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        words = sorted(self.vocabulary, key=self.vocabulary.get)
+        return {"spans": self.spans, "indptr": self.indptr, "terms": self.terms, "vocab": np.array(words, dtype=str)}
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, np.ndarray]) -> "SentenceIndex":
+        vocabulary = {str(w): i for i, w in enumerate(arrays["vocab"])}
+        return cls(arrays["spans"], arrays["indptr"], arrays["terms"], vocabulary)
+
+
+def _top_k_stable(scores: np.ndarray, k: int) -> List[int]:
+    """Top-k indices by score; ties keep document order (like a stable sort)."""
+    n = len(scores)
+    k = min(k, n)
+    if k <= 0:
+        return []
+    kth = np.partition(scores, n - k)[n - k]
+    above = np.flatnonzero(scores > kth)
+    ties = np.flatnonzero(scores == kth)[: k - len(above)]
+    picked = np.concatenate([above, ties])
+    return picked[np.lexsort((picked, -scores[picked]))].tolist()
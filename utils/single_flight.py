@@ -0,0 +1,78 @@
+import threading
+import time
+from concurrent.futures import Future
+from concurrent.futures import TimeoutError as FutureTimeout
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+from utils import metrics
+
+
+class Abandoned(Exception):
+    """The leader stopped without a result or an error (e.g. its script run was interrupted)."""
+
+
+class SingleFlight:
+    """Coalesces concurrent calls with the same key into one execution, process-wide.
+
+    The first caller for a key (the leader) runs the work; callers that arrive while it
+    is running wait for it and get the same result, or the same exception. Nothing is
+    kept once the call finishes: repeats after that are what the caches are for. A
+    waiter gives up with TimeoutError after `timeout` seconds; the leader carries on.
+    If the leader is interrupted rather than failing, one waiter takes over.
+    """
+
+    def __init__(self, name: str):
+        self.name = name  # metrics layer: cache_<name>_hits counts callers that joined
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, Future] = {}
+
+    def begin(self, key: Hashable) -> Tuple[Future, bool]:
+        """(call, True) if this caller must run the work and then `finish` it, else (call, False)."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = Future()
+        metrics.current().cache(self.name, not leader)
+        return call, leader
+
+    def finish(self, key: Hashable, call: Future, result: Any = None, error: Optional[BaseException] = None) -> None:
+        """Hand the leader's result, or `error`, to every waiter."""
+        with self._lock:
+            if self._calls.get(key) is call:
+                del self._calls[key]  # later callers start afresh instead of reusing this outcome
+        if error is not None:
+            call.set_exception(error)
+        else:
+            call.set_result(result)
+
+    def abandon(self, key: Hashable, call: Future) -> None:
+        """The leader was interrupted: waiters get `Abandoned` (`do` then retries, so one takes over)."""
+        self.finish(key, call, error=Abandoned())
+
+    def wait(self, call: Future, timeout: Optional[float] = None) -> Any:
+        try:
+            return call.result(timeout)
+        except FutureTimeout:
+            raise TimeoutError(f"gave up after {timeout}s waiting for an identical in-flight call") from None
+
+    def do(self, key: Hashable, fn: Callable[[], Any], timeout: Optional[float] = None) -> Tuple[Any, bool]:
+        """(fn(), False) for the caller that ran it; (its result, True) for callers that joined."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            call, leader = self.begin(key)
+            if leader:
+                try:
+                    result = fn()
+                except Exception as e:
+                    self.finish(key, call, error=e)
+                    raise
+                except BaseException:
+                    self.abandon(key, call)
+                    raise
+                self.finish(key, call, result)
+                return result, False
+            try:
+                return self.wait(call, None if deadline is None else max(0.0, deadline - time.monotonic())), True
+            except Abandoned:
+                continue
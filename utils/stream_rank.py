@@ -0,0 +1,116 @@
+import heapq
+import math
+import re
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Sequence, Set, Tuple
+
+from utils.bm25 import tokenize
+from utils.sentence_index import sentence_spans
+
+_WORD = re.compile(r"\w+")  # simple_rank_chunks / SentenceIndex word pattern
+
+
+@dataclass
+class StreamStats:
+    """Collection statistics BM25 needs, gathered in one pass without keeping any chunk."""
+    n_chunks: int
+    total_len: int
+    df: Dict[str, int]  # document frequency of the question terms only
+
+    @property
+    def avgdl(self) -> float:
+        return self.total_len / self.n_chunks if self.n_chunks else 0.0
+
+
+def collect_stats(chunks: Iterable[str], terms: Set[str]) -> StreamStats:
+    n, total = 0, 0
+    df = dict.fromkeys(terms, 0)
+    for chunk in chunks:
+        tokens = tokenize(chunk)
+        n += 1
+        total += len(tokens)
+        for term in terms.intersection(tokens):
+            df[term] += 1
+    return StreamStats(n, total, df)
+
+
+class _TopK:
+    """Bounded min-heap of (score, index); ties keep the earlier chunk, like `top_k_indices`."""
+    __slots__ = ("k", "heap")
+
+    def __init__(self, k: int):
+        self.k = k
+        self.heap: List[Tuple[float, int]] = []
+
+    def push(self, score: float, i: int) -> None:
+        item = (score, -i)
+        if len(self.heap) < self.k:
+            heapq.heappush(self.heap, item)
+        elif item > self.heap[0]:
+            heapq.heapreplace(self.heap, item)
+
+    def best(self) -> List[int]:
+        return [-neg for _, neg in sorted(self.heap, reverse=True)]
+
+
+def stream_top_k(chunks: Iterable[str], questions: Sequence[str], k: int, method: str = "bm25",
+                 k1: float = 1.5, b: float = 0.75) -> List[List[int]]:
+    """Top-k chunk indices per question (best first), holding one chunk string at a time.
+
+    `chunks` is iterated twice for BM25 (statistics, then scoring), so pass a
+    re-iterable such as `ChunkView`. Scores match `BM25Index` / `simple_rank_chunks`
+    over the same chunks; memory is O(k) per question however long the text is.
+    """
+    if k <= 0 or not questions:
+        return [[] for _ in questions]
+    heaps = [_TopK(k) for _ in questions]
+    if method == "jaccard":
+        q_words = [set(_WORD.findall((q or "").lower())) for q in questions]
+        for i, chunk in enumerate(chunks):
+            words = set(_WORD.findall(chunk.lower()))
+            for heap, q in zip(heaps, q_words):
+                heap.push(len(q & words) / (len(q | words) or 1), i)
+        return [heap.best() for heap in heaps]
+
+    q_terms = [set(tokenize(q)) for q in questions]
+    stats = collect_stats(chunks, set().union(*q_terms))
+    idf = {t: _idf(stats.n_chunks, df) for t, df in stats.df.items()}
+    avgdl = stats.avgdl or 1.0
+    all_terms = set(idf)
+    for i, chunk in enumerate(chunks):
+        tokens = tokenize(chunk)
+        norm = k1 * (1 - b + b * len(tokens) / avgdl)
+        tf = {t: tokens.count(t) for t in all_terms.intersection(tokens)}
+        for heap, terms in zip(heaps, q_terms):
+            score = 0.0
+            for t in terms:
+                n = tf.get(t)
+                if n:
+                    score += idf[t] * n * (k1 + 1) / (n + norm)
+            heap.push(score, i)
+    return [heap.best() for heap in heaps]
+
+
+def _idf(n_chunks: int, df: int) -> float:
+    return math.log1p((n_chunks - df + 0.5) / (df + 0.5))
+
+
+def highlight_in_spans(text: str, spans: Iterable[Tuple[int, int]], question: str, k: int = 3) -> List[Tuple[int, int]]:
+    """The k sentences with the best word-set Jaccard overlap, looking only inside `spans`.
+
+    Streamed documents have no document-wide SentenceIndex; their top chunks are
+    where the answer is, so highlights come from there (offsets into `text`).
+    """
+    q_words = set(_WORD.findall((question or "").lower()))
+    seen = set()
+    scored = []
+    for s, e in spans:
+        for a, z in sentence_spans(text[s:e]):
+            span = (s + a, s + z)
+            if a == z or span in seen:  # overlapping windows repeat sentences
+                continue
+            seen.add(span)
+            words = set(_WORD.findall(text[span[0]:span[1]].lower()))
+            scored.append((len(q_words & words) / (len(q_words | words) or 1), span))
+    scored.sort(key=lambda item: (-item[0], item[1][0]))
+    return [span for _, span in scored[:k]]
@@ -66,42 +66,166 @@
 #     return [s[:240] for s in best]
 
 import re
-from typing import List
+from functools import lru_cache
+from itertools import islice
+from typing import Iterator, List, Optional, Sequence, Tuple
+
+# Only whitespace that needs rewriting (runs, or a lone tab/newline) matches, so text
+# that is already mostly clean isn't rebuilt from one piece per word.
+_MESSY_SPACE = re.compile(r"\s{2,}|[^\S ]")
 
 def clean_text(text: str) -> str:
-    return re.sub(r"\s+", " ", text or "").strip()
+    return _MESSY_SPACE.sub(" ", text or "").strip()
 
-def chunk_text(
-    text: str,
-    max_chars: int = 1200,
-    overlap: int = 150,
-    max_total_chars: int = 600_000,
-    max_chunks: int = 200
-) -> List[str]:
-    text = clean_text(text or "")
+def iter_chunk_spans(text: str, max_chars: int = 1200, overlap: int = 150,
+                     limit: Optional[int] = None) -> Iterator[Tuple[int, int]]:
+    """Lazily yield `chunk_spans` windows over the first `limit` chars (all of `text` by default)."""
     if not text:
-        return []
-    if len(text) > max_total_chars:
-        text = text[:max_total_chars]
-    if len(text) <= max_chars:
-        return [text]
+        return
+    n = len(text) if limit is None else min(len(text), limit)
+    if n <= max_chars:
+        yield (0, n)
+        return
 
     overlap = min(overlap, max(0, max_chars // 3))
     stride = max(1, max_chars - overlap)
 
-    chunks, start = [], 0
-    while start < len(text) and len(chunks) < max_chunks:
-        end = min(len(text), start + max_chars)
-        chunks.append(text[start:end])
+    prev, start = None, 0
+    while start < n:
+        s, e = _strip_span(text, start, min(n, start + max_chars))
+        # De-dupe consecutive near-identicals
+        if prev is None or text[s:e] != text[prev[0]:prev[1]]:
+            yield (s, e)
+            prev = (s, e)
         start += stride
 
-    # De-dupe trailing near-identicals
-    deduped = []
-    for c in chunks:
-        c2 = c.strip()
-        if not deduped or c2 != deduped[-1]:
-            deduped.append(c2)
-    return deduped
+def chunk_spans(
+    text: str,
+    max_chars: int = 1200,
+    overlap: int = 150,
+    max_total_chars: Optional[int] = 600_000,
+    max_chunks: Optional[int] = 200
+) -> List[Tuple[int, int]]:
+    """Same windows as `chunk_text`, as (start, end) offsets into already-cleaned `text`.
+
+    Pass None for `max_total_chars` / `max_chunks` to chunk the whole text.
+    """
+    return list(islice(iter_chunk_spans(text, max_chars, overlap, limit=max_total_chars), max_chunks))
+
+def _strip_span(text: str, start: int, end: int) -> Tuple[int, int]:
+    while start < end and text[start].isspace():
+        start += 1
+    while end > start and text[end - 1].isspace():
+        end -= 1
+    return start, end
+
+_GEAR_SEED = 0xC0DEC  # fixes the gear table, so cut points agree across processes and runs
+_CDC_WINDOW = 32  # characters hashed at each candidate cut
+
+@lru_cache(maxsize=None)
+def _gear_table():
+    """The 65536 random 64-bit gear values, built once (numpy is only imported here on first use)."""
+    import numpy as np
+    return np.random.default_rng(_GEAR_SEED).integers(0, 2**63, size=1 << 16, dtype=np.uint64)
+
+def content_chunk_spans(text: str, max_chars: int = 1200, overlap: int = 150) -> List[Tuple[int, int]]:
+    """Chunks of already-cleaned `text` whose ends are content-defined, as (start, end) offsets.
+
+    A space is a cut point when a rolling hash of the 32 characters before it falls
+    in one bucket out of (`max_chars` - `overlap`) / 12. Consecutive cuts are at least
+    a quarter and at most all of that stride apart (past it, the text is cut at the
+    last space that fits), and each chunk also reaches back up to `overlap` characters
+    (whole words) before its cut, so no chunk is longer than `max_chars`. A cut
+    depends only on the text just before it: an edit changes the chunks around it,
+    and the chunks after it line up with the old ones again at the next cut point.
+    """
+    import numpy as np
+    n = len(text)
+    if n <= max_chars:
+        s, e = _strip_span(text, 0, n)
+        return [(s, e)] if e > s else []
+    overlap = min(overlap, max(0, max_chars // 3))
+    stride = max_chars - overlap  # longest distance between cuts, so chunks with their overlap fit
+    min_chars, divisor = max(1, stride // 4), max(1, stride // 12)
+
+    codes = np.frombuffer(text.encode("utf-32-le"), dtype=np.uint32)
+    window = np.cumsum(_gear_table()[codes & 0xFFFF])  # wraps mod 2**64, as it should
+    window[_CDC_WINDOW:] -= window[:-_CDC_WINDOW].copy()
+    hits = (codes == 32) & ((window >> np.uint64(40)) % np.uint64(divisor) == 0)
+    hits[:_CDC_WINDOW] = False
+    candidates = np.flatnonzero(hits)
+
+    cuts, start = [], 0
+    while n - start > stride:
+        i = int(np.searchsorted(candidates, start + min_chars))
+        if i < len(candidates) and candidates[i] <= start + stride:
+            cut = int(candidates[i])
+        else:
+            space = text.rfind(" ", start + min_chars, start + stride)
+            cut = space if space > start else start + stride
+        cuts.append(cut)
+        start = cut
+    cuts.append(n)
+
+    spans, prev = [], 0
+    for cut in cuts:
+        s = prev
+        if overlap and prev:
+            space = text.find(" ", max(0, prev - overlap), prev)
+            s = space + 1 if space >= 0 else prev
+        s, e = _strip_span(text, s, cut)
+        if e > s:
+            spans.append((s, e))
+        prev = cut
+    return spans
+
+def span_array(spans: Sequence[Tuple[int, int]]):
+    """(start, end) offsets as one (n, 2) int32 NumPy array: 8 bytes a chunk instead of a tuple of ints."""
+    import numpy as np
+    return np.asarray(spans, dtype=np.int32).reshape(-1, 2)
+
+class ChunkView(Sequence[str]):
+    """Chunks of `text` given by `spans`, sliced on access instead of held in memory.
+
+    `spans` is a (n, 2) offset array (see `span_array`) or a list of (start, end).
+    Only the chunks actually read become strings, and they are not kept.
+    """
+    __slots__ = ("text", "spans")
+    _BLOCK = 4096  # offsets converted to Python ints at a time while iterating
+
+    def __init__(self, text: str, spans: Sequence[Tuple[int, int]]):
+        self.text = text
+        self.spans = spans
+
+    def __len__(self) -> int:
+        return len(self.spans)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return list(ChunkView(self.text, self.spans[i]))
+        s, e = self.spans[i]
+        return self.text[s:e]
+
+    def __iter__(self) -> Iterator[str]:
+        text, spans = self.text, self.spans
+        if not hasattr(spans, "tolist"):
+            for s, e in spans:
+                yield text[s:e]
+            return
+        for lo in range(0, len(spans), self._BLOCK):
+            for s, e in spans[lo:lo + self._BLOCK].tolist():
+                yield text[s:e]
+
+def chunk_text(
+    text: str,
+    max_chars: int = 1200,
+    overlap: int = 150,
+    max_total_chars: Optional[int] = 600_000,
+    max_chunks: Optional[int] = 200
+) -> List[str]:
+    text = clean_text(text or "")
+    spans = chunk_spans(text, max_chars, overlap, max_total_chars, max_chunks)
+    return [text[s:e] for s, e in spans]
 
 def extract_snippets(text: str, question: str, k: int = 3):
     text = clean_text(text)
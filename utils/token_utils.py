@@ -0,0 +1,149 @@
+import os
+import re
+from functools import lru_cache
+from typing import Callable, List, Optional, Sequence, Tuple
+
+DEFAULT_ENCODING = os.getenv("TIKTOKEN_ENCODING", "o200k_base")
+_APPROX_TOKEN = re.compile(r"\w+|[^\w\s]")
+
+
+@lru_cache(maxsize=4)
+def get_encoder(name: str = DEFAULT_ENCODING):
+    """Cached tiktoken encoder, or None when tiktoken (or its encoding file) is unavailable."""
+    try:
+        import tiktoken
+        return tiktoken.get_encoding(name)
+    except Exception:
+        return None
+
+
+def _approx_count(texts: List[str]) -> List[int]:
+    # Words + punctuation: close to BPE counts for English prose.
+    return [len(_APPROX_TOKEN.findall(t)) for t in texts]
+
+
+def token_counter(name: str = DEFAULT_ENCODING) -> Callable[[List[str]], List[int]]:
+    enc = get_encoder(name)
+    if enc is None:
+        return _approx_count
+    return lambda texts: [len(ids) for ids in enc.encode_ordinary_batch(texts)]
+
+
+def count_tokens(text: str, name: str = DEFAULT_ENCODING) -> int:
+    return token_counter(name)([text or ""])[0]
+
+
+def token_chunk_spans(
+    text: str,
+    max_tokens: int = 256,
+    overlap_tokens: int = 32,
+    max_total_chars: Optional[int] = 600_000,
+    max_chunks: Optional[int] = 200,
+    encoding: Optional[str] = None,
+) -> List[Tuple[int, int]]:
+    """Pack whole sentences into chunks of at most `max_tokens`, as offsets into cleaned `text`.
+
+    Consecutive chunks share trailing sentences worth up to `overlap_tokens`. A single
+    sentence longer than the budget is split at word boundaries. Pass None for
+    `max_total_chars` / `max_chunks` to chunk the whole text.
+    """
+    from utils.sentence_index import sentence_spans  # pulls in numpy; keep it off the import path
+
+    if not text:
+        return []
+    if max_total_chars is not None:
+        text = text[:max_total_chars]
+    max_tokens = max(1, max_tokens)
+    overlap_tokens = min(overlap_tokens, max_tokens // 2)
+    count = token_counter(encoding or DEFAULT_ENCODING)
+
+    units: List[Tuple[int, int]] = []
+    spans = [(s, e) for s, e in sentence_spans(text) if e > s]
+    for (s, e), n in zip(spans, count([text[s:e] for s, e in spans])):
+        units.extend(_split_long(text, s, e, n, max_tokens) if n > max_tokens else [(s, e, n)])
+
+    chunks: List[Tuple[int, int]] = []
+    i = 0
+    while i < len(units) and (max_chunks is None or len(chunks) < max_chunks):
+        j, total = i, 0
+        while j < len(units) and (j == i or total + units[j][2] <= max_tokens):
+            total += units[j][2]
+            j += 1
+        chunks.append((units[i][0], units[j - 1][1]))
+        if j >= len(units):
+            break
+        # Step back over trailing sentences that fit in the overlap budget.
+        back, carried = j, 0
+        while back - 1 > i and carried + units[back - 1][2] <= overlap_tokens:
+            back -= 1
+            carried += units[back][2]
+        i = back
+    return chunks
+
+
+def _split_long(text: str, start: int, end: int, n_tokens: int, max_tokens: int) -> List[Tuple[int, int, int]]:
+    chars_per_token = (end - start) / max(1, n_tokens)
+    window = max(1, int(max_tokens * chars_per_token))
+    out = []
+    while start < end:
+        stop = min(end, start + window)
+        if stop < end:
+            space = text.rfind(" ", start + 1, stop)
+            stop = space if space > start else stop
+        out.append((start, stop, max(1, round((stop - start) / chars_per_token))))
+        start = stop
+        while start < end and text[start] == " ":
+            start += 1
+    return out
+
+
+def section_spans(
+    text: str,
+    max_tokens: int = 1500,
+    avg_tokens: Optional[int] = None,
+    boundaries: Sequence[int] = (),
+    encoding: Optional[str] = None,
+) -> List[Tuple[int, int]]:
+    """Whole sentences packed into contiguous sections of at most `max_tokens`, for summarising.
+
+    Cut points are content-defined: a sentence of n tokens ends its section when its
+    CRC32 falls in the lowest n / `avg_tokens` of the hash range (default: a third of
+    the budget), once the section holds a quarter of that. Sections average about
+    `avg_tokens`, and an edit only changes the sections around it: cuts after it fall
+    on the same sentences as before. Offsets in `boundaries` (page starts of a crawled
+    site) always start a new section.
+    """
+    from zlib import crc32
+
+    from utils.sentence_index import sentence_spans  # pulls in numpy; keep it off the import path
+
+    if not text:
+        return []
+    max_tokens = max(1, max_tokens)
+    avg_tokens = max(1, min(avg_tokens or max_tokens // 3, max_tokens))
+    min_tokens = avg_tokens // 4
+    count = token_counter(encoding or DEFAULT_ENCODING)
+    spans = [(s, e) for s, e in sentence_spans(text) if e > s]
+    units: List[Tuple[int, int, int]] = []
+    for (s, e), n in zip(spans, count([text[s:e] for s, e in spans])):
+        units.extend(_split_long(text, s, e, n, max_tokens) if n > max_tokens else [(s, e, n)])
+
+    starts = sorted(b for b in boundaries if b > 0)
+    sections: List[Tuple[int, int]] = []
+    first, total, b = 0, 0, 0
+    for i, (s, e, n) in enumerate(units):
+        while b < len(starts) and starts[b] <= s:
+            b += 1
+            if i > first:
+                sections.append((units[first][0], units[i - 1][1]))
+                first, total = i, 0
+        if i > first and total + n > max_tokens:
+            sections.append((units[first][0], units[i - 1][1]))
+            first, total = i, 0
+        total += n
+        if total >= min_tokens and crc32(text[s:e].encode("utf-8")) < (n << 32) // avg_tokens:
+            sections.append((units[first][0], e))
+            first, total = i + 1, 0
+    if first < len(units):
+        sections.append((units[first][0], units[-1][1]))
+    return sections